@@ -1,6 +1,5 @@
 from django.contrib import admin
-from .models import Quiz, Question, Submission, Answer, Feedback
-from django.utils.html import strip_tags
+from .models import Quiz, Question, Submission, Answer, Feedback, Participant, QuestionStats
 
 
 admin.site.site_header = "AI KSHETRA Administration"
@@ -13,213 +12,459 @@ class AnswerInline(admin.TabularInline):
     extra = 0
 
 
-from django.contrib import admin
-from django.http import HttpResponse
-import csv
+from itertools import islice
+
+from django.contrib import admin, messages
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Count
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from . import ops
+from .analysis import rebuild_quiz_stats
+from .changelists import LargeTableAdminMixin
+from .exports import CHUNK_SIZE, stream_csv
+from .packing import answer_rows, has_packed_submissions
+from .leaderboard import leaderboards, rebuild as rebuild_leaderboard
+from .papers import build_paper_variants
+from .regrade import regrade_quiz
+from .routers import replica_reads, reporting_db, submission_dbs
+from .shards import fan_out
 
 from .models import Quiz, Question, Submission, Answer
 
 
-# Optional small helper for stripping HTML if you want cleaner CSV
-from django.utils.html import strip_tags
+class ReplicaChangelistMixin:
+    """
+    Changelist pages read from the replica (see quiz.routers). The response is
+    rendered inside the block because the list is only queried while the
+    template renders. Actions (POST) stay on the primary.
+    """
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != "GET":
+            return super().changelist_view(request, extra_context)
+        with replica_reads():
+            response = super().changelist_view(request, extra_context)
+            if hasattr(response, "render"):
+                response.render()
+        return response
 
 
 @admin.register(Quiz)
-class QuizAdmin(admin.ModelAdmin):
-    list_display = ("id", "name", "duration_minutes", "num_questions")
-    actions = ["export_as_csv"]
+class QuizAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
+    list_display = ("id", "name", "duration_minutes", "num_questions", "variant_count", "leaderboard_link")
+    actions = ["export_as_csv", "build_variants", "regrade", "rebuild_item_analysis"]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(_variant_count=Count("variants"))
+
+    def get_urls(self):
+        return [
+            path(
+                "<int:quiz_id>/leaderboard/",
+                self.admin_site.admin_view(self.leaderboard_view),
+                name="quiz_quiz_leaderboard",
+            ),
+            path("ops/", self.admin_site.admin_view(self.ops_view), name="quiz_quiz_ops"),
+            path("ops/stream/", self.admin_site.admin_view(self.ops_stream), name="quiz_quiz_ops_stream"),
+        ] + super().get_urls()
+
+    # ---------- Live dashboard (see quiz.ops) ----------
+
+    def _ops_quizzes(self):
+        return list(Quiz.objects.order_by("id").values_list("id", "name", "duration_minutes"))
+
+    def ops_view(self, request):
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Live dashboard",
+            "snapshot": ops.snapshot(self._ops_quizzes()),
+        }
+        return TemplateResponse(request, "admin/quiz/quiz/ops.html", context)
+
+    def ops_stream(self, request):
+        stream = ops.aevent_stream if isinstance(request, ASGIRequest) else ops.event_stream
+        response = StreamingHttpResponse(stream(self._ops_quizzes()), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # nginx: pass events through as they come
+        return response
 
-    def export_as_csv(self, request, queryset):
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = 'attachment; filename="quizzes.csv"'
+    def leaderboard_view(self, request, quiz_id):
+        quiz = get_object_or_404(Quiz, id=quiz_id)
+        if request.method == "POST":
+            rebuild_leaderboard(quiz.id)
+            self.message_user(request, "Leaderboard rebuilt from the database.")
+            return redirect("admin:quiz_quiz_leaderboard", quiz_id=quiz.id)
+
+        top = 100
+        board = leaderboards.get(quiz.id)
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": f"{quiz.name} – Leaderboard",
+            "quiz": quiz,
+            "top": top,
+            "participants": len(board),
+            "standings": board.top(top),
+        }
+        return TemplateResponse(request, "admin/quiz/quiz/leaderboard.html", context)
+
+    def leaderboard_link(self, obj):
+        return format_html('<a href="{}">View</a>', reverse("admin:quiz_quiz_leaderboard", args=[obj.id]))
+    leaderboard_link.short_description = "Leaderboard"
+
+    def variant_count(self, obj):
+        return obj._variant_count
+    variant_count.short_description = "Paper variants"
+    variant_count.admin_order_field = "_variant_count"
+
+    def build_variants(self, request, queryset):
+        count = getattr(settings, "QUIZ_PAPER_VARIANTS", 8)
+        for quiz in queryset:
+            build_paper_variants(quiz, count)
+        self.message_user(request, f"Built {count} paper variant(s) for {queryset.count()} quiz(zes).")
 
-        writer = csv.writer(response)
-        writer.writerow(["ID", "Name", "Duration (min)", "Num Questions"])
+    build_variants.short_description = "Build paper variants for selected quizzes"
 
+    def regrade(self, request, queryset):
         for quiz in queryset:
-            writer.writerow([
-                quiz.id,
-                quiz.name,
-                quiz.duration_minutes,
-                quiz.num_questions,
-            ])
+            report = regrade_quiz(quiz)
+            self.message_user(request, report.summary())
 
-        return response
+    regrade.short_description = "Re-grade selected quizzes against the current answer key"
+
+    def rebuild_item_analysis(self, request, queryset):
+        for quiz in queryset:
+            stats = rebuild_quiz_stats(quiz)
+            self.message_user(request, f"{quiz.name}: item analysis rebuilt for {len(stats)} question(s).")
+
+    rebuild_item_analysis.short_description = "Rebuild item analysis for selected quizzes"
+
+    def export_as_csv(self, request, queryset):
+        rows = queryset.using(reporting_db()).order_by("id").values_list(
+            "id", "name", "duration_minutes", "num_questions"
+        ).iterator(chunk_size=CHUNK_SIZE)
+        return stream_csv(
+            request,
+            "quizzes.csv",
+            ["ID", "Name", "Duration (min)", "Num Questions"],
+            rows,
+        )
 
     export_as_csv.short_description = "Download selected quizzes as CSV"
 
 
+def _percent(value):
+    return "—" if value is None else f"{value:.0%}"
+
+
 @admin.register(Question)
-class QuestionAdmin(admin.ModelAdmin):
-    list_display = ("id", "quiz", "short_text", "correct_option")
+class QuestionAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
+    list_display = ("id", "quiz", "short_text", "correct_option", "difficulty", "discrimination", "option_rates")
     list_filter = ("quiz",)
+    list_select_related = ("quiz", "stats")
     actions = ["export_as_csv"]
 
     def short_text(self, obj):
-        # first 80 chars, HTML stripped
-        return strip_tags(obj.text_html)[:80]
+        # first 80 chars, HTML stripped when the question was saved
+        return obj.text_plain[:80]
+
+    # Item analysis (see quiz.analysis); questions without answers show dashes
+    def _stats(self, obj):
+        try:
+            return obj.stats
+        except QuestionStats.DoesNotExist:
+            return None
+
+    def difficulty(self, obj):
+        stats = self._stats(obj)
+        return _percent(stats.p_value if stats else None)
+    difficulty.short_description = "p-value"
+    difficulty.admin_order_field = "stats__correct"
+
+    def discrimination(self, obj):
+        stats = self._stats(obj)
+        value = stats.discrimination if stats else None
+        if value is None:
+            return "—"
+        # Negative discrimination usually means a wrong key or a misleading question
+        if value < 0:
+            return format_html('<strong style="color:#ba2121">{}</strong>', f"{value:.2f}")
+        return f"{value:.2f}"
+    discrimination.short_description = "Point-biserial"
+
+    def option_rates(self, obj):
+        stats = self._stats(obj)
+        if not stats:
+            return "—"
+        rates = [f"{letter} {_percent(stats.option_rate(letter))}" for letter in "ABCD"]
+        rates.append(f"– {_percent(stats.unanswered_rate)}")
+        return " · ".join(rates)
+    option_rates.short_description = "A / B / C / D / unanswered"
 
     def export_as_csv(self, request, queryset):
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = 'attachment; filename="questions.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow([
-            "ID",
-            "Quiz ID",
-            "Quiz Name",
-            "Text (stripped)",
-            "Image",
-            "Option A",
-            "Option B",
-            "Option C",
-            "Option D",
-            "Correct Option",
-        ])
-
-        for q in queryset:
-            writer.writerow([
-                q.id,
-                q.quiz_id,
-                q.quiz.name,
-                strip_tags(q.text_html),
-                q.image.url if q.image else "",
-                q.option_a,
-                q.option_b,
-                q.option_c,
-                q.option_d,
-                q.correct_option,
-            ])
-
-        return response
+        def rows():
+            for q in queryset.using(reporting_db()).select_related("quiz").order_by("id").iterator(chunk_size=CHUNK_SIZE):
+                yield [
+                    q.id,
+                    q.quiz_id,
+                    q.quiz.name,
+                    q.text_plain,
+                    q.image.url if q.image else "",
+                    q.option_a,
+                    q.option_b,
+                    q.option_c,
+                    q.option_d,
+                    q.correct_option,
+                ]
+
+        return stream_csv(
+            request,
+            "questions.csv",
+            [
+                "ID",
+                "Quiz ID",
+                "Quiz Name",
+                "Text (stripped)",
+                "Image",
+                "Option A",
+                "Option B",
+                "Option C",
+                "Option D",
+                "Correct Option",
+            ],
+            rows(),
+        )
 
     export_as_csv.short_description = "Download selected questions as CSV"
 
 
 @admin.register(Submission)
-class SubmissionAdmin(admin.ModelAdmin):
+class SubmissionAdmin(LargeTableAdminMixin, ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ("id", "quiz", "phone", "event", "score", "total_questions", "time_taken_seconds", "submitted_at")
     list_filter = ("quiz", "event")
+    list_select_related = ("quiz",)
     search_fields = ("phone",)
-    actions = ["export_as_csv"]
+    actions = ["export_as_csv", "export_answers_as_csv"]
+    change_list_template = "admin/quiz/submission/change_list.html"
+
+    export_fields = (
+        "id",
+        "quiz_id",
+        "quiz__name",
+        "phone",
+        "event",
+        "score",
+        "total_questions",
+        "time_taken_seconds",
+        "submitted_at",
+    )
+    export_header = [
+        "ID",
+        "Quiz ID",
+        "Quiz Name",
+        "Phone",
+        "Event",
+        "Score",
+        "Total Questions",
+        "Time Taken (s)",
+        "Submitted At",
+    ]
 
     def export_as_csv(self, request, queryset):
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = 'attachment; filename="submissions.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow([
-            "ID",
-            "Quiz ID",
-            "Quiz Name",
-            "Phone",
-            "Event",
-            "Score",
-            "Total Questions",
-            "Time Taken (s)",
-            "Submitted At",
-        ])
-
-        for s in queryset:
-            writer.writerow([
-                s.id,
-                s.quiz_id,
-                s.quiz.name,
-                s.phone,
-                s.event,
-                s.score,
-                s.total_questions,
-                s.time_taken_seconds,
-                s.submitted_at,
-            ])
-
-        return response
+        rows = queryset.using(reporting_db()).order_by("id").values_list(
+            *self.export_fields
+        ).iterator(chunk_size=CHUNK_SIZE)
+        return stream_csv(request, "submissions.csv", self.export_header, rows)
 
     export_as_csv.short_description = "Download selected submissions as CSV"
 
+    def export_answers_as_csv(self, request, queryset):
+        # Packed submissions have no Answer rows, so the Answer export misses them
+        rows = answer_rows(queryset.using(reporting_db()))
+        return stream_csv(request, "answers.csv", AnswerAdmin.export_header, rows)
+
+    export_answers_as_csv.short_description = "Download answers of selected submissions as CSV"
+
+    # ---------- Across shards (see quiz.shards) ----------
+
+    def get_urls(self):
+        return [
+            path(
+                "all-shards/",
+                self.admin_site.admin_view(self.all_shards_view),
+                name="quiz_submission_all_shards",
+            ),
+            path(
+                "all-shards/export/",
+                self.admin_site.admin_view(self.export_all_shards),
+                name="quiz_submission_export_all_shards",
+            ),
+        ] + super().get_urls()
+
+    def _across_shards(self, request, order_by):
+        """One ordered values_list per database, filtered by ?quiz= if given."""
+        quiz_id = request.GET.get("quiz")
+
+        def queryset_for(alias):
+            qs = Submission.objects.using(reporting_db() if alias == "default" else alias)
+            if quiz_id and quiz_id.isdigit():
+                qs = qs.filter(quiz_id=quiz_id)
+            return qs.order_by(*order_by).values_list(*self.export_fields)
+
+        return queryset_for
+
+    def all_shards_view(self, request):
+        limit = 200
+        queryset_for = self._across_shards(request, ["-submitted_at", "-id"])
+        # submitted_at is the last export field
+        newest = fan_out(lambda alias: queryset_for(alias)[:limit], key=lambda row: row[-1], reverse=True)
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Submissions across all databases",
+            "header": self.export_header,
+            "rows": list(islice(newest, limit)),
+            "limit": limit,
+            "counts": [(alias, queryset_for(alias).count()) for alias in submission_dbs()],
+            "quizzes": Quiz.objects.order_by("id"),
+            "quiz_filter": request.GET.get("quiz", ""),
+        }
+        return TemplateResponse(request, "admin/quiz/submission/all_shards.html", context)
+
+    def export_all_shards(self, request):
+        queryset_for = self._across_shards(request, ["submitted_at", "id"])
+        rows = fan_out(lambda alias: queryset_for(alias).iterator(chunk_size=CHUNK_SIZE), key=lambda row: row[-1])
+        return stream_csv(request, "submissions-all-shards.csv", self.export_header, rows)
+
 
 @admin.register(Answer)
-class AnswerAdmin(admin.ModelAdmin):
+class AnswerAdmin(LargeTableAdminMixin, ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ("id", "submission", "question", "selected_option", "correct_option", "is_correct")
     list_filter = ("submission__quiz", "is_correct")
+    list_select_related = ("submission__quiz", "question__quiz")
     search_fields = ("submission__phone",)
     actions = ["export_as_csv"]
 
-    def export_as_csv(self, request, queryset):
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = 'attachment; filename="answers.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow([
-            "ID",
-            "Submission ID",
-            "Quiz ID",
-            "Quiz Name",
-            "Phone",
-            "Question ID",
-            "Question Text (stripped)",
-            "Selected Option",
-            "Correct Option",
-            "Is Correct",
-        ])
-
-        for a in queryset.select_related("submission", "question", "submission__quiz"):
-            writer.writerow([
-                a.id,
-                a.submission_id,
-                a.submission.quiz_id,
-                a.submission.quiz.name,
-                a.submission.phone,
-                a.question_id,
-                strip_tags(a.question.text_html),
-                a.selected_option or "",
-                a.correct_option,
-                a.is_correct,
-            ])
+    export_header = [
+        "ID",
+        "Submission ID",
+        "Quiz ID",
+        "Quiz Name",
+        "Phone",
+        "Question ID",
+        "Question Text (stripped)",
+        "Selected Option",
+        "Correct Option",
+        "Is Correct",
+    ]
+
+    def get_queryset(self, request):
+        # Only the questions' ids and quiz names are shown
+        return super().get_queryset(request).defer(
+            "question__text_html",
+            "question__text_plain",
+            "question__option_a",
+            "question__option_b",
+            "question__option_c",
+            "question__option_d",
+            "question__image_variants",
+        )
+
+    def changelist_view(self, request, extra_context=None):
+        # Packed submissions (quiz.packing) have no Answer rows to list or export
+        if request.method == "GET" and has_packed_submissions(reporting_db()):
+            self.message_user(
+                request,
+                "Some submissions store their answers packed and are not listed here. "
+                "Use \"Download answers of selected submissions as CSV\" on Submissions to export them.",
+                messages.WARNING,
+            )
+        return super().changelist_view(request, extra_context)
 
-        return response
+    def export_as_csv(self, request, queryset):
+        def rows():
+            for (a_id, sub_id, quiz_id, quiz_name, phone, q_id, text_plain,
+                 selected, correct, is_correct) in queryset.using(reporting_db()).order_by("id").values_list(
+                "id",
+                "submission_id",
+                "submission__quiz_id",
+                "submission__quiz__name",
+                "submission__phone",
+                "question_id",
+                "question__text_plain",
+                "selected_option",
+                "correct_option",
+                "is_correct",
+            ).iterator(chunk_size=CHUNK_SIZE):
+                yield [
+                    a_id,
+                    sub_id,
+                    quiz_id,
+                    quiz_name,
+                    phone,
+                    q_id,
+                    text_plain,
+                    selected or "",
+                    correct,
+                    is_correct,
+                ]
+
+        return stream_csv(request, "answers.csv", self.export_header, rows())
 
     export_as_csv.short_description = "Download selected answers as CSV"
 
 
 @admin.register(Feedback)
-class FeedbackAdmin(admin.ModelAdmin):
+class FeedbackAdmin(LargeTableAdminMixin, ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ("id", "submission", "rating", "rating_ui", "rating_difficulty", "rating_relevance", "created_at")
     list_filter = ("rating", "rating_ui", "rating_difficulty", "rating_relevance", "created_at")
+    list_select_related = ("submission__quiz",)
     search_fields = ("submission__phone", "comments")
     actions = ["export_as_csv"]
 
     def export_as_csv(self, request, queryset):
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = 'attachment; filename="feedback.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow([
-            "ID",
-            "Submission ID",
-            "Phone",
-            "Event",
-            "Overall Rating",
-            "UI/UX Rating",
-            "Difficulty Rating",
-            "Relevance Rating",
-            "Comments",
-            "Created At"
-        ])
-
-        for f in queryset.select_related("submission"):
-            writer.writerow([
-                f.id,
-                f.submission.id,
-                f.submission.phone,
-                f.submission.event,
-                f.rating,
-                f.rating_ui,
-                f.rating_difficulty,
-                f.rating_relevance,
-                f.comments,
-                f.created_at,
-            ])
-        return response
+        rows = queryset.using(reporting_db()).order_by("id").values_list(
+            "id",
+            "submission_id",
+            "submission__phone",
+            "submission__event",
+            "rating",
+            "rating_ui",
+            "rating_difficulty",
+            "rating_relevance",
+            "comments",
+            "created_at",
+        ).iterator(chunk_size=CHUNK_SIZE)
+        return stream_csv(
+            request,
+            "feedback.csv",
+            [
+                "ID",
+                "Submission ID",
+                "Phone",
+                "Event",
+                "Overall Rating",
+                "UI/UX Rating",
+                "Difficulty Rating",
+                "Relevance Rating",
+                "Comments",
+                "Created At"
+            ],
+            rows,
+        )
 
     export_as_csv.short_description = "Download selected feedback as CSV"
+
+
+@admin.register(Participant)
+class ParticipantAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
+    list_display = ("id", "event", "mobile", "name", "college", "updated_at")
+    list_filter = ("event",)
+    search_fields = ("mobile", "name", "college")
@@ -0,0 +1,123 @@
+"""
+Admission control at quiz start.
+
+A quiz with a start rate (Quiz.start_rate_per_minute) lets participants
+through prelims_entry at that pace. It uses a token bucket of
+QUIZ_ADMISSION_BURST_SECONDS worth of tokens, kept as a single "next free
+slot" clock in the shared cache (GCRA): every arrival advances the clock by
+one interval with an atomic incr, and the slot it got is when it may
+continue. The clock lives on the QUIZ_CACHE_ALIAS backend (quiz.tiered), so
+all workers draw from one bucket and the start rate holds however many
+processes serve the quiz.
+
+A participant whose slot is in the future gets a signed ticket holding the
+slot time and lands on the waiting room, which polls waiting_status. The
+status is computed from the ticket alone (no cache, session or database), so
+a crowd of waiting participants costs next to nothing. When the slot comes
+the waiting room posts back and registration continues as usual. Nobody is
+turned away; the start spike is spread over time.
+"""
+import math
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core import signing
+
+from .tiered import shared_cache
+
+
+ADMISSION_SALT = "quiz.admission"
+CLOCK_KEY = "quiz:admission:clock:{quiz_id}"
+RESTART_KEY = "quiz:admission:restart:{quiz_id}"
+BURST_SECONDS = getattr(settings, "QUIZ_ADMISSION_BURST_SECONDS", 10)
+TICKET_MAX_AGE = getattr(settings, "QUIZ_ADMISSION_TICKET_MAX_AGE", 2 * 60 * 60)
+
+
+@dataclass(frozen=True)
+class Ticket:
+    quiz_id: int
+    quiz_name: str
+    phone: str
+    slot_ms: int
+    interval_ms: int
+
+    def wait_seconds(self, now=None):
+        return max(0.0, (self.slot_ms - _now_ms(now)) / 1000)
+
+    def ready(self, now=None):
+        return self.slot_ms <= _now_ms(now)
+
+    def position(self, now=None):
+        """Roughly how many participants are still ahead in the queue."""
+        return math.ceil(max(0, self.slot_ms - _now_ms(now)) / self.interval_ms)
+
+    def status(self, now=None):
+        wait = self.wait_seconds(now)
+        return {
+            "ready": wait == 0,
+            "position": self.position(now),
+            "wait_seconds": math.ceil(wait),
+            # Poll less often while far back in the queue
+            "poll_seconds": min(10, max(2, math.ceil(wait / 4))),
+        }
+
+    def sign(self):
+        return signing.dumps(
+            {"q": self.quiz_id, "n": self.quiz_name, "p": self.phone, "s": self.slot_ms, "i": self.interval_ms},
+            salt=ADMISSION_SALT,
+            compress=True,
+        )
+
+
+def _now_ms(now=None):
+    return int((now or time.time()) * 1000)
+
+
+def read_ticket(token):
+    """The ticket, or None if it is forged or older than TICKET_MAX_AGE."""
+    try:
+        data = signing.loads(token, salt=ADMISSION_SALT, max_age=TICKET_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    return Ticket(quiz_id=data["q"], quiz_name=data["n"], phone=data["p"], slot_ms=data["s"], interval_ms=data["i"])
+
+
+def take_slot(quiz, phone, now=None):
+    """
+    Reserve the next start slot of a rate-limited quiz.
+
+    Returns None when the participant can continue right away (or the quiz has
+    no start rate), otherwise a Ticket for the waiting room.
+    """
+    rate = quiz.start_rate_per_minute
+    if not rate:
+        return None
+
+    now_ms = _now_ms(now)
+    interval = max(1, 60_000 // rate)
+    burst = BURST_SECONDS * 1000
+    key = CLOCK_KEY.format(quiz_id=quiz.id)
+    cache = shared_cache()
+
+    try:
+        clock = cache.incr(key, interval)
+    except ValueError:
+        cache.add(key, now_ms - burst, timeout=None)
+        clock = cache.incr(key, interval)
+    slot = clock - interval
+
+    if slot < now_ms - burst:
+        # The bucket has been full for a while: move the clock up to now. One
+        # arrival per second wins the restart and shifts the clock with incr,
+        # so increments made meanwhile by other workers still count; the
+        # others (the bucket is full, after all) just go ahead.
+        slot = now_ms - burst
+        if cache.add(RESTART_KEY.format(quiz_id=quiz.id), 1, timeout=1):
+            lag = slot + interval - cache.get(key, slot + interval)
+            if lag > 0:
+                cache.incr(key, lag)
+
+    if slot <= now_ms:
+        return None
+    return Ticket(quiz_id=quiz.id, quiz_name=quiz.name, phone=phone, slot_ms=slot, interval_ms=interval)
@@ -0,0 +1,94 @@
+"""
+Per-question item analysis.
+
+QuestionStats holds running sums per question (responses, correct, option
+counts, and sums of the respondents' total scores). They are bumped with one
+UPDATE per question for every batch the ingestion writer commits, and can be
+rebuilt for a whole quiz with a single grouped aggregate over Answer (plus a
+pass over any packed submissions, quiz/packing.py).
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import Answer, QuestionStats
+from .packing import packed_stats
+from .routers import db_for_quiz
+
+
+COUNTERS = (
+    "responses",
+    "correct",
+    "unanswered",
+    "chose_a",
+    "chose_b",
+    "chose_c",
+    "chose_d",
+    "score_sum",
+    "score_sq_sum",
+    "correct_score_sum",
+)
+
+
+def record_batch(rows):
+    """Add freshly committed (submission_id, GradedSubmission) rows to the stats."""
+    deltas = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for _, item in rows:
+        for question_id, selected, _correct, is_correct in item.answers:
+            d = deltas[question_id]
+            d["responses"] += 1
+            d["score_sum"] += item.score
+            d["score_sq_sum"] += item.score * item.score
+            if is_correct:
+                d["correct"] += 1
+                d["correct_score_sum"] += item.score
+            if selected in ("A", "B", "C", "D"):
+                d[f"chose_{selected.lower()}"] += 1
+            else:
+                d["unanswered"] += 1
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        QuestionStats.objects.bulk_create(
+            [QuestionStats(question_id=qid) for qid in deltas], ignore_conflicts=True
+        )
+        for qid, d in deltas.items():
+            QuestionStats.objects.filter(question_id=qid).update(
+                **{name: F(name) + value for name, value in d.items() if value}
+            )
+
+
+def rebuild_quiz_stats(quiz):
+    """Recompute every question's stats for `quiz` from its answers, packed or not."""
+    score = F("submission__score")
+    totals = (
+        Answer.objects.using(db_for_quiz(quiz.id))
+        .filter(question__quiz=quiz)
+        .values("question_id")
+        .annotate(
+            responses=Count("id"),
+            correct=Count("id", filter=Q(is_correct=True)),
+            unanswered=Count("id", filter=~Q(selected_option__in=["A", "B", "C", "D"])),
+            chose_a=Count("id", filter=Q(selected_option="A")),
+            chose_b=Count("id", filter=Q(selected_option="B")),
+            chose_c=Count("id", filter=Q(selected_option="C")),
+            chose_d=Count("id", filter=Q(selected_option="D")),
+            score_sum=Sum(score),
+            score_sq_sum=Sum(score * score),
+            correct_score_sum=Sum(score, filter=Q(is_correct=True), default=0),
+        )
+        .order_by()
+    )
+    merged = {row.pop("question_id"): row for row in totals}
+    for question_id, counters in packed_stats(quiz, db_for_quiz(quiz.id)).items():
+        row = merged.setdefault(question_id, {})
+        for name, value in counters.items():
+            row[name] = (row.get(name) or 0) + value
+    stats = [QuestionStats(question_id=question_id, **row) for question_id, row in merged.items()]
+
+    with transaction.atomic():
+        QuestionStats.objects.filter(question__quiz=quiz).delete()
+        QuestionStats.objects.bulk_create(stats)
+    return stats
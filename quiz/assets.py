@@ -0,0 +1,150 @@
+"""
+Static asset pipeline.
+
+`manage.py build_static` turns the 2574x3235 static/fav.png into right-sized
+icons under static/icons/ and then runs collectstatic. The static files storage
+below writes every file under a content-hashed name (styles.<hash>.css) along
+with .gz copies, and .br copies too when the brotli package is installed.
+serve_static() serves STATIC_ROOT with the precompressed copy matching the
+client's Accept-Encoding. Hashed names get a one-year immutable Cache-Control.
+
+In production a reverse proxy should serve STATIC_ROOT the same way
+(gzip_static / brotli_static on, "expires max" for hashed names).
+QUIZ_SERVE_STATIC=1 lets Django do it, e.g. for a single-box event setup.
+"""
+import gzip
+import mimetypes
+import posixpath
+import re
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from PIL import Image
+
+try:
+    import brotli
+except ImportError:  # optional; only gzip copies are written without it
+    brotli = None
+
+
+# name, size, background (None keeps transparency)
+ICON_VARIANTS = [
+    ("favicon-16.png", 16, None),
+    ("favicon-32.png", 32, None),
+    ("icon-192.png", 192, None),
+    ("apple-touch-icon.png", 180, (255, 255, 255)),  # iOS wants an opaque icon
+]
+ICO_SIZES = [(16, 16), (32, 32), (48, 48)]
+
+COMPRESSIBLE = (".css", ".js", ".svg", ".txt", ".html", ".json", ".map", ".ico", ".xml")
+MIN_COMPRESS_SIZE = 256   # bytes; smaller files aren't worth an extra request path
+
+# name.0123456789ab.ext, as written by ManifestStaticFilesStorage
+HASHED_NAME = re.compile(r"\.[0-9a-f]{12}\.[^./]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def square(image, background=None):
+    """Pad the image to a square canvas, centred, so resizing keeps its proportions."""
+    side = max(image.size)
+    canvas = Image.new("RGBA", (side, side), (*background, 255) if background else (0, 0, 0, 0))
+    canvas.paste(image, ((side - image.width) // 2, (side - image.height) // 2), image)
+    return canvas
+
+
+def build_icons(source, target_dir):
+    """Write the icon variants of `source` into `target_dir`; returns the paths written."""
+    target_dir = Path(target_dir)
+    target_dir.mkdir(parents=True, exist_ok=True)
+    original = Image.open(source).convert("RGBA")
+
+    written = []
+    for name, size, background in ICON_VARIANTS:
+        icon = square(original, background).resize((size, size), Image.LANCZOS)
+        if background:
+            icon = icon.convert("RGB")
+        path = target_dir / name
+        icon.save(path, optimize=True)
+        written.append(path)
+
+    path = target_dir / "favicon.ico"
+    square(original).resize((48, 48), Image.LANCZOS).save(path, sizes=ICO_SIZES)
+    written.append(path)
+    return written
+
+
+def gzip_bytes(data):
+    buffer = BytesIO()
+    # mtime=0 keeps the output reproducible across builds
+    with gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=9, mtime=0) as f:
+        f.write(data)
+    return buffer.getvalue()
+
+
+class PrecompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Hashed file names (via the manifest) plus .gz/.br siblings of text assets."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in list(self.hashed_files.values()) + list(paths):
+            if not name.endswith(COMPRESSIBLE) or not self.exists(name):
+                continue
+            with self.open(name) as f:
+                data = f.read()
+            if len(data) < MIN_COMPRESS_SIZE:
+                continue
+            self._save_compressed(name + ".gz", gzip_bytes(data), len(data))
+            if brotli is not None:
+                self._save_compressed(name + ".br", brotli.compress(data, quality=11), len(data))
+
+    def _save_compressed(self, name, data, original_size):
+        if len(data) >= original_size:
+            return
+        if self.exists(name):
+            self.delete(name)
+        self._save(name, ContentFile(data))
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # collectstatic hasn't run (development, tests): link the plain file
+            if self.hashed_files:
+                raise
+            return name
+
+
+def serve_static(request, path):
+    """Serve a collected static file, preferring a precompressed copy."""
+    path = posixpath.normpath(path).lstrip("/")
+    try:
+        full_path = Path(safe_join(settings.STATIC_ROOT, path))
+    except SuspiciousFileOperation:
+        raise Http404("Bad path")
+    if not full_path.is_file():
+        raise Http404(f"{path} not found")
+
+    content_type, _ = mimetypes.guess_type(str(full_path))
+    accepted = request.headers.get("Accept-Encoding", "")
+    chosen, encoding = full_path, None
+    for suffix, name in ((".br", "br"), (".gz", "gzip")):
+        candidate = full_path.with_name(full_path.name + suffix)
+        if name in accepted and candidate.is_file():
+            chosen, encoding = candidate, name
+            break
+
+    response = FileResponse(chosen.open("rb"), content_type=content_type or "application/octet-stream")
+    if encoding:
+        response["Content-Encoding"] = encoding
+    patch_vary_headers(response, ["Accept-Encoding"])
+    response["Cache-Control"] = IMMUTABLE if HASHED_NAME.search(path) else "public, max-age=3600"
+    return response
@@ -0,0 +1,247 @@
+"""
+Async versions of the participant-facing views.
+
+Served when QUIZ_ASYNC_VIEWS is on (see quizsys/asgi.py for the deployment
+profile). The session, Quiz/Submission lookups and the registration check are
+awaited instead of blocking a thread, so a participant waiting on the college
+server or on a slow connection costs a coroutine rather than a worker. The
+in-memory helpers shared with the sync views (bank snapshot, attempt registry,
+ingestion queue) may touch the database on a cold start, so they are called
+through sync_to_async. So are the shared-cache calls (admission clock, ops
+counters, result snapshots), which wait on Redis or a file lock, and template
+rendering; none of them may run on the event loop.
+"""
+import re
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.shortcuts import redirect, render
+from django.template.loader import render_to_string
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_POST
+
+from . import ops
+from .admission import read_ticket, take_slot
+from .attempts import attempts
+from .bank import get_question_bank
+from .catalog import catalog_fragment, catalog_quiz
+from .delivery import shell_delivery
+from .ingest import ingest, make_receipt
+from .models import Feedback, Quiz, Submission
+from .packing import load_answers
+from .papers import (
+    CSRF_PLACEHOLDER,
+    assign_variant,
+    new_seeded_paper,
+    render_shell_page,
+    render_variant_page,
+    splice_participant,
+)
+from .registration import averify_participant
+from .results import cached_result, not_modified, result_response, store_result
+from .routers import db_for_quiz, pin_to_primary
+from .views import grade_submission, result_details, result_redirect
+
+
+PHONE_RE = re.compile(r"^[6-9]\d{9}$")
+
+has_attempted = sync_to_async(attempts.has_attempted)
+question_bank = sync_to_async(get_question_bank)
+# The catalog is loaded from the database on a cache miss
+find_in_catalog = sync_to_async(catalog_quiz)
+landing_catalog = sync_to_async(catalog_fragment)
+# Shared-cache calls never touch the database, so any worker thread will do
+claim_slot = sync_to_async(take_slot, thread_sensitive=False)
+count_login = sync_to_async(ops.login, thread_sensitive=False)
+count_start = sync_to_async(ops.quiz_started, thread_sensitive=False)
+count_submit = sync_to_async(ops.submitted, thread_sensitive=False)
+result_snapshot = sync_to_async(cached_result, thread_sensitive=False)
+keep_result = sync_to_async(store_result, thread_sensitive=False)
+
+
+async def landing_error(request, error=""):
+    return render(
+        request, "prelims_landing.html", {"step": 1, "error": error, "catalog_html": await landing_catalog()}
+    )
+
+
+async def get_quiz_or_404(**lookup):
+    try:
+        return await Quiz.objects.aget(**lookup)
+    except (Quiz.DoesNotExist, ValueError):
+        raise Http404("No Quiz matches the given query.")
+
+
+@never_cache
+async def prelims_entry(request):
+    if request.method != "POST":
+        return await landing_error(request)
+
+    quiz_id = request.POST.get("event")
+    phone = request.POST.get("phone", "").strip()
+
+    if not quiz_id or not phone:
+        return await landing_error(request, "Please select an event and enter phone number.")
+    if not PHONE_RE.match(phone):
+        return await landing_error(request, "Enter a valid 10-digit Indian mobile number starting with 6–9.")
+
+    quiz_obj = await find_in_catalog(quiz_id)
+    if quiz_obj is None:
+        return await landing_error(request, "Invalid event selected.")
+    if not quiz_obj.is_active:
+        return await landing_error(request, "This quiz is not active yet.")
+
+    if await has_attempted(quiz_obj.id, phone):
+        return await landing_error(request, "You have already attempted this quiz. Multiple attempts are not allowed.")
+
+    ticket = await claim_slot(quiz_obj, phone)
+    if ticket is not None:
+        return redirect("waiting_room", ticket=ticket.sign())
+
+    return await register_participant(request, quiz_obj, phone)
+
+
+async def register_participant(request, quiz_obj, phone):
+    leader_name, institution, api_error = await averify_participant(quiz_obj.name, phone)
+    await count_login(quiz_obj.id)
+
+    await request.session.aset("participant_phone", phone)
+    await request.session.aset("participant_event", str(quiz_obj.id))
+    await request.session.aset(
+        "temp_team_data",
+        {
+            "participant_name": leader_name or "Unknown Participant",
+            "event_display": quiz_obj.name,
+            "institution": institution or "Unknown Institution",
+        },
+    )
+    await request.session.aset("temp_api_error", api_error)
+    return redirect("prelims_confirm")
+
+
+@never_cache
+async def waiting_room(request, ticket):
+    admission = read_ticket(ticket)
+    if admission is None:
+        return await landing_error(request, "Your place in the queue has expired. Please login again.")
+
+    if request.method != "POST" or not admission.ready():
+        return render(
+            request,
+            "waiting_room.html",
+            {"quiz_name": admission.quiz_name, "ticket": ticket, "status": admission.status()},
+        )
+
+    quiz_obj = await find_in_catalog(admission.quiz_id)
+    if quiz_obj is None or not quiz_obj.is_active or await has_attempted(quiz_obj.id, admission.phone):
+        return redirect("prelims_entry")
+    return await register_participant(request, quiz_obj, admission.phone)
+
+
+@never_cache
+async def quiz_page(request, quiz_id):
+    session_phone = await request.session.aget("participant_phone")
+    if not session_phone:
+        return await landing_error(request, "Session expired or invalid. Please login again.")
+
+    quiz = await get_quiz_or_404(id=quiz_id)
+
+    session_event = await request.session.aget("participant_event")
+    if str(session_event) != str(quiz_id):
+        return await landing_error(request, "Invalid event access. Please select correct event.")
+
+    if await has_attempted(quiz.id, session_phone):
+        return await landing_error(request, "You have already attempted this quiz. Multiple attempts are not allowed.")
+
+    bank = await question_bank(quiz.id)
+    await count_start(quiz, session_phone)
+
+    if shell_delivery():
+        html = await sync_to_async(render_shell_page)(quiz, bank)
+        return HttpResponse(splice_participant(request, html, session_phone))
+
+    variant = assign_variant(bank, session_phone)
+    if variant is not None:
+        html = await sync_to_async(render_variant_page)(quiz, bank, variant)
+        return HttpResponse(splice_participant(request, html, session_phone))
+
+    question_data, paper_token = new_seeded_paper(bank, quiz.num_questions)
+    return await sync_to_async(render)(
+        request,
+        "quiz.html",
+        {
+            "quiz": quiz,
+            "questions": question_data,
+            "duration_seconds": quiz.duration_minutes * 60,
+            "participant_phone": session_phone,
+            "participant_event": session_event,
+            "paper_token": paper_token,
+        },
+    )
+
+
+@require_POST
+async def submit_quiz(request, quiz_id):
+    quiz = await get_quiz_or_404(pk=quiz_id)
+
+    phone = await request.session.aget("participant_phone") or request.POST.get("phone")
+    event = await request.session.aget("participant_event") or request.POST.get("event")
+    if not phone:
+        return await landing_error(request, "Session expired or invalid. Please login again.")
+
+    if await has_attempted(quiz.id, phone):
+        return redirect("submission_receipt", receipt=await sync_to_async(make_receipt)(quiz.id, phone))
+
+    bank = await question_bank(quiz.id)
+    graded = grade_submission(quiz, bank, request.POST, phone, event)
+    submission_id, receipt = await sync_to_async(ingest)(graded)
+    await count_submit(quiz.id, graded.score)
+
+    for key in ("participant_phone", "participant_event", "temp_team_data", "temp_api_error"):
+        await request.session.apop(key, None)
+    # Kept so the participant can look up their own standing (leaderboard_api)
+    await request.session.aset("leaderboard_phone", phone)
+
+    if submission_id is None:
+        return pin_to_primary(redirect("submission_receipt", receipt=receipt))
+    return pin_to_primary(result_redirect(quiz.id, submission_id))
+
+
+async def quiz_result(request, submission_id, quiz_id=None):
+    # The ETag/Last-Modified checks of the sync view's @condition, which would
+    # call the cache from the event loop
+    snapshot = await result_snapshot(request, submission_id, quiz_id)
+    if snapshot is not None:
+        return not_modified(request, snapshot) or result_response(request, snapshot)
+
+    submissions = Submission.objects.using(db_for_quiz(quiz_id) if quiz_id is not None else "default")
+    lookup = {"quiz_id": quiz_id} if quiz_id is not None else {}
+    try:
+        submission = await submissions.select_related("quiz").aget(id=submission_id, **lookup)
+    except Submission.DoesNotExist:
+        raise Http404("No Submission matches the given query.")
+
+    show_results = submission.quiz.show_results
+    details = []
+    if show_results:
+        details = result_details(await sync_to_async(load_answers)(submission))
+
+    feedback_submitted = await Feedback.objects.using(submission._state.db).filter(submission_id=submission.id).aexists()
+
+    html = await sync_to_async(render_to_string)(
+        "quiz_result.html",
+        {
+            "quiz": submission.quiz,
+            "phone": submission.phone,
+            "event": submission.event,
+            "score": submission.score,
+            "total": submission.total_questions,
+            "details": details,
+            "submission": submission,
+            "submission_id": submission.id,
+            "feedback_submitted": feedback_submitted,
+            "show_results": show_results,
+            "csrf_token": CSRF_PLACEHOLDER,
+        },
+    )
+    return result_response(request, await keep_result(submission, html))
@@ -0,0 +1,80 @@
+"""
+Fast "already attempted" checks.
+
+prelims_entry, quiz_page and submit_quiz all need to know whether a phone has
+already attempted a quiz. Each process keeps the set of phones per quiz, loaded
+from the database the first time the quiz is checked and updated on every
+submit; attempts recorded by other workers are seen through a marker in the
+shared cache (quiz.tiered.shared_cache). The unique (quiz, phone) constraint
+on Submission remains the final word, so a miss here can never produce a
+second attempt.
+
+Deleting a submission (to allow a retry) has to unblock the phone in every
+worker: forget() drops the marker and bumps the "attempts:{quiz_id}"
+namespace version in quiz.tiered, and each process reloads a set whose
+version is out of date.
+"""
+import threading
+
+from django.conf import settings
+
+from .models import Submission
+from .routers import db_for_quiz
+from .tiered import shared_cache, tiered
+
+
+ATTEMPT_KEY = "quiz:attempted:{quiz_id}:{phone}"
+ATTEMPTS_NAMESPACE = "attempts:{quiz_id}"
+
+
+class AttemptRegistry:
+    def __init__(self):
+        self._phones = {}  # quiz_id -> (namespace version, set of phones)
+        self._lock = threading.Lock()
+
+    def _phones_for(self, quiz_id):
+        version = tiered.version(ATTEMPTS_NAMESPACE.format(quiz_id=quiz_id))
+        entry = self._phones.get(quiz_id)
+        if entry is None or entry[0] != version:
+            loaded = set(
+                Submission.objects.using(db_for_quiz(quiz_id))
+                .filter(quiz_id=quiz_id)
+                .values_list("phone", flat=True)
+            )
+            with self._lock:
+                # Another thread may have warmed it (and recorded more) meanwhile
+                entry = self._phones.get(quiz_id)
+                if entry is None or entry[0] != version:
+                    entry = self._phones[quiz_id] = (version, loaded)
+        return entry[1]
+
+    def has_attempted(self, quiz_id, phone):
+        quiz_id = int(quiz_id)
+        if phone in self._phones_for(quiz_id):
+            return True
+        return shared_cache().get(ATTEMPT_KEY.format(quiz_id=quiz_id, phone=phone)) is not None
+
+    def record(self, quiz_id, phone):
+        quiz_id = int(quiz_id)
+        self._phones_for(quiz_id).add(phone)
+        shared_cache().set(
+            ATTEMPT_KEY.format(quiz_id=quiz_id, phone=phone),
+            1,
+            getattr(settings, "QUIZ_ATTEMPT_MARKER_TTL", 24 * 60 * 60),
+        )
+
+    def forget(self, quiz_id, phone=None):
+        """
+        Let `phone` (or, without one, anybody whose submission is gone)
+        attempt `quiz_id` again, in every process; call after deleting
+        submissions.
+        """
+        quiz_id = int(quiz_id)
+        if phone is not None:
+            shared_cache().delete(ATTEMPT_KEY.format(quiz_id=quiz_id, phone=phone))
+        tiered.invalidate(ATTEMPTS_NAMESPACE.format(quiz_id=quiz_id))
+        with self._lock:
+            self._phones.pop(quiz_id, None)
+
+
+attempts = AttemptRegistry()
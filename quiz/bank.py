@@ -0,0 +1,174 @@
+"""
+Per-quiz question-bank cache.
+
+quiz_page only needs a random handful of questions, but picking them used to
+load the whole bank from the database for every participant. The bank is now
+read once per process into an immutable snapshot and reused until a Quiz or
+Question is saved/deleted (see quiz.signals), which bumps the quiz's version.
+The quiz's pre-built paper variants travel with the same snapshot.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import MappingProxyType
+
+from django.conf import settings
+
+from .models import Question, PaperVariant
+from .tiered import tiered
+
+
+BANK_NAMESPACE = "quiz:{quiz_id}"
+
+
+@dataclass(frozen=True)
+class BankQuestion:
+    """Read-only copy of a Question row, safe to share between requests."""
+    id: int
+    quiz_id: int
+    text_html: str
+    image_url: str
+    options: tuple  # (("A", text), ("B", text), ...)
+    correct_option: str
+    # Resized copies (see quiz.images); empty until the image is processed
+    image_width: int = None
+    image_height: int = None
+    image_srcset: str = ""       # WebP
+    image_jpeg_srcset: str = ""
+
+    def option_text(self, letter):
+        for key, text in self.options:
+            if key == letter:
+                return text
+        return None
+
+
+@dataclass(frozen=True)
+class BankVariant:
+    index: int
+    question_ids: tuple
+    option_orders: tuple  # one "CADB"-style string per question
+
+
+@dataclass(frozen=True)
+class QuestionBank:
+    quiz_id: int
+    version: int
+    questions: tuple  # ordered by question id
+    by_id: MappingProxyType
+    variants: tuple = ()  # BankVariant, ordered by index
+
+    def __len__(self):
+        return len(self.questions)
+
+    def __contains__(self, question_id):
+        return question_id in self.by_id
+
+
+def bank_version(quiz_id):
+    """
+    Current version of a quiz's bank.
+
+    Kept as a namespace version in the shared tier of quiz.tiered, so a bump
+    made by any worker (an admin edit) reaches every other worker within
+    QUIZ_CACHE_SYNC_INTERVAL, without a cache round trip per request.
+    """
+    return tiered.version(BANK_NAMESPACE.format(quiz_id=quiz_id))
+
+
+def bump_bank_version(quiz_id):
+    tiered.invalidate(BANK_NAMESPACE.format(quiz_id=quiz_id))
+
+
+def _image_fields(question):
+    if not question.image:
+        return {"image_url": ""}
+    variants = question.image_variants or {}
+    if variants.get("source") != question.image.name or not variants.get("jpeg"):
+        return {"image_url": question.image.url}
+
+    storage = question.image.storage
+    return {
+        # The largest JPEG copy stands in for the camera original
+        "image_url": storage.url(variants["jpeg"][-1][1]),
+        "image_width": question.image_width,
+        "image_height": question.image_height,
+        "image_srcset": srcset(storage, variants.get("webp", [])),
+        "image_jpeg_srcset": srcset(storage, variants["jpeg"]),
+    }
+
+
+def srcset(storage, entries):
+    return ", ".join(f"{storage.url(name)} {width}w" for width, name in entries)
+
+
+def _snapshot(question):
+    return BankQuestion(
+        id=question.id,
+        quiz_id=question.quiz_id,
+        text_html=question.text_html,
+        **_image_fields(question),
+        options=(
+            ("A", question.option_a),
+            ("B", question.option_b),
+            ("C", question.option_c),
+            ("D", question.option_d),
+        ),
+        correct_option=(question.correct_option or "").strip().upper(),
+    )
+
+
+def load_question_bank(quiz_id, version):
+    questions = tuple(
+        _snapshot(q) for q in Question.objects.filter(quiz_id=quiz_id).order_by("id")
+    )
+    variants = tuple(
+        BankVariant(index=index, question_ids=tuple(qids), option_orders=tuple(orders))
+        for index, qids, orders in PaperVariant.objects.filter(quiz_id=quiz_id)
+        .order_by("index")
+        .values_list("index", "question_ids", "option_orders")
+    )
+    return QuestionBank(
+        quiz_id=quiz_id,
+        version=version,
+        questions=questions,
+        by_id=MappingProxyType({q.id: q for q in questions}),
+        variants=variants,
+    )
+
+
+class QuestionBankCache:
+    """Bounded LRU of QuestionBank snapshots keyed by quiz id."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._banks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, quiz_id):
+        version = bank_version(quiz_id)
+        with self._lock:
+            bank = self._banks.get(quiz_id)
+            if bank is not None and bank.version == version:
+                self._banks.move_to_end(quiz_id)
+                return bank
+
+            # Load while holding the lock so a burst of quiz starts in this
+            # process results in a single bank read, not one per request.
+            bank = load_question_bank(quiz_id, version)
+            self._banks[quiz_id] = bank
+            self._banks.move_to_end(quiz_id)
+            while len(self._banks) > self.max_size:
+                self._banks.popitem(last=False)
+            return bank
+
+    def clear(self):
+        with self._lock:
+            self._banks.clear()
+
+
+_bank_cache = QuestionBankCache(getattr(settings, "QUIZ_BANK_CACHE_SIZE", 16))
+
+
+def get_question_bank(quiz_id):
+    return _bank_cache.get(int(quiz_id))
@@ -0,0 +1,73 @@
+"""
+Cached quiz catalog for the landing page.
+
+prelims_entry used to list Quiz.objects.all() on every GET and again on each
+of its error branches, and quiz_page/submit_quiz did the same on theirs, so a
+login rush full of typos hammered a table that changes twice a day. The
+catalog is now a read model of plain CatalogQuiz tuples, and the landing
+page's event grid (quiz_catalog.html) is rendered once from it. Both live in
+the "catalog" namespace of quiz.tiered, which quiz.signals invalidates when a
+Quiz is saved or deleted, so every worker sees an edit within a second.
+
+A validation failure on the landing page then costs no queries: the event is
+checked against the catalog and the page reuses the cached fragment.
+"""
+from dataclasses import dataclass
+
+from django.template.loader import render_to_string
+
+from .models import Quiz
+from .tiered import tiered
+
+
+CATALOG_NAMESPACE = "catalog"
+
+
+@dataclass(frozen=True)
+class CatalogQuiz:
+    """What the entry flow needs to know about a quiz, without its row."""
+    id: int
+    name: str
+    description: str
+    is_active: bool
+    duration_minutes: int
+    start_rate_per_minute: int = None
+
+
+def load_catalog():
+    return tuple(
+        CatalogQuiz(*row)
+        for row in Quiz.objects.order_by("id").values_list(
+            "id", "name", "description", "is_active", "duration_minutes", "start_rate_per_minute"
+        )
+    )
+
+
+def catalog():
+    """Every quiz, in id order."""
+    return tiered.get_or_set(CATALOG_NAMESPACE, "quizzes", load_catalog)
+
+
+def catalog_quiz(quiz_id):
+    """The catalog entry of `quiz_id` (as posted, so possibly junk), or None."""
+    try:
+        quiz_id = int(quiz_id)
+    except (TypeError, ValueError):
+        return None
+    for quiz in catalog():
+        if quiz.id == quiz_id:
+            return quiz
+    return None
+
+
+def catalog_fragment():
+    """The landing page's event grid, rendered once per catalog version."""
+    return tiered.get_or_set(
+        CATALOG_NAMESPACE,
+        "fragment",
+        lambda: render_to_string("quiz_catalog.html", {"quizzes": catalog()}),
+    )
+
+
+def invalidate_catalog():
+    tiered.invalidate(CATALOG_NAMESPACE)
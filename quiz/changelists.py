@@ -0,0 +1,95 @@
+"""
+Admin changelists for the big tables (Submission, Answer, Feedback).
+
+The stock changelist runs an exact COUNT(*) of the filtered rows, another of
+the whole table, and pages with OFFSET, which gets slower the further back
+you page. LargeTableAdminMixin swaps in:
+
+- EstimatedCountPaginator: an unfiltered table is sized from its primary key
+  range (two index lookups), a filtered one is counted only up to
+  QUIZ_ADMIN_COUNT_LIMIT rows and shown as "about N";
+- show_full_result_count = False, so the second count is skipped;
+- SeekChangeList: in the default newest-first order, "Older" links carry the
+  last id shown (?before=<id>) and the next page is a `pk < id` range scan.
+  Sorting by another column falls back to numbered pages.
+
+Admins using it still need list_select_related for the columns they show.
+"""
+from django.conf import settings
+from django.contrib.admin.views.main import ALL_VAR, ORDER_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db.models import Max, Min
+from django.utils.functional import cached_property
+
+
+SEEK_VAR = "before"
+COUNT_LIMIT = getattr(settings, "QUIZ_ADMIN_COUNT_LIMIT", 10_000)
+
+
+class EstimatedCountPaginator(Paginator):
+    estimated = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            # Overestimates by the number of deleted rows; fine for "about N"
+            bounds = queryset.order_by().aggregate(low=Min("pk"), high=Max("pk"))
+            self.estimated = True
+            return 0 if bounds["low"] is None else bounds["high"] - bounds["low"] + 1
+        count = queryset.order_by().values("pk")[: COUNT_LIMIT + 1].count()
+        if count > COUNT_LIMIT:
+            self.estimated = True
+            return COUNT_LIMIT
+        return count
+
+
+class SeekChangeList(ChangeList):
+    seek_before = None
+    seek_next_url = seek_first_url = None
+
+    def __init__(self, request, *args, **kwargs):
+        # Keyset pages only make sense in the default (newest id first) order
+        self.seeking = ORDER_VAR not in request.GET and ALL_VAR not in request.GET
+        before = request.GET.get(SEEK_VAR, "")
+        if self.seeking and before.isdigit():
+            self.seek_before = int(before)
+        super().__init__(request, *args, **kwargs)
+
+        if self.seeking:
+            self.result_list = list(self.result_list)
+            if len(self.result_list) >= self.list_per_page:
+                self.seek_next_url = self.get_query_string({SEEK_VAR: self.result_list[-1].pk})
+            if self.seek_before is not None:
+                self.seek_first_url = self.get_query_string()
+
+    def get_filters_params(self, params=None):
+        params = super().get_filters_params(params)
+        params.pop(SEEK_VAR, None)
+        return params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Filter, search and sort links start again from the newest rows
+        return super().get_query_string({SEEK_VAR: None, **(new_params or {})}, remove)
+
+    def get_queryset(self, request, exclude_parameters=None):
+        if self.model_admin.get_ordering(request):
+            self.seeking, self.seek_before = False, None
+        queryset = super().get_queryset(request, exclude_parameters)
+        if self.seek_before is not None:
+            queryset = queryset.filter(pk__lt=self.seek_before)
+        return queryset
+
+    def get_results(self, request):
+        if self.seeking:
+            self.page_num = 1
+        super().get_results(request)
+
+
+class LargeTableAdminMixin:
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = "admin/quiz/large_change_list.html"
+
+    def get_changelist(self, request, **kwargs):
+        return SeekChangeList
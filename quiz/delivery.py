@@ -0,0 +1,116 @@
+"""
+JSON question delivery.
+
+Every quiz page used to be a unique HTML document, so each participant pulled
+the full text of their questions through Django. The same bytes are now also
+served as two JSON resources:
+
+- the bank payload (bank_api): every question of an active quiz with its
+  options and image URLs, but never the answer key. It only changes with the
+  bank version, so the versioned URL is immutable and public: a browser,
+  reverse proxy or CDN can answer it for everyone. The unversioned URL is
+  cached for QUIZ_BANK_API_MAX_AGE seconds and revalidated by ETag.
+- the participant's paper (paper_api): just the question ids with their
+  option order, the signed paper token and the bank URL to fetch. A few
+  hundred bytes, private and never cached.
+
+With QUIZ_PAPER_DELIVERY = "shell", quiz_page serves quiz.html as a shell
+(rendered once per quiz and bank version, like the variant pages) that builds
+the paper in the browser from these two. Both resources answer 404 in the
+default "html" mode, where nothing needs them.
+"""
+import hashlib
+import json
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.urls import reverse
+
+from .bank import BANK_NAMESPACE
+from .papers import assign_variant, make_paper_token, new_seeded_paper, paper_ids, variant_questions
+from .tiered import tiered
+
+
+BANK_MAX_AGE = getattr(settings, "QUIZ_BANK_API_MAX_AGE", 30)
+
+
+@dataclass(frozen=True)
+class BankDocument:
+    quiz_id: int
+    version: int
+    body: bytes
+    etag: str
+
+
+def shell_delivery():
+    return getattr(settings, "QUIZ_PAPER_DELIVERY", "html") == "shell"
+
+
+def _question_payload(q):
+    image = None
+    if q.image_url:
+        image = {
+            "url": q.image_url,
+            "width": q.image_width,
+            "height": q.image_height,
+            "srcset": q.image_srcset,
+            "jpeg_srcset": q.image_jpeg_srcset,
+        }
+    return {
+        "id": q.id,
+        "text_html": q.text_html,
+        "image": image,
+        "options": dict(q.options),
+    }
+
+
+def bank_payload(bank):
+    """The public part of a bank; the answer key stays on the server."""
+    return {
+        "quiz": bank.quiz_id,
+        "version": bank.version,
+        "questions": [_question_payload(q) for q in bank.questions],
+    }
+
+
+def bank_document(bank):
+    """The serialized payload of `bank`, built once per version and shared through quiz.tiered."""
+    def build():
+        body = json.dumps(bank_payload(bank), separators=(",", ":")).encode()
+        return BankDocument(
+            quiz_id=bank.quiz_id,
+            version=bank.version,
+            body=body,
+            etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+        )
+
+    return tiered.get_or_set(BANK_NAMESPACE.format(quiz_id=bank.quiz_id), f"payload:{bank.version}", build)
+
+
+def bank_url(bank):
+    return reverse("quiz_bank_version_api", kwargs={"quiz_id": bank.quiz_id, "version": bank.version})
+
+
+def participant_paper(quiz, bank, phone):
+    """
+    A participant's paper as JSON data: [(question id, option order), ...] and
+    the token that submit_quiz grades against. Variant quizzes hand out the
+    participant's variant, others a freshly seeded paper, as quiz_page does.
+    """
+    variant = assign_variant(bank, phone)
+    if variant is not None:
+        question_data = variant_questions(bank, variant)
+        num = min(quiz.num_questions, len(bank))
+        token = make_paper_token(bank, num, paper_ids(question_data), variant=variant)
+    else:
+        question_data, token = new_seeded_paper(bank, quiz.num_questions)
+    return {
+        "quiz": quiz.id,
+        "version": bank.version,
+        "bank": bank_url(bank),
+        "duration_seconds": quiz.duration_minutes * 60,
+        "paper": token,
+        "questions": [
+            [item["obj"].id, "".join(letter for letter, _ in item["options"])] for item in question_data
+        ],
+    }
@@ -0,0 +1,90 @@
+"""
+File-based cache that the quiz's shared counters can rely on.
+
+Selected for CACHES["quiz"] when no Redis is configured. Django's
+FileBasedCache implements add() and incr() as a read followed by a write, so
+two workers can both "add" a key or lose each other's increments. Here both
+run under an exclusive flock on a lock file in the cache directory, which
+makes them atomic across every process sharing the directory (as Redis's
+SET NX and INCR are). incr() also keeps the entry's expiry, where
+FileBasedCache would reset it to the default timeout, so counters created with
+timeout=None stay.
+
+FileBasedCache also lists the whole directory on every set() to cull it, and
+culls at 300 entries by default, far below the number of keys a quiz keeps
+(counters, markers, snapshots). The cull runs at most every CULL_INTERVAL
+seconds here; set a generous MAX_ENTRIES in OPTIONS.
+"""
+import os
+import pickle
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files import locks
+from django.core.files.move import file_move_safe
+
+
+LOCK_FILE = "quiz.lock"
+CULL_INTERVAL = 60
+
+
+class LockedFileBasedCache(FileBasedCache):
+    _thread_lock = threading.Lock()
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._last_cull = 0.0
+
+    @contextmanager
+    def _locked(self):
+        # The flock serializes processes, the thread lock this process's threads
+        with self._thread_lock:
+            self._createdir()
+            with open(os.path.join(self._dir, LOCK_FILE), "ab") as f:
+                locks.lock(f, locks.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    locks.unlock(f)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked():
+            return super().add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        fname = self._key_to_file(key, version)
+        with self._locked():
+            try:
+                with open(fname, "rb") as f:
+                    if self._is_expired(f):
+                        raise ValueError(f"Key '{key}' not found")
+                    f.seek(0)
+                    expiry = pickle.load(f)
+                    value = pickle.loads(zlib.decompress(f.read())) + delta
+            except FileNotFoundError:
+                raise ValueError(f"Key '{key}' not found")
+
+            fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+            renamed = False
+            try:
+                with open(fd, "wb") as f:
+                    f.write(pickle.dumps(expiry, self.pickle_protocol))
+                    f.write(zlib.compress(pickle.dumps(value, self.pickle_protocol)))
+                file_move_safe(tmp_path, fname, allow_overwrite=True)
+                renamed = True
+            finally:
+                if not renamed:
+                    os.remove(tmp_path)
+            return value
+
+    def _cull(self):
+        now = time.monotonic()
+        if now - self._last_cull < CULL_INTERVAL:
+            return
+        self._last_cull = now
+        super()._cull()
@@ -0,0 +1,156 @@
+"""
+Responsive question images.
+
+Question images are uploaded at camera resolution and used to be sent as-is
+to every participant. When a question is saved with a new image, resized WebP
+and JPEG copies are written next to it (quiz_images/variants/) and their names
+recorded on the question, together with the image's size. The quiz page then
+offers them through srcset, so phones download the smallest copy that fits.
+`manage.py process_question_images` does the same for existing questions.
+
+Resizing a camera image takes a second or more, so an admin save doesn't wait
+for it: the question is handed to a background thread once the save commits.
+Until its copies exist the bank (quiz.bank) keeps serving the original image.
+"""
+import logging
+import queue
+import threading
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .bank import bump_bank_version
+from .models import Question
+
+
+logger = logging.getLogger(__name__)
+
+VARIANT_DIR = "quiz_images/variants"
+VARIANT_WIDTHS = getattr(settings, "QUIZ_IMAGE_WIDTHS", (480, 960, 1440))
+# key, Pillow format, save options
+FORMATS = (
+    ("webp", "WEBP", {"quality": 80, "method": 6}),
+    ("jpeg", "JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+)
+
+
+def variant_widths(width):
+    """Target widths for an image `width` pixels wide; never upscales."""
+    widths = {w for w in VARIANT_WIDTHS if w < width}
+    widths.add(min(width, max(VARIANT_WIDTHS)))
+    return sorted(widths)
+
+
+def needs_processing(question):
+    if not question.image:
+        return bool(question.image_variants or question.image_width)
+    return question.image_variants.get("source") != question.image.name
+
+
+def _encode(image, key, fmt, options):
+    if key == "jpeg" or image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGB")
+    buffer = BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def process_question_image(question, force=False):
+    """
+    Write the resized copies of a question's image and record them.
+
+    Returns True if the question was updated. The row is updated with a plain
+    UPDATE (no post_save), and the bank version bumped so quiz pages pick the
+    copies up.
+    """
+    if not force and not needs_processing(question):
+        return False
+
+    storage = question.image.storage
+    old_names = {name for key, _, _ in FORMATS for _, name in question.image_variants.get(key, [])}
+
+    if not question.image:
+        width = height = None
+        variants = {}
+    else:
+        with question.image.open("rb") as f:
+            original = ImageOps.exif_transpose(Image.open(f))
+            original.load()
+        width, height = original.size
+
+        stem = PurePosixPath(question.image.name).stem
+        variants = {"source": question.image.name}
+        for target in variant_widths(width):
+            resized = original.resize((target, round(height * target / width)), Image.LANCZOS)
+            for key, fmt, options in FORMATS:
+                name = f"{VARIANT_DIR}/{stem}-q{question.pk}-{target}w.{key}"
+                if storage.exists(name):
+                    storage.delete(name)
+                name = storage.save(name, ContentFile(_encode(resized, key, fmt, options)))
+                variants.setdefault(key, []).append([target, name])
+
+    Question.objects.filter(pk=question.pk).update(
+        image_width=width, image_height=height, image_variants=variants
+    )
+    question.image_width, question.image_height, question.image_variants = width, height, variants
+
+    kept = {name for key, _, _ in FORMATS for _, name in variants.get(key, [])}
+    for name in old_names - kept:
+        storage.delete(name)
+
+    transaction.on_commit(lambda: bump_bank_version(question.quiz_id))
+    return True
+
+
+def _process(question_id):
+    try:
+        process_question_image(Question.objects.get(pk=question_id))
+    except Question.DoesNotExist:
+        pass
+
+
+class ImageWorker:
+    """Single background thread that processes the images of queued questions."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def enqueue(self, question_id):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="quiz-image-worker", daemon=True)
+                self._thread.start()
+        self._queue.put(question_id)
+
+    def join(self):
+        """Wait until every queued image is processed."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            question_id = self._queue.get()
+            try:
+                _process(question_id)
+            except Exception:
+                # The original image still works; `process_question_images` can retry
+                logger.exception("Could not process the image of question %s", question_id)
+            finally:
+                close_old_connections()
+                self._queue.task_done()
+
+
+worker = ImageWorker()
+
+
+def process_after_commit(question):
+    """Queue a just-saved question's image for processing once its transaction commits."""
+    if not needs_processing(question):
+        return
+    question_id = question.pk
+    transaction.on_commit(lambda: worker.enqueue(question_id))
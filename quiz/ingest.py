@@ -0,0 +1,379 @@
+"""
+Write-behind submission ingestion.
+
+When the timer runs out every participant submits within a few seconds, and a
+separate INSERT transaction per submission makes them all queue on SQLite's
+single writer lock. submit_quiz now grades in the request, queues the result
+and hands back a receipt; one writer thread per process commits the queue in
+batched transactions (group commit).
+
+Quizzes sharded onto their own database (quiz/shards.py) get a writer thread
+of their own, so one event's commits never wait behind another's.
+
+Queued submissions are also kept on disk (quiz/spool.py) until they commit,
+so a worker that dies doesn't take them along; another worker picks them up.
+A submission that can't be written even after retries stays there and is
+marked failed in the shared cache, and its receipt page says so instead of
+waiting forever. The participant's attempt is only recorded once committed.
+
+A receipt is an opaque token: an HMAC of the attempt, mapped back to
+(quiz_id, phone) through the shared cache for QUIZ_RECEIPT_TTL seconds.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+
+from django.conf import settings
+from django.db import close_old_connections, transaction, IntegrityError, OperationalError
+from django.utils.crypto import salted_hmac
+
+from . import metrics, spool
+from .analysis import record_batch as record_item_stats
+from .attempts import attempts
+from .leaderboard import leaderboards
+from .routers import db_for_quiz
+from .models import Submission, Answer
+from .packing import pack, packed_storage
+from .tiered import shared_cache
+
+
+logger = logging.getLogger(__name__)
+
+RECEIPT_SALT = "quiz.submission-receipt"
+RECEIPT_KEY = "quiz:receipt:{receipt}"
+FAILED_KEY = "quiz:ingest:failed:{quiz_id}:{phone}"
+RECEIPT_TTL = getattr(settings, "QUIZ_RECEIPT_TTL", 24 * 60 * 60)
+
+
+@dataclass
+class GradedSubmission:
+    quiz_id: int
+    phone: str
+    event: str
+    score: int
+    total_questions: int
+    time_taken_seconds: int
+    # (question_id, selected_option, correct_option, is_correct)
+    answers: list = field(default_factory=list)
+
+    @property
+    def key(self):
+        return (self.quiz_id, self.phone)
+
+    @property
+    def receipt(self):
+        return make_receipt(self.quiz_id, self.phone)
+
+
+def make_receipt(quiz_id, phone):
+    # Deterministic: resubmitting the same attempt yields the same receipt
+    receipt = salted_hmac(RECEIPT_SALT, f"{quiz_id}:{phone}").hexdigest()[:32]
+    shared_cache().set(RECEIPT_KEY.format(receipt=receipt), (quiz_id, phone), RECEIPT_TTL)
+    return receipt
+
+
+def read_receipt(receipt):
+    """(quiz_id, phone) for a receipt, or None if it is unknown or expired."""
+    return shared_cache().get(RECEIPT_KEY.format(receipt=receipt))
+
+
+def submission_failed(quiz_id, phone):
+    """Whether a queued submission could not be written (it stays in the spool for a retry)."""
+    return shared_cache().get(FAILED_KEY.format(quiz_id=quiz_id, phone=phone)) is not None
+
+
+def write_batch(items):
+    """
+    Commit graded submissions in one transaction per database.
+
+    Attempts already in the database (or repeated within the batch) are not
+    written again, they fold into the existing row. Returns
+    {(quiz_id, phone): submission_id}.
+    """
+    by_db = {}
+    for item in items:
+        by_db.setdefault(db_for_quiz(item.quiz_id), []).append(item)
+
+    committed = {}
+    for using, group in by_db.items():
+        start = time.perf_counter()
+        written = _write_batch_retrying(group, using)
+        metrics.batch_committed(using, time.perf_counter() - start, len(written))
+        committed.update(written)
+    return committed
+
+
+def _write_batch_retrying(items, using):
+    for attempt in range(3):
+        try:
+            return _write_batch(items, using)
+        except IntegrityError:
+            # Another process committed one of these attempts after we looked;
+            # the retry sees that row and skips it.
+            if attempt == 2:
+                raise
+
+
+def _write_batch(items, using):
+    committed = {}
+    with transaction.atomic(using=using):
+        quiz_ids = {item.quiz_id for item in items}
+        phones = {item.phone for item in items}
+        for sub_id, quiz_id, phone in Submission.objects.using(using).filter(
+            quiz_id__in=quiz_ids, phone__in=phones
+        ).values_list("id", "quiz_id", "phone"):
+            committed.setdefault((quiz_id, phone), sub_id)
+
+        fresh = {}
+        for item in items:
+            if item.key not in committed and item.key not in fresh:
+                fresh[item.key] = item
+
+        packed = packed_storage()
+        submissions = Submission.objects.using(using).bulk_create(
+            [
+                Submission(
+                    quiz_id=item.quiz_id,
+                    phone=item.phone,
+                    event=item.event,
+                    score=item.score,
+                    total_questions=item.total_questions,
+                    time_taken_seconds=item.time_taken_seconds,
+                    **(pack(item.answers) if packed else {}),
+                )
+                for item in fresh.values()
+            ]
+        )
+
+        answers = []
+        rows = []
+        for submission, item in zip(submissions, fresh.values()):
+            committed[item.key] = submission.id
+            rows.append((submission.id, item))
+            if packed:
+                continue
+            answers.extend(
+                Answer(
+                    submission_id=submission.id,
+                    question_id=question_id,
+                    selected_option=selected,
+                    correct_option=correct,
+                    is_correct=is_correct,
+                )
+                for question_id, selected, correct, is_correct in item.answers
+            )
+        Answer.objects.using(using).bulk_create(answers, batch_size=500)
+        transaction.on_commit(lambda: _committed(rows), using=using)
+    return committed
+
+
+def _committed(rows):
+    """Feed freshly committed (submission_id, GradedSubmission) rows to in-memory read models."""
+    for submission_id, item in rows:
+        attempts.record(item.quiz_id, item.phone)
+        leaderboards.record(item.quiz_id, submission_id, item.phone, item.score, item.time_taken_seconds)
+    try:
+        record_item_stats(rows)
+    except Exception:
+        # Stats can be rebuilt later; never fail a committed submission over them
+        logger.exception("Could not update item analysis for %s submission(s)", len(rows))
+
+
+class SubmissionWriter:
+    """Single background thread that drains the queue into write_batch()."""
+
+    def __init__(self, batch_size, flush_interval, recent_size=10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.recent_size = recent_size
+        self._queue = queue.Queue()
+        self._pending = {}              # (quiz_id, phone) -> GradedSubmission
+        self._spooled = {}              # (quiz_id, phone) -> spool file of a pending submission
+        self._recent = OrderedDict()    # (quiz_id, phone) -> submission_id
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, item):
+        """Queue a graded submission; a repeat of a queued attempt is ignored."""
+        with self._lock:
+            if item.key in self._pending or item.key in self._recent:
+                return item.receipt
+            self._pending[item.key] = item
+        try:
+            path = spool.save(asdict(item))
+        except OSError:
+            # Still queued, just not crash-safe
+            logger.exception("Could not spool submission for quiz %s / %s", item.quiz_id, item.phone)
+            path = None
+        self._enqueue(item, path)
+        return item.receipt
+
+    def resume(self, item, path):
+        """Queue a submission taken over from the spool of a process that is gone."""
+        with self._lock:
+            if item.key in self._pending or item.key in self._recent:
+                spool.discard(path)
+                return
+            self._pending[item.key] = item
+        self._enqueue(item, path)
+
+    def _enqueue(self, item, path):
+        with self._lock:
+            self._spooled[item.key] = path
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="quiz-submission-writer", daemon=True)
+                self._thread.start()
+        self._queue.put(item)
+
+    def status(self, key):
+        """Submission id once committed, "pending" while queued here, else None."""
+        with self._lock:
+            if key in self._recent:
+                return self._recent[key]
+            if key in self._pending:
+                return "pending"
+        return None
+
+    def _take_batch(self, block=True):
+        batch = []
+        try:
+            batch.append(self._queue.get(block=block))
+        except queue.Empty:
+            return batch
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _commit(self, batch):
+        for attempt in range(5):
+            try:
+                return write_batch(batch)
+            except OperationalError as e:
+                # "database is locked" from another process: back off and retry
+                logger.warning("Submission batch of %s failed (%s), retrying", len(batch), e)
+                time.sleep(0.1 * (2 ** attempt))
+        return write_batch(batch)
+
+    def _finish(self, batch, committed):
+        failed = []
+        with self._lock:
+            for item in batch:
+                self._pending.pop(item.key, None)
+                path = self._spooled.pop(item.key, None)
+                if item.key in committed:
+                    self._recent[item.key] = committed[item.key]
+                    self._recent.move_to_end(item.key)
+                    spool.discard(path)
+                else:
+                    failed.append((item, path))
+            while len(self._recent) > self.recent_size:
+                self._recent.popitem(last=False)
+        for item, path in failed:
+            # Kept for the next worker to start; the receipt page stops waiting
+            spool.set_aside(path)
+            shared_cache().set(FAILED_KEY.format(quiz_id=item.quiz_id, phone=item.phone), 1, RECEIPT_TTL)
+
+    def flush(self):
+        """Synchronously write everything still queued (used at shutdown)."""
+        while True:
+            batch = self._take_batch(block=False)
+            if not batch:
+                return
+            self._finish(batch, self._commit(batch))
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            try:
+                committed = self._commit(batch)
+            except Exception:
+                # Don't let one bad row sink the whole batch
+                logger.exception("Batch of %s submission(s) failed, writing them one by one", len(batch))
+                committed = {}
+                for item in batch:
+                    try:
+                        committed.update(write_batch([item]))
+                    except Exception:
+                        logger.exception("Could not save submission for quiz %s / %s", item.quiz_id, item.phone)
+            finally:
+                close_old_connections()
+            self._finish(batch, committed)
+
+
+ingest_settings = getattr(settings, "QUIZ_INGEST", {})
+
+
+def _new_writer():
+    return SubmissionWriter(
+        batch_size=ingest_settings.get("BATCH_SIZE", 200),
+        flush_interval=ingest_settings.get("FLUSH_INTERVAL", 0.05),
+    )
+
+
+writer = _new_writer()
+# One more writer per shard database, keyed by alias
+writers = {"default": writer}
+_writers_lock = threading.Lock()
+
+
+_recovery_lock = threading.Lock()
+_recovered = False
+
+
+def recover_spooled():
+    """Queue the submissions left in the spool by workers that are gone; once per process."""
+    global _recovered
+    with _recovery_lock:
+        if _recovered:
+            return
+        _recovered = True
+    for path, data in spool.claim_orphans():
+        item = GradedSubmission(**data)
+        item.answers = [tuple(answer) for answer in item.answers]
+        logger.warning("Resuming spooled submission for quiz %s / %s", item.quiz_id, item.phone)
+        writer_for(item.quiz_id).resume(item, path)
+
+
+def writer_for(quiz_id):
+    recover_spooled()
+    using = db_for_quiz(quiz_id)
+    if using not in writers:
+        with _writers_lock:
+            writers.setdefault(using, _new_writer())
+    return writers[using]
+
+
+def flush_all():
+    for w in list(writers.values()):
+        w.flush()
+
+
+atexit.register(flush_all)
+
+
+def write_behind_enabled():
+    return getattr(settings, "QUIZ_INGEST", {}).get("WRITE_BEHIND", True)
+
+
+def ingest(item):
+    """
+    Record a graded submission.
+
+    Returns (submission_id, receipt). submission_id is None while the
+    submission is still queued for the background writer.
+    """
+    if write_behind_enabled():
+        return None, writer_for(item.quiz_id).submit(item)
+    committed = write_batch([item])
+    return committed[item.key], item.receipt
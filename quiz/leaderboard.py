@@ -0,0 +1,223 @@
+"""
+Live per-quiz leaderboards.
+
+Participants are ranked by score (high first), then time taken (low first).
+Each process keeps the (-score, time_taken, submission_id) keys of a quiz in
+sorted order, split into buckets of at most 2 * BUCKET_SIZE keys so an insert
+shifts one bucket rather than the whole list. Submissions committed by this
+process are inserted as they commit; submissions from other workers are picked
+up by a cheap "id > last seen" query at most once per QUIZ_LEADERBOARD_REFRESH
+seconds. Rank lookups are a bisect over the buckets and then within one.
+
+A board is tied to the version of the quiz's "leaderboard:{quiz_id}"
+namespace in quiz.tiered. invalidate() (on a re-grade, a deleted submission or
+the rebuild_leaderboard command) bumps that shared version, so every worker
+throws its board away and reloads it within QUIZ_CACHE_SYNC_INTERVAL.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+
+from django.conf import settings
+
+from .models import Submission
+from .routers import db_for_quiz
+from .tiered import tiered
+
+
+LEADERBOARD_NAMESPACE = "leaderboard:{quiz_id}"
+BUCKET_SIZE = 500
+
+
+@dataclass(frozen=True)
+class Standing:
+    rank: int
+    submission_id: int
+    phone: str
+    score: int
+    time_taken_seconds: int
+
+    def as_dict(self, mask_phone=True):
+        return {
+            "rank": self.rank,
+            "submission_id": self.submission_id,
+            "phone": mask(self.phone) if mask_phone else self.phone,
+            "score": self.score,
+            "time_taken_seconds": self.time_taken_seconds,
+        }
+
+
+def mask(phone):
+    if len(phone) <= 4:
+        return phone
+    return phone[:2] + "X" * (len(phone) - 4) + phone[-2:]
+
+
+def generation(quiz_id):
+    return tiered.version(LEADERBOARD_NAMESPACE.format(quiz_id=quiz_id))
+
+
+def invalidate(quiz_id):
+    """Make every process rebuild this quiz's leaderboard on next read."""
+    tiered.invalidate(LEADERBOARD_NAMESPACE.format(quiz_id=quiz_id))
+
+
+class SortedKeys:
+    """
+    A sorted list kept as a list of sorted buckets (the layout of
+    sortedcontainers.SortedList): add() and remove() cost O(BUCKET_SIZE) plus
+    a bisect over the buckets' last keys, index() adds a sum over the bucket
+    lengths. Not thread-safe; Leaderboard holds its lock around every call.
+    """
+
+    def __init__(self):
+        self._buckets = []
+        self._maxes = []  # last key of each bucket
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def add(self, key):
+        if not self._buckets:
+            self._buckets.append([key])
+            self._maxes.append(key)
+        else:
+            # The first bucket that can hold the key, or the last one
+            i = min(bisect_left(self._maxes, key), len(self._buckets) - 1)
+            bucket = self._buckets[i]
+            insort(bucket, key)
+            self._maxes[i] = bucket[-1]
+            if len(bucket) > 2 * BUCKET_SIZE:
+                self._buckets[i:i + 1] = [bucket[:BUCKET_SIZE], bucket[BUCKET_SIZE:]]
+                self._maxes[i:i + 1] = [bucket[BUCKET_SIZE - 1], bucket[-1]]
+        self._len += 1
+
+    def remove(self, key):
+        i = bisect_left(self._maxes, key)
+        bucket = self._buckets[i]
+        del bucket[bisect_left(bucket, key)]
+        if bucket:
+            self._maxes[i] = bucket[-1]
+        else:
+            del self._buckets[i], self._maxes[i]
+        self._len -= 1
+
+    def index(self, key):
+        """Number of keys lower than `key` (where it is, or would be inserted)."""
+        i = bisect_left(self._maxes, key)
+        if i == len(self._buckets):
+            return self._len
+        return sum(len(bucket) for bucket in self._buckets[:i]) + bisect_left(self._buckets[i], key)
+
+    def __iter__(self):
+        for bucket in self._buckets:
+            yield from bucket
+
+
+class Leaderboard:
+    def __init__(self, quiz_id, generation=0):
+        self.quiz_id = quiz_id
+        self.generation = generation
+        self._keys = SortedKeys()  # (-score, time_taken, submission_id)
+        self._by_phone = {}        # phone -> key
+        self._phones = {}          # submission_id -> phone
+        self._last_id = 0          # highest submission id read from the database
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _add(self, submission_id, phone, score, time_taken):
+        key = (-score, time_taken, submission_id)
+        old = self._by_phone.get(phone)
+        if old == key:
+            return
+        if old is not None:
+            self._keys.remove(old)
+            self._phones.pop(old[2], None)
+        self._keys.add(key)
+        self._by_phone[phone] = key
+        self._phones[submission_id] = phone
+
+    def add(self, submission_id, phone, score, time_taken):
+        with self._lock:
+            self._add(submission_id, phone, score, time_taken)
+
+    def catch_up(self, force=False):
+        interval = getattr(settings, "QUIZ_LEADERBOARD_REFRESH", 1.0)
+        if not force and time.monotonic() - self._refreshed_at < interval:
+            return
+        rows = (
+            Submission.objects.using(db_for_quiz(self.quiz_id))
+            .filter(quiz_id=self.quiz_id, id__gt=self._last_id)
+            .order_by("id")
+            .values_list("id", "phone", "score", "time_taken_seconds")
+        )
+        with self._lock:
+            for submission_id, phone, score, time_taken in rows:
+                self._add(submission_id, phone, score, time_taken)
+                self._last_id = max(self._last_id, submission_id)
+            self._refreshed_at = time.monotonic()
+
+    def _standing(self, key, rank=None):
+        neg_score, time_taken, submission_id = key
+        if rank is None:
+            # Ties on score and time share a rank
+            rank = self._keys.index((neg_score, time_taken)) + 1
+        return Standing(rank, submission_id, self._phones[submission_id], -neg_score, time_taken)
+
+    def top(self, n):
+        with self._lock:
+            standings = []
+            rank, previous = 0, None
+            for position, key in zip(range(n), self._keys):
+                if key[:2] != previous:
+                    rank, previous = position + 1, key[:2]
+                standings.append(self._standing(key, rank))
+            return standings
+
+    def standing(self, phone):
+        with self._lock:
+            key = self._by_phone.get(phone)
+            if key is None:
+                return None
+            return self._standing(key)
+
+
+class LeaderboardRegistry:
+    def __init__(self):
+        self._boards = {}
+        self._lock = threading.Lock()
+
+    def get(self, quiz_id):
+        """The quiz's leaderboard, caught up with the database."""
+        quiz_id = int(quiz_id)
+        current = generation(quiz_id)
+        with self._lock:
+            board = self._boards.get(quiz_id)
+            if board is None or board.generation != current:
+                board = self._boards[quiz_id] = Leaderboard(quiz_id, current)
+        board.catch_up()
+        return board
+
+    def record(self, quiz_id, submission_id, phone, score, time_taken):
+        """Insert a just-committed submission into a leaderboard already in memory."""
+        board = self._boards.get(int(quiz_id))
+        if board is not None:
+            board.add(submission_id, phone, score, time_taken)
+
+    def drop(self, quiz_id):
+        with self._lock:
+            self._boards.pop(int(quiz_id), None)
+
+
+leaderboards = LeaderboardRegistry()
+
+
+def rebuild(quiz_id):
+    invalidate(quiz_id)
+    leaderboards.drop(quiz_id)
+    return leaderboards.get(quiz_id)
@@ -0,0 +1,252 @@
+"""
+Event-day load testing.
+
+A stand-in for the college get_participant.php endpoint, a scripted
+participant that walks the whole flow (landing -> confirm -> quiz -> submit ->
+result -> feedback) over HTTP, and the bookkeeping for latency percentiles and
+SQLite lock waits. Used by `manage.py loadtest` and
+`manage.py stub_registration_api`.
+"""
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urljoin
+
+import requests
+from django.db import OperationalError
+
+
+# ---------- Stub registration API ----------
+
+class StubRegistrationHandler(BaseHTTPRequestHandler):
+    """Answers like get_participant.php, with configurable latency and failures."""
+
+    latency = 0.2
+    jitter = 0.1
+    failure_rate = 0.0
+    unregistered_rate = 0.0
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            payload = {}
+
+        time.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+
+        if random.random() < self.failure_rate:
+            self.send_response(500)
+            self.end_headers()
+            return
+
+        mobile = str(payload.get("mobile_number", ""))
+        if random.random() < self.unregistered_rate:
+            body = {"success": False, "message": "Participant not found."}
+        else:
+            body = {"success": True, "name": f"Participant {mobile[-4:]}", "college": "Load Test College"}
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_registration_api(host="127.0.0.1", port=0, latency=0.2, jitter=0.1,
+                                failure_rate=0.0, unregistered_rate=0.0):
+    """Start the stub in a background thread; returns (server, url)."""
+    handler = type(
+        "ConfiguredStubHandler",
+        (StubRegistrationHandler,),
+        {
+            "latency": latency,
+            "jitter": jitter,
+            "failure_rate": failure_rate,
+            "unregistered_rate": unregistered_rate,
+        },
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}/get_participant.php"
+
+
+# ---------- Measurements ----------
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+class Recorder:
+    """Thread-safe latency and error bookkeeping per step."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, step, seconds, error=None):
+        with self._lock:
+            self.latencies[step].append(seconds)
+            if error:
+                self.errors[step] += 1
+                self.error_samples.setdefault(step, error)
+
+
+class SQLiteLockMonitor:
+    """
+    execute_wrapper counting writes, how long they took (mostly time spent
+    waiting for SQLite's writer lock under contention) and "database is
+    locked" errors. Install with connection_created.connect(monitor.install).
+    """
+
+    WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+    def __init__(self):
+        self.write_times = []
+        self.locked_errors = 0
+        self._lock = threading.Lock()
+
+    def install(self, sender, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def __call__(self, execute, sql, params, many, context):
+        is_write = sql.lstrip().upper().startswith(self.WRITE_PREFIXES)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as e:
+            if "locked" in str(e):
+                with self._lock:
+                    self.locked_errors += 1
+            raise
+        finally:
+            if is_write:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.write_times.append(elapsed)
+
+
+# ---------- Scripted participant ----------
+
+CSRF_INPUT = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+PAPER_INPUT = re.compile(r'name="paper" value="([^"]*)"')
+QUESTION_INPUT = re.compile(r'name="q_(\d+)"')
+
+
+class FlowError(Exception):
+    pass
+
+
+class VirtualParticipant:
+    def __init__(self, base_url, quiz_id, phone, recorder, receipt_timeout=30):
+        self.base_url = base_url
+        self.quiz_id = quiz_id
+        self.phone = phone
+        self.recorder = recorder
+        self.receipt_timeout = receipt_timeout
+        self.http = requests.Session()
+
+    def _call(self, step, method, path, expect, **kwargs):
+        url = urljoin(self.base_url, path)
+        start = time.perf_counter()
+        error = None
+        resp = None
+        try:
+            resp = self.http.request(method, url, allow_redirects=False, timeout=60, **kwargs)
+            if resp.status_code not in expect:
+                error = f"HTTP {resp.status_code} from {path}"
+        except requests.RequestException as e:
+            error = f"{type(e).__name__}: {e}"
+        self.recorder.record(step, time.perf_counter() - start, error)
+        if error:
+            raise FlowError(error)
+        return resp
+
+    def _form(self, html, pattern, what):
+        match = pattern.search(html)
+        if not match:
+            raise FlowError(f"No {what} in page")
+        return match.group(1)
+
+    def run(self):
+        landing = self._call("prelims_entry (GET)", "GET", "/", {200})
+        csrf = self._form(landing.text, CSRF_INPUT, "CSRF token")
+
+        resp = self._call(
+            "prelims_entry (POST)", "POST", "/", {302},
+            data={"csrfmiddlewaretoken": csrf, "event": self.quiz_id, "phone": self.phone},
+        )
+        location = resp.headers["Location"]
+        if "/waiting/" in location:
+            # Quiz with a start rate: wait for our slot like the waiting room page does
+            while True:
+                status = self._call("waiting_status", "GET", location + "status/", {200}).json()
+                if status["ready"]:
+                    break
+                time.sleep(status["poll_seconds"])
+            resp = self._call("waiting_room (POST)", "POST", location, {302}, data={"csrfmiddlewaretoken": csrf})
+            location = resp.headers["Location"]
+        self._call("prelims_confirm", "GET", location, {200})
+
+        quiz = self._call("quiz_page", "GET", f"/quiz/{self.quiz_id}/", {200})
+        csrf = self._form(quiz.text, CSRF_INPUT, "CSRF token")
+        paper_token = self._form(quiz.text, PAPER_INPUT, "paper token")
+        question_ids = set(QUESTION_INPUT.findall(quiz.text))
+        if not paper_token:
+            # Shell page (QUIZ_PAPER_DELIVERY = "shell"): the paper comes from the JSON API
+            paper = self._call("paper_api", "GET", f"/api/quiz/{self.quiz_id}/paper/", {200}).json()
+            self._call("bank_api", "GET", paper["bank"], {200})
+            paper_token = paper["paper"]
+            question_ids = {qid for qid, _ in paper["questions"]}
+
+        data = {
+            "csrfmiddlewaretoken": csrf,
+            "paper": paper_token,
+            "time_taken": random.randint(60, 1800),
+        }
+        for qid in question_ids:
+            if random.random() < 0.9:
+                data[f"q_{qid}"] = random.choice("ABCD")
+        resp = self._call("submit_quiz", "POST", f"/quiz/{self.quiz_id}/submit/", {302}, data=data)
+
+        location = resp.headers["Location"]
+        deadline = time.monotonic() + self.receipt_timeout
+        while "/receipt/" in location:
+            resp = self._call("submission_receipt", "GET", location, {200, 302})
+            if resp.status_code == 302:
+                location = resp.headers["Location"]
+            elif time.monotonic() > deadline:
+                raise FlowError("Submission was not committed in time")
+            else:
+                time.sleep(0.5)
+
+        result = self._call("quiz_result", "GET", location, {200})
+        submission_id = location.rstrip("/").rsplit("/", 1)[-1]
+        csrf = self._form(result.text, CSRF_INPUT, "CSRF token")
+        self._call(
+            "submit_feedback", "POST", "/submit/feedback/", {302},
+            data={
+                "csrfmiddlewaretoken": csrf,
+                "submission_id": submission_id,
+                "quiz_id": self.quiz_id,
+                "rating": random.randint(1, 5),
+                "rating_ui": random.randint(1, 5),
+                "rating_difficulty": random.randint(1, 5),
+                "rating_relevance": random.randint(1, 5),
+            },
+        )
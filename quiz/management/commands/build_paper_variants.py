@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.models import Quiz
+from quiz.papers import build_paper_variants
+
+
+class Command(BaseCommand):
+    help = "Pre-build shuffled paper variants for one or more quizzes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("quiz_ids", nargs="*", type=int, help="Quiz IDs (default: all active quizzes)")
+        parser.add_argument(
+            "--count",
+            type=int,
+            default=getattr(settings, "QUIZ_PAPER_VARIANTS", 8),
+            help="Number of variants per quiz (0 removes them)",
+        )
+
+    def handle(self, *args, **options):
+        if options["count"] < 0:
+            raise CommandError("--count must be zero or more.")
+
+        if options["quiz_ids"]:
+            quizzes = Quiz.objects.filter(id__in=options["quiz_ids"])
+            missing = set(options["quiz_ids"]) - {q.id for q in quizzes}
+            if missing:
+                raise CommandError(f"Unknown quiz id(s): {', '.join(map(str, sorted(missing)))}")
+        else:
+            quizzes = Quiz.objects.filter(is_active=True)
+
+        for quiz in quizzes:
+            variants = build_paper_variants(quiz, options["count"])
+            self.stdout.write(f"{quiz.name}: built {len(variants)} variant(s)")
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.assets import build_icons, brotli
+
+
+class Command(BaseCommand):
+    help = (
+        "Build right-sized icons from static/fav.png into static/icons/, then "
+        "collect static files with hashed names and .gz (and .br) copies."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--icons-only", action="store_true", help="Only rebuild the icons")
+
+    def handle(self, *args, **options):
+        static_dir = settings.BASE_DIR / "static"
+        source = static_dir / "fav.png"
+        if not source.exists():
+            raise CommandError(f"{source} not found")
+
+        for path in build_icons(source, static_dir / "icons"):
+            self.stdout.write(f"{path.relative_to(settings.BASE_DIR)}: {path.stat().st_size} bytes")
+        if options["icons_only"]:
+            return
+
+        if brotli is None:
+            self.stdout.write("brotli not installed; writing gzip copies only")
+        call_command("collectstatic", interactive=False, verbosity=1)
@@ -0,0 +1,73 @@
+import csv
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.models import Participant
+from quiz.registration import fetch_participant
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-load the registration roster from a CSV or JSON file "
+        "(columns/keys: mobile, name, college, optional event)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path to a .csv or .json file")
+        parser.add_argument("--event", help="Registration event name for rows without an 'event' column")
+        parser.add_argument(
+            "--resolve-missing",
+            action="store_true",
+            help="Look up rows without a name through the registration API",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def read_rows(self, path):
+        if path.suffix.lower() == ".json":
+            data = json.loads(path.read_text(encoding="utf-8"))
+            if not isinstance(data, list):
+                raise CommandError("JSON roster must be a list of objects.")
+            return data
+        with path.open(newline="", encoding="utf-8-sig") as fh:
+            return list(csv.DictReader(fh))
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.exists():
+            raise CommandError(f"{path} does not exist.")
+
+        participants = {}
+        unresolved = []
+        for row in self.read_rows(path):
+            event = (row.get("event") or options["event"] or "").strip()
+            mobile = str(row.get("mobile") or "").strip()
+            if not event or not mobile:
+                raise CommandError(f"Row is missing event or mobile: {row}")
+            name = (row.get("name") or "").strip()
+            if not name:
+                unresolved.append((event, mobile))
+                continue
+            participants[(event, mobile)] = Participant(
+                event=event, mobile=mobile, name=name, college=(row.get("college") or "").strip()
+            )
+
+        Participant.objects.bulk_create(
+            participants.values(),
+            batch_size=options["batch_size"],
+            update_conflicts=True,
+            unique_fields=["event", "mobile"],
+            update_fields=["name", "college", "updated_at"],
+        )
+        self.stdout.write(f"Imported {len(participants)} participant(s).")
+
+        if unresolved and options["resolve_missing"]:
+            resolved = 0
+            for event, mobile in unresolved:
+                name, college, api_error = fetch_participant(event, mobile)
+                if name and college:
+                    resolved += 1
+            self.stdout.write(f"Resolved {resolved}/{len(unresolved)} participant(s) through the API.")
+        elif unresolved:
+            self.stdout.write(f"Skipped {len(unresolved)} row(s) without a name (use --resolve-missing).")
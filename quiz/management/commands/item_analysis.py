@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.analysis import rebuild_quiz_stats
+from quiz.models import Quiz, Question, QuestionStats
+
+
+def _fmt(value, spec):
+    return "—" if value is None else format(value, spec)
+
+
+class Command(BaseCommand):
+    help = "Show (and optionally rebuild) per-question item analysis for quizzes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("quiz_ids", nargs="+", type=int)
+        parser.add_argument("--rebuild", action="store_true", help="Recompute from the Answer table first")
+
+    def handle(self, *args, **options):
+        quizzes = Quiz.objects.filter(id__in=options["quiz_ids"])
+        missing = set(options["quiz_ids"]) - {q.id for q in quizzes}
+        if missing:
+            raise CommandError(f"Unknown quiz id(s): {', '.join(map(str, sorted(missing)))}")
+
+        for quiz in quizzes:
+            if options["rebuild"]:
+                rebuild_quiz_stats(quiz)
+            self.stdout.write(f"{quiz.name}")
+            self.stdout.write("   QID      n      p   r_pb     A     B     C     D  blank  key")
+            for question in Question.objects.filter(quiz=quiz).select_related("stats").order_by("id"):
+                try:
+                    s = question.stats
+                except QuestionStats.DoesNotExist:
+                    self.stdout.write(f"{question.id:>6}      0")
+                    continue
+                rates = "".join(f"{_fmt(s.option_rate(letter), '.0%'):>6}" for letter in "ABCD")
+                self.stdout.write(
+                    f"{question.id:>6} {s.responses:>6} {_fmt(s.p_value, '.2f'):>6} "
+                    f"{_fmt(s.discrimination, '.2f'):>6}{rates} {_fmt(s.unanswered_rate, '.0%'):>6}  "
+                    f"{question.correct_option}"
+                )
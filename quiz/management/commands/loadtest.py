@@ -0,0 +1,217 @@
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.module_loading import import_string
+
+from quiz.loadtest import (
+    FlowError,
+    Recorder,
+    SQLiteLockMonitor,
+    VirtualParticipant,
+    percentile,
+    start_stub_registration_api,
+)
+from quiz.tiered import tiered
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class LoadTestServer(ThreadedWSGIServer):
+    request_queue_size = 256
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate participants going through landing -> confirm -> quiz -> submit -> "
+        "result -> feedback and report throughput, latency percentiles and SQLite lock "
+        "waits. By default runs the site in-process on a throwaway database with a stub "
+        "registration API; use --base-url to drive an already running server instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--participants", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--base-url", help="Drive this server instead of an in-process one (needs --quiz-id)")
+        parser.add_argument("--quiz-id", type=int, help="Quiz to take (in-process mode seeds one if omitted)")
+        parser.add_argument("--bank-size", type=int, default=60, help="Questions seeded in-process")
+        parser.add_argument("--num-questions", type=int, default=20, help="Questions per paper when seeding")
+        parser.add_argument("--start-rate", type=int, help="Start rate per minute of the seeded quiz (waiting room)")
+        parser.add_argument("--api-latency", type=float, default=0.2, help="Stub API mean latency (s)")
+        parser.add_argument("--api-jitter", type=float, default=0.1, help="Stub API latency std-dev (s)")
+        parser.add_argument("--api-failure-rate", type=float, default=0.0, help="Share of stub API calls that 500")
+        parser.add_argument("--api-unregistered-rate", type=float, default=0.0)
+        parser.add_argument("--keep-db", action="store_true", help="Keep the throwaway database for inspection")
+
+    def handle(self, *args, **options):
+        monitor = None
+        cleanup = []
+        try:
+            if options["base_url"]:
+                if not options["quiz_id"]:
+                    raise CommandError("--base-url needs --quiz-id.")
+                base_url, quiz_id = options["base_url"], options["quiz_id"]
+            else:
+                base_url, quiz_id, monitor = self.start_local_site(options, cleanup)
+
+            recorder = Recorder()
+            started = time.perf_counter()
+            completed = self.run_participants(base_url, quiz_id, recorder, options)
+            elapsed = time.perf_counter() - started
+
+            if monitor is not None:
+                from quiz.ingest import flush_all
+                flush_all()
+            self.report(options, recorder, monitor, completed, elapsed)
+        finally:
+            for fn in reversed(cleanup):
+                fn()
+
+    # ---------- setup ----------
+
+    def start_local_site(self, options, cleanup):
+        from quiz.models import Quiz, Question
+
+        tmpdir = Path(tempfile.mkdtemp(prefix="quiz-loadtest-"))
+        if options["keep_db"]:
+            self.stdout.write(f"Throwaway database in {tmpdir}")
+        else:
+            cleanup.append(lambda: shutil.rmtree(tmpdir, ignore_errors=True))
+
+        # Keep the site's caches and submission spool out of the run: the
+        # throwaway quiz ids would otherwise meet the site's leftover clocks,
+        # counters, markers and versions, and a spooled submission could be
+        # replayed into the real database
+        for alias in caches:
+            config = caches.settings[alias]
+            if issubclass(import_string(config["BACKEND"]), FileBasedCache):
+                config["LOCATION"] = str(tmpdir / f"cache-{alias}")
+            else:
+                config["KEY_PREFIX"] = f"{tmpdir.name}:{config.get('KEY_PREFIX', '')}"
+            if hasattr(caches._connections, alias):
+                caches[alias].close()
+                del caches[alias]
+        tiered.clear()
+        settings.QUIZ_INGEST = {**getattr(settings, "QUIZ_INGEST", {}), "SPOOL_DIR": str(tmpdir / "spool")}
+
+        # Point every database alias at a fresh file before anything connects
+        for alias in connections:
+            connections[alias].close()
+            connections.settings[alias]["NAME"] = str(tmpdir / f"{alias}.sqlite3")
+            call_command("migrate", database=alias, interactive=False, verbosity=0)
+
+        settings.DEBUG = False  # DEBUG keeps every query in memory
+        settings.ALLOWED_HOSTS = ["127.0.0.1", "localhost"]
+
+        quiz_id = options["quiz_id"]
+        if not quiz_id:
+            quiz = Quiz.objects.create(
+                name="Build With AI",  # a name the registration API knows
+                num_questions=options["num_questions"],
+                duration_minutes=30,
+                start_rate_per_minute=options["start_rate"],
+            )
+            Question.objects.bulk_create(
+                Question(
+                    quiz=quiz,
+                    text_html=f"<p>Load test question {i}</p>",
+                    option_a="Alpha",
+                    option_b="Bravo",
+                    option_c="Charlie",
+                    option_d="Delta",
+                    correct_option="ABCD"[i % 4],
+                )
+                for i in range(options["bank_size"])
+            )
+            quiz_id = quiz.id
+            if quiz_id in getattr(settings, "QUIZ_SHARDS", {}):
+                # bulk_create sends no signals, so mirror the questions by hand
+                from quiz.shards import mirror_quiz
+                mirror_quiz(quiz_id)
+
+        stub, stub_url = start_stub_registration_api(
+            latency=options["api_latency"],
+            jitter=options["api_jitter"],
+            failure_rate=options["api_failure_rate"],
+            unregistered_rate=options["api_unregistered_rate"],
+        )
+        cleanup.append(stub.shutdown)
+        settings.QUIZ_REGISTRATION_API_URL = stub_url
+
+        monitor = SQLiteLockMonitor()
+        connection_created.connect(monitor.install)
+        cleanup.append(lambda: connection_created.disconnect(monitor.install))
+
+        server = LoadTestServer(("127.0.0.1", 0), QuietRequestHandler)
+        server.set_app(get_wsgi_application())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        cleanup.append(server.shutdown)
+
+        return f"http://127.0.0.1:{server.server_port}", quiz_id, monitor
+
+    # ---------- run ----------
+
+    def run_participants(self, base_url, quiz_id, recorder, options):
+        def one(i):
+            participant = VirtualParticipant(base_url, quiz_id, f"9{i:09d}", recorder)
+            try:
+                participant.run()
+                return True
+            except FlowError:
+                return False
+            except Exception as e:
+                recorder.record("unexpected", 0.0, f"{type(e).__name__}: {e}")
+                return False
+
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            return sum(pool.map(one, range(options["participants"])))
+
+    # ---------- report ----------
+
+    def report(self, options, recorder, monitor, completed, elapsed):
+        total = options["participants"]
+        requests_made = sum(len(v) for v in recorder.latencies.values())
+        w = self.stdout.write
+
+        w("")
+        w(f"Participants: {total} ({completed} completed, {total - completed} failed), "
+          f"concurrency {options['concurrency']}, {elapsed:.1f}s")
+        w(f"Throughput:   {completed / elapsed:.1f} participants/s, {requests_made / elapsed:.1f} requests/s")
+        w("")
+        w(f"{'view':<24}{'count':>7}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+        for step, values in recorder.latencies.items():
+            ms = [v * 1000 for v in values]
+            w(f"{step:<24}{len(values):>7}{recorder.errors.get(step, 0):>8}"
+              f"{percentile(ms, 50):>9.0f}{percentile(ms, 95):>9.0f}{percentile(ms, 99):>9.0f}{max(ms):>9.0f}")
+
+        if monitor is not None:
+            writes = [t * 1000 for t in monitor.write_times]
+            w("")
+            w(f"SQLite writes: {len(writes)}, p50 {percentile(writes, 50):.1f} ms, "
+              f"p99 {percentile(writes, 99):.1f} ms, max {max(writes, default=0):.1f} ms, "
+              f"total {sum(writes) / 1000:.2f}s")
+            w(f"SQLite 'database is locked' errors: {monitor.locked_errors}")
+        else:
+            w("")
+            w("SQLite lock waits are only measured in in-process mode.")
+
+        if recorder.error_samples:
+            w("")
+            w("First error per view:")
+            for step, error in recorder.error_samples.items():
+                w(f"  {step}: {error}")
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.models import Quiz, Submission
+from quiz.packing import pack_submissions, unpack_submissions
+from quiz.routers import db_for_quiz
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the Answer rows of existing submissions into their packed fields "
+        "(see QUIZ_ANSWER_STORAGE), or back with --unpack."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("quiz_ids", nargs="*", type=int, help="Quiz IDs (default: all quizzes)")
+        parser.add_argument("--unpack", action="store_true", help="Write Answer rows back from the packed fields")
+
+    def handle(self, *args, **options):
+        quizzes = Quiz.objects.all()
+        if options["quiz_ids"]:
+            quizzes = quizzes.filter(id__in=options["quiz_ids"])
+            missing = set(options["quiz_ids"]) - {q.id for q in quizzes}
+            if missing:
+                raise CommandError(f"Unknown quiz id(s): {', '.join(map(str, sorted(missing)))}")
+
+        for quiz in quizzes:
+            submissions = Submission.objects.using(db_for_quiz(quiz.id)).filter(quiz=quiz)
+            if options["unpack"]:
+                self.stdout.write(f"{quiz.name}: {unpack_submissions(submissions)} submission(s) unpacked")
+                continue
+            count, skipped = pack_submissions(submissions)
+            self.stdout.write(f"{quiz.name}: {count} submission(s) packed")
+            for submission_id, reason in skipped.items():
+                self.stderr.write(f"{quiz.name}: submission {submission_id} left unpacked: {reason}")
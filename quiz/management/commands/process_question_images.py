@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.images import needs_processing, process_question_image
+from quiz.models import Question, Quiz
+
+
+class Command(BaseCommand):
+    help = (
+        "Write resized WebP/JPEG copies of question images and record their "
+        "sizes, for questions saved before image processing existed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("quiz_ids", nargs="*", type=int, help="Quiz IDs (default: all quizzes)")
+        parser.add_argument("--force", action="store_true", help="Rebuild copies that are already up to date")
+
+    def handle(self, *args, **options):
+        questions = Question.objects.exclude(image="").exclude(image=None)
+        if options["quiz_ids"]:
+            found = set(Quiz.objects.filter(id__in=options["quiz_ids"]).values_list("id", flat=True))
+            missing = set(options["quiz_ids"]) - found
+            if missing:
+                raise CommandError(f"Unknown quiz id(s): {', '.join(map(str, sorted(missing)))}")
+            questions = questions.filter(quiz_id__in=options["quiz_ids"])
+
+        done = skipped = failed = 0
+        for question in questions.order_by("id").iterator():
+            if not options["force"] and not needs_processing(question):
+                skipped += 1
+                continue
+            try:
+                process_question_image(question, force=True)
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"Question {question.id} ({question.image.name}): {e}")
+                continue
+            done += 1
+            sizes = ", ".join(str(width) for width, _ in question.image_variants.get("jpeg", []))
+            self.stdout.write(f"Question {question.id}: {question.image_width}x{question.image_height} -> {sizes}")
+
+        self.stdout.write(f"{done} processed, {skipped} already up to date, {failed} failed.")
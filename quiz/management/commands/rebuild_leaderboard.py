@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.leaderboard import rebuild
+from quiz.models import Quiz
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild quiz leaderboards from the database. Running web workers "
+        "drop their in-memory copy and reload it on the next read."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("quiz_ids", nargs="*", type=int, help="Quiz IDs (default: all quizzes)")
+        parser.add_argument("--top", type=int, default=10, help="Standings to print after the rebuild")
+
+    def handle(self, *args, **options):
+        quizzes = Quiz.objects.all()
+        if options["quiz_ids"]:
+            quizzes = quizzes.filter(id__in=options["quiz_ids"])
+            missing = set(options["quiz_ids"]) - {q.id for q in quizzes}
+            if missing:
+                raise CommandError(f"Unknown quiz id(s): {', '.join(map(str, sorted(missing)))}")
+
+        for quiz in quizzes:
+            board = rebuild(quiz.id)
+            self.stdout.write(f"{quiz.name}: {len(board)} participant(s)")
+            for s in board.top(options["top"]):
+                self.stdout.write(f"  #{s.rank:<4} {s.phone:<14} {s.score:>4}  {s.time_taken_seconds}s")
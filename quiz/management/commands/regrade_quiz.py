@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.models import Quiz
+from quiz.regrade import regrade_quiz
+
+
+class Command(BaseCommand):
+    help = "Re-grade every submission of the given quizzes against the current answer key."
+
+    def add_arguments(self, parser):
+        parser.add_argument("quiz_ids", nargs="+", type=int)
+
+    def handle(self, *args, **options):
+        quizzes = Quiz.objects.filter(id__in=options["quiz_ids"])
+        missing = set(options["quiz_ids"]) - {q.id for q in quizzes}
+        if missing:
+            raise CommandError(f"Unknown quiz id(s): {', '.join(map(str, sorted(missing)))}")
+
+        for quiz in quizzes:
+            report = regrade_quiz(quiz)
+            self.stdout.write(report.summary())
+            for line in report.distribution_lines():
+                self.stdout.write(f"  {line}")
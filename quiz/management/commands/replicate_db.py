@@ -0,0 +1,84 @@
+"""
+Copies the primary SQLite database onto the read replica.
+
+Each copy is a full online backup, read in one transaction so the replica
+gets a consistent snapshot. In SQLite's default rollback-journal mode that
+read transaction holds a SHARED lock on the primary for the whole copy, and
+every writer (submit_quiz included) stalls until it ends. The command
+therefore switches the primary to WAL first (a persistent setting of the
+file), where a reader never blocks writers: submissions keep committing
+during the copy, into the WAL file, and the copy sees the state at its start.
+The replica becomes a WAL database too, so its readers keep reading the
+previous copy until the new one commits.
+
+Switching modes needs a moment with no other connection writing; if the
+primary is busy the command stops and asks to be run again. With --no-wal
+the primary is left as it is, and writers stall for the length of each copy.
+"""
+import sqlite3
+import time
+from contextlib import closing
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from quiz.routers import REPLICA
+
+
+def enable_wal(path):
+    """Switch the SQLite database at `path` to WAL mode; returns the mode now in effect."""
+    with closing(sqlite3.connect(path, timeout=30)) as db:
+        return db.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+
+
+def copy_database(source, target):
+    """One consistent copy of `source` onto `target` (SQLite file paths)."""
+    with closing(sqlite3.connect(source, timeout=30)) as src, \
+            closing(sqlite3.connect(target, timeout=30)) as dst:
+        src.backup(dst)
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database onto the read replica with SQLite's "
+        "online backup API. Run once, or with --interval to keep the replica "
+        "in sync during an event. Switches the primary to WAL mode so writers "
+        "don't stall while it is copied."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, help="Seconds between copies (default: copy once)")
+        parser.add_argument(
+            "--no-wal",
+            action="store_true",
+            help="Leave the primary's journal mode alone (writers then wait for each copy)",
+        )
+
+    def handle(self, *args, **options):
+        if REPLICA not in connections.settings:
+            raise CommandError("No replica database configured; set QUIZ_REPLICA_DB.")
+        for alias in ("default", REPLICA):
+            if connections[alias].vendor != "sqlite":
+                raise CommandError(f"Database '{alias}' is not SQLite; use the server's own replication.")
+
+        source = str(connections["default"].settings_dict["NAME"])
+        target = str(connections[REPLICA].settings_dict["NAME"])
+        if source == target:
+            raise CommandError("The replica points at the primary database file.")
+
+        if not options["no_wal"]:
+            try:
+                mode = enable_wal(source)
+            except sqlite3.OperationalError as e:
+                raise CommandError(f"Could not switch {source} to WAL mode ({e}); run again when it is less busy.")
+            if mode.lower() != "wal":
+                raise CommandError(f"{source} stayed in {mode} mode; writers would stall during copies (see --no-wal).")
+
+        while True:
+            started = time.monotonic()
+            copy_database(source, target)
+            self.stdout.write(f"Replicated {source} -> {target} in {time.monotonic() - started:.2f}s")
+
+            if not options["interval"]:
+                return
+            time.sleep(max(0.0, options["interval"] - (time.monotonic() - started)))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from quiz.loadtest import start_stub_registration_api
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve a stand-in for the participant registration API with configurable "
+        "latency and failures. Point QUIZ_REGISTRATION_API_URL at it when load "
+        "testing a real deployment with `manage.py loadtest --base-url`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--latency", type=float, default=0.2, help="Mean response latency (s)")
+        parser.add_argument("--jitter", type=float, default=0.1, help="Latency std-dev (s)")
+        parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of calls answered with HTTP 500")
+        parser.add_argument("--unregistered-rate", type=float, default=0.0, help="Share of numbers reported unregistered")
+
+    def handle(self, *args, **options):
+        server, url = start_stub_registration_api(
+            host=options["host"],
+            port=options["port"],
+            latency=options["latency"],
+            jitter=options["jitter"],
+            failure_rate=options["failure_rate"],
+            unregistered_rate=options["unregistered_rate"],
+        )
+        self.stdout.write(f"Stub registration API on {url} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
@@ -0,0 +1,40 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.routers import db_for_quiz, submission_dbs
+from quiz.shards import mirror_quiz, sharded_quiz_ids, stranded_submissions
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or migrate the per-event shard databases (QUIZ_SHARDS) and "
+        "mirror each sharded quiz and its questions into its shard."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("quiz_ids", nargs="*", type=int, help="Quiz IDs (default: all sharded quizzes)")
+        parser.add_argument("--skip-migrate", action="store_true", help="Only mirror quizzes and questions")
+
+    def handle(self, *args, **options):
+        quiz_ids = options["quiz_ids"] or sharded_quiz_ids()
+        unsharded = [quiz_id for quiz_id in quiz_ids if db_for_quiz(quiz_id) == "default"]
+        if unsharded:
+            raise CommandError(f"Quiz id(s) not in QUIZ_SHARDS: {', '.join(map(str, sorted(unsharded)))}")
+        if not quiz_ids:
+            self.stdout.write("No shards configured.")
+            return
+
+        if not options["skip_migrate"]:
+            for alias in submission_dbs()[1:]:
+                call_command("migrate", database=alias, interactive=False, verbosity=0)
+                self.stdout.write(f"{alias}: schema up to date")
+
+        for quiz_id in quiz_ids:
+            mirrored = mirror_quiz(quiz_id)
+            self.stdout.write(f"Quiz {quiz_id} -> {db_for_quiz(quiz_id)}: {mirrored} question(s) mirrored")
+            stranded = stranded_submissions(quiz_id)
+            if stranded:
+                self.stdout.write(self.style.WARNING(
+                    f"  {stranded} submission(s) of quiz {quiz_id} are still on the primary database "
+                    "and won't be seen by the participant flow."
+                ))
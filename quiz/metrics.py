@@ -0,0 +1,346 @@
+"""
+Request and dependency metrics in the Prometheus text format.
+
+Each process aggregates into a few counters and fixed-bucket histograms held
+in memory, so recording costs a dict lookup and a few additions under a lock:
+
+- quiz_http_request_duration_seconds{view}: latency per URL name
+  (MetricsMiddleware; time to the first byte for streaming responses)
+- quiz_http_responses_total{view,code}: responses by status class
+- quiz_db_queries_per_request{view}, quiz_db_query_seconds_total{view}:
+  queries counted by an execute_wrapper installed on every connection; the
+  request they belong to travels in a context variable, so queries made from
+  sync_to_async threads of the async views are counted too
+- quiz_registration_api_seconds{outcome}, quiz_registration_skipped_total:
+  calls to the college registration API (quiz.registration)
+- quiz_submission_commit_seconds{database}, quiz_submissions_committed_total:
+  ingestion batches (quiz.ingest)
+- quiz_session_bytes{op}: encoded session size on load and on save
+  (quiz.sessions)
+
+With several workers, set QUIZ_METRICS_DIR: every process writes its totals to
+a file of its own there at most every QUIZ_METRICS_FLUSH_INTERVAL seconds (and
+at exit), and the endpoint adds up all the files. A process folds the files of
+stopped processes into metrics-archive.json when it first writes, so counters
+don't go backwards and a scrape reads one file per live process plus the
+archive. Process ids mean nothing on another host, so the directory must be
+shared by the workers of one host only.
+
+The endpoint (metrics_view, /metrics/) is open to staff, or to a scraper
+sending "Authorization: Bearer <QUIZ_METRICS_TOKEN>".
+"""
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import locks
+
+
+METRICS_DIR = getattr(settings, "QUIZ_METRICS_DIR", None)
+FLUSH_INTERVAL = getattr(settings, "QUIZ_METRICS_FLUSH_INTERVAL", 5)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+ARCHIVE_FILE = "metrics-archive.json"
+LOCK_FILE = "metrics.lock"
+
+
+class Registry:
+    """One process's metrics: {name: {label values: value}}."""
+
+    def __init__(self):
+        self.metrics = {}  # name -> Counter or Histogram
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._file = None
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(self, name, help, labels))
+
+    def histogram(self, name, help, buckets, labels=()):
+        return self._register(Histogram(self, name, help, labels, buckets))
+
+    def _register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self):
+        with self._lock:
+            return {name: {json.dumps(key): value[:] for key, value in metric.values.items()}
+                    for name, metric in self.metrics.items()}
+
+    # ---------- Several processes ----------
+
+    def flush(self):
+        """Write this process's totals to its file in METRICS_DIR."""
+        if not METRICS_DIR:
+            return
+        if self._file is None:
+            Path(METRICS_DIR).mkdir(parents=True, exist_ok=True)
+            self._file = Path(METRICS_DIR) / f"metrics-{os.getpid()}-{time.time_ns()}.json"
+            self.archive_stopped()
+        tmp = self._file.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.snapshot()))
+        os.replace(tmp, self._file)
+
+    def maybe_flush(self):
+        now = time.monotonic()
+        if METRICS_DIR and now - self._last_flush >= FLUSH_INTERVAL:
+            self._last_flush = now
+            self.flush()
+
+    def _stopped(self, path):
+        try:
+            pid = int(path.name.split("-")[1])
+        except (IndexError, ValueError):
+            return False  # the archive, or not one of ours
+        if pid == os.getpid():
+            return path != self._file  # an earlier process with the same pid
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass  # alive, but someone else's
+        return False
+
+    def archive_stopped(self):
+        """Add the files of stopped processes to ARCHIVE_FILE and remove them."""
+        directory = Path(METRICS_DIR)
+        with _locked(directory):
+            stopped = [path for path in directory.glob("metrics-*.json") if self._stopped(path)]
+            if not stopped:
+                return
+            archive = directory / ARCHIVE_FILE
+            totals = _read(archive)
+            for path in stopped:
+                _add(totals, _read(path))
+            tmp = archive.with_suffix(".tmp")
+            tmp.write_text(json.dumps(totals))
+            os.replace(tmp, archive)
+            for path in stopped:
+                path.unlink(missing_ok=True)
+
+    def collect(self):
+        """Totals over every process (or just this one without METRICS_DIR)."""
+        if not METRICS_DIR:
+            return self.snapshot()
+        self.flush()
+        merged = {}
+        # The lock keeps an archiving process from moving a file between reads
+        with _locked(Path(METRICS_DIR)):
+            for path in Path(METRICS_DIR).glob("metrics-*.json"):
+                _add(merged, _read(path))
+        return merged
+
+    # ---------- Text format ----------
+
+    def render(self):
+        totals = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for key, value in sorted(totals.get(name, {}).items()):
+                lines.extend(metric.lines(dict(zip(metric.labels, json.loads(key))), value))
+        return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def _locked(directory):
+    with open(directory / LOCK_FILE, "ab") as f:
+        locks.lock(f, locks.LOCK_EX)
+        try:
+            yield
+        finally:
+            locks.unlock(f)
+
+
+def _read(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}  # not written yet, or unreadable
+
+
+def _add(merged, snapshot):
+    for name, values in snapshot.items():
+        target = merged.setdefault(name, {})
+        for key, value in values.items():
+            if key in target:
+                target[key] = [a + b for a, b in zip(target[key], value)]
+            else:
+                target[key] = value
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, registry, name, help, labels):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}  # label values -> [total]
+
+    def inc(self, amount=1, *label_values):
+        with self.registry._lock:
+            value = self.values.setdefault(label_values, [0])
+            value[0] += amount
+
+    def lines(self, labels, value):
+        return [f"{self.name}{_format_labels(labels)} {_format_value(value[0])}"]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, registry, name, help, labels, buckets):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.values = {}  # label values -> [count per bucket..., +Inf count, sum]
+
+    def observe(self, amount, *label_values):
+        with self.registry._lock:
+            value = self.values.get(label_values)
+            if value is None:
+                value = self.values[label_values] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if amount <= bound:
+                    value[i] += 1
+                    break
+            else:
+                value[-2] += 1
+            value[-1] += amount
+
+    def lines(self, labels, value):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), value[:-1]):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': bound})} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(value[-1])}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+registry = Registry()
+atexit.register(registry.flush)
+
+request_duration = registry.histogram(
+    "quiz_http_request_duration_seconds", "Request latency by URL name.", LATENCY_BUCKETS, ("view",)
+)
+responses = registry.counter(
+    "quiz_http_responses_total", "Responses by URL name and status class.", ("view", "code")
+)
+request_queries = registry.histogram(
+    "quiz_db_queries_per_request", "Database queries per request.", QUERY_BUCKETS, ("view",)
+)
+request_query_seconds = registry.counter(
+    "quiz_db_query_seconds_total", "Time spent in database queries.", ("view",)
+)
+registration_seconds = registry.histogram(
+    "quiz_registration_api_seconds", "Registration API calls by outcome.", LATENCY_BUCKETS, ("outcome",)
+)
+registration_skipped = registry.counter(
+    "quiz_registration_skipped_total", "Registration API calls skipped while the circuit is open."
+)
+commit_seconds = registry.histogram(
+    "quiz_submission_commit_seconds", "Submission batch commits by database.", LATENCY_BUCKETS, ("database",)
+)
+submissions_committed = registry.counter(
+    "quiz_submissions_committed_total", "Submissions in committed batches (new or already stored) by database.", ("database",)
+)
+session_bytes = registry.histogram(
+    "quiz_session_bytes", "Encoded session size on load (read) and save (write).", SIZE_BUCKETS, ("op",)
+)
+
+
+# ---------- Database queries per request ----------
+
+_query_tally = contextvars.ContextVar("quiz_query_tally", default=None)
+
+
+def count_queries(execute, sql, params, many, context):
+    """execute_wrapper adding to the current request's tally (if any)."""
+    tally = _query_tally.get()
+    if tally is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        tally[0] += 1
+        tally[1] += time.perf_counter() - start
+
+
+def install_query_counter(sender, connection, **kwargs):
+    """Connect to connection_created (see QuizConfig.ready)."""
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+def begin_request():
+    """Start timing a request; returns the state for end_request()."""
+    return time.perf_counter(), _query_tally.set([0, 0.0])
+
+
+def end_request(request, response, state):
+    start, token = state
+    elapsed = time.perf_counter() - start
+    queries, query_seconds = _query_tally.get()
+    _query_tally.reset(token)
+
+    match = getattr(request, "resolver_match", None)
+    view = match.view_name if match else "unmatched"
+    request_duration.observe(elapsed, view)
+    responses.inc(1, view, f"{response.status_code // 100}xx")
+    request_queries.observe(queries, view)
+    if query_seconds:
+        request_query_seconds.inc(query_seconds, view)
+    registry.maybe_flush()
+
+
+# ---------- Dependencies ----------
+
+def registration_call(seconds, outcome):
+    registration_seconds.observe(seconds, outcome)
+
+
+def batch_committed(using, seconds, count):
+    commit_seconds.observe(seconds, using)
+    submissions_committed.inc(count, using)
+    registry.maybe_flush()
+
+
+def session_loaded(size):
+    session_bytes.observe(size, "read")
+
+
+def session_saved(size):
+    session_bytes.observe(size, "write")
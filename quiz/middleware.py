@@ -0,0 +1,37 @@
+from asgiref.sync import iscoroutinefunction
+from django.utils.decorators import sync_and_async_middleware
+
+from . import metrics
+from .routers import PIN_COOKIE, pinned_to_primary
+
+
+@sync_and_async_middleware
+def ReplicaPinMiddleware(get_response):
+    """Send all reads of a pinned client (see quiz.routers) to the primary."""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            with pinned_to_primary(PIN_COOKIE in request.COOKIES):
+                return await get_response(request)
+    else:
+        def middleware(request):
+            with pinned_to_primary(PIN_COOKIE in request.COOKIES):
+                return get_response(request)
+    return middleware
+
+
+@sync_and_async_middleware
+def MetricsMiddleware(get_response):
+    """Latency and database queries per URL name (see quiz.metrics)."""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            state = metrics.begin_request()
+            response = await get_response(request)
+            metrics.end_request(request, response, state)
+            return response
+    else:
+        def middleware(request):
+            state = metrics.begin_request()
+            response = get_response(request)
+            metrics.end_request(request, response, state)
+            return response
+    return middleware
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0009_quiz_show_results'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaperVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField()),
+                ('question_ids', models.JSONField(default=list)),
+                ('option_orders', models.JSONField(default=list, help_text="One string per question, e.g. 'CADB'")),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='quiz.quiz')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('quiz', 'index'), name='unique_paper_variant_index')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0010_paper_variant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Participant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.CharField(help_text='Event name as used by the registration API', max_length=100)),
+                ('mobile', models.CharField(max_length=20)),
+                ('name', models.CharField(max_length=200)),
+                ('college', models.CharField(blank=True, max_length=255)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('event', 'mobile'), name='unique_participant_event_mobile')],
+            },
+        ),
+    ]
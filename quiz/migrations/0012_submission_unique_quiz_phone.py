@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:18
+
+from collections import defaultdict
+
+from django.core.management.base import CommandError
+from django.db import migrations, models
+
+
+REPORT_LIMIT = 50
+
+
+def dedupe_submissions(apps, schema_editor):
+    """
+    Make existing rows satisfy the (quiz, phone) constraint.
+
+    Submissions saved without a phone get a unique "unknown-<id>" placeholder so
+    they are kept. A phone that attempted a quiz more than once is not resolved
+    here: deleting the repeats would take their answers and feedback with them.
+    The migration stops with a list of them instead; delete the attempts that
+    should not count (e.g. from the admin) and run migrate again.
+    """
+    Submission = apps.get_model("quiz", "Submission")
+    submissions = Submission.objects.using(schema_editor.connection.alias)
+
+    for sub in submissions.filter(phone="").only("id"):
+        submissions.filter(id=sub.id).update(phone=f"unknown-{sub.id}")
+
+    attempts = defaultdict(list)
+    rows = submissions.order_by("id").values_list("id", "quiz_id", "phone", "score", "submitted_at")
+    for sub_id, quiz_id, phone, score, submitted_at in rows:
+        attempts[quiz_id, phone].append(f"#{sub_id} (score {score}, {submitted_at:%Y-%m-%d %H:%M})")
+    duplicates = [
+        f"  quiz {quiz_id}, phone {phone}: {', '.join(subs)}"
+        for (quiz_id, phone), subs in attempts.items()
+        if len(subs) > 1
+    ]
+    if duplicates:
+        shown = duplicates[:REPORT_LIMIT]
+        if len(duplicates) > REPORT_LIMIT:
+            shown.append(f"  ... and {len(duplicates) - REPORT_LIMIT} more")
+        raise CommandError(
+            f"{len(duplicates)} phone(s) attempted a quiz more than once, which the "
+            "unique (quiz, phone) constraint added by this migration forbids. Keep one "
+            "submission of each and run migrate again:\n" + "\n".join(shown)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0011_participant'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_submissions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='submission',
+            constraint=models.UniqueConstraint(fields=('quiz', 'phone'), name='unique_submission_quiz_phone'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:42
+
+from django.db import migrations, models
+from django.utils.html import strip_tags
+
+
+def fill_text_plain(apps, schema_editor):
+    """Strip the HTML of existing questions once, as Question.save() now does."""
+    Question = apps.get_model("quiz", "Question")
+    questions = list(Question.objects.using(schema_editor.connection.alias).only("id", "text_html"))
+    for question in questions:
+        question.text_plain = strip_tags(question.text_html or "")
+    Question.objects.using(schema_editor.connection.alias).bulk_update(questions, ["text_plain"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0014_question_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='text_plain',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(fill_text_plain, migrations.RunPython.noop),
+    ]
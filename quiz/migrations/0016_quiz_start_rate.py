@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0015_question_text_plain'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='start_rate_per_minute',
+            field=models.PositiveIntegerField(blank=True, help_text='Participants let in per minute at quiz start; the rest wait in a queue. Empty = no limit', null=True),
+        ),
+    ]
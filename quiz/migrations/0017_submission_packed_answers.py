@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0016_quiz_start_rate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='answer_choices',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='answer_correct_mask',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='answer_key',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='answer_question_ids',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
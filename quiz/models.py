@@ -1,5 +1,6 @@
 from django.db import models
 from ckeditor.fields import RichTextField
+from django.utils.html import strip_tags
 
 
 class Quiz(models.Model):
@@ -9,6 +10,10 @@ class Quiz(models.Model):
     description = models.TextField(blank=True, help_text="Short description shown on landing page")
     is_active = models.BooleanField(default=True, help_text="If unchecked, users cannot start this quiz")
     show_results = models.BooleanField(default=True, help_text="If unchecked, users only see submission confirmation (no score/details)")
+    start_rate_per_minute = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text="Participants let in per minute at quiz start; the rest wait in a queue. Empty = no limit",
+    )
 
     def __str__(self):
         return self.name
@@ -19,12 +24,26 @@ class Question(models.Model):
     # text_html = models.TextField()
     text_html = RichTextField()
     image = models.ImageField(upload_to='quiz_images/', blank=True, null=True)
+    # Filled in by quiz.images when an image is uploaded: its size (after EXIF
+    # rotation) and the resized copies, {"source": name, "webp": [[width, name], ...], "jpeg": [...]}
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     option_a = models.TextField()
     option_b = models.TextField()
     option_c = models.TextField()
     option_d = models.TextField()
     correct_option = models.CharField(max_length=1)  # 'A','B','C','D'
+    # text_html with the tags stripped, kept for admin lists and exports
+    text_plain = models.TextField(blank=True, default="", editable=False)
+
+    def save(self, *args, **kwargs):
+        self.text_plain = strip_tags(self.text_html or "")
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "text_html" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "text_plain"}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.quiz.name} – Q{self.id}"
@@ -43,6 +62,21 @@ class Submission(models.Model):
     time_taken_seconds = models.IntegerField(default=0)
     submitted_at = models.DateTimeField(auto_now_add=True)
 
+    # Packed answers (QUIZ_ANSWER_STORAGE = "packed", see quiz/packing.py) instead
+    # of Answer rows: the paper's question ids in order ("12,7,31"), one letter per
+    # question for the choice ("-" = unanswered) and for the answer key, and the
+    # correct ones as a hex bitmask (bit i = question i). Empty for row storage.
+    answer_question_ids = models.TextField(blank=True, default="")
+    answer_choices = models.TextField(blank=True, default="")
+    answer_key = models.TextField(blank=True, default="")
+    answer_correct_mask = models.TextField(blank=True, default="")
+
+    class Meta:
+        constraints = [
+            # One attempt per phone per quiz; also the index behind attempt lookups
+            models.UniqueConstraint(fields=["quiz", "phone"], name="unique_submission_quiz_phone"),
+        ]
+
     def __str__(self):
         return f"{self.quiz.name} – {self.phone} – {self.score}/{self.total_questions}"
 
@@ -73,3 +107,98 @@ class Feedback(models.Model):
 
     def __str__(self):
         return f"Feedback for {self.submission}"
+
+
+class PaperVariant(models.Model):
+    """
+    A pre-built paper for a quiz: which questions are shown and the option order
+    for each of them. Built ahead of the event by `manage.py build_paper_variants`
+    (or the Quiz admin action) so participants can be served a cached page.
+    """
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name="variants")
+    index = models.PositiveIntegerField()
+    question_ids = models.JSONField(default=list)
+    option_orders = models.JSONField(default=list, help_text="One string per question, e.g. 'CADB'")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["quiz", "index"], name="unique_paper_variant_index"),
+        ]
+
+    def __str__(self):
+        return f"{self.quiz.name} – Variant {self.index}"
+
+
+class Participant(models.Model):
+    """
+    Local copy of the college registration roster, keyed by (event, mobile).
+    Filled by `manage.py import_roster` and by successful registration API lookups,
+    so prelims_entry rarely has to call the college server.
+    """
+    event = models.CharField(max_length=100, help_text="Event name as used by the registration API")
+    mobile = models.CharField(max_length=20)
+    name = models.CharField(max_length=200)
+    college = models.CharField(max_length=255, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["event", "mobile"], name="unique_participant_event_mobile"),
+        ]
+
+    def __str__(self):
+        return f"{self.event} – {self.mobile} – {self.name}"
+
+
+class QuestionStats(models.Model):
+    """
+    Running item-analysis totals for one question, kept up to date as submissions
+    are committed (see quiz.analysis). Only sums are stored; the statistics shown
+    in the admin are derived from them.
+    """
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name="stats")
+    responses = models.IntegerField(default=0)
+    correct = models.IntegerField(default=0)
+    unanswered = models.IntegerField(default=0)
+    chose_a = models.IntegerField(default=0)
+    chose_b = models.IntegerField(default=0)
+    chose_c = models.IntegerField(default=0)
+    chose_d = models.IntegerField(default=0)
+    # Sums of the submission's total score, for the point-biserial correlation
+    score_sum = models.BigIntegerField(default=0)
+    score_sq_sum = models.BigIntegerField(default=0)
+    correct_score_sum = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats for Q{self.question_id}"
+
+    @property
+    def p_value(self):
+        """Share of respondents who answered correctly (item difficulty)."""
+        return self.correct / self.responses if self.responses else None
+
+    @property
+    def unanswered_rate(self):
+        return self.unanswered / self.responses if self.responses else None
+
+    def option_rate(self, letter):
+        count = getattr(self, f"chose_{letter.lower()}")
+        return count / self.responses if self.responses else None
+
+    @property
+    def discrimination(self):
+        """Point-biserial correlation between answering correctly and total score."""
+        n, n1 = self.responses, self.correct
+        n0 = n - n1
+        if not n1 or not n0:
+            return None
+        mean = self.score_sum / n
+        variance = self.score_sq_sum / n - mean * mean
+        if variance <= 0:
+            return None
+        mean_correct = self.correct_score_sum / n1
+        mean_wrong = (self.score_sum - self.correct_score_sum) / n0
+        p = n1 / n
+        return (mean_correct - mean_wrong) / variance ** 0.5 * (p * (1 - p)) ** 0.5
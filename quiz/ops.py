@@ -0,0 +1,180 @@
+"""
+Live event counters for the operations dashboard.
+
+The participant views bump a few counters in the shared cache (the
+QUIZ_CACHE_ALIAS backend, see quiz.tiered) as they go: logins, quiz starts,
+submissions (with the score) and registration API failures. Each counter is kept per minute bucket and as a running total, per
+quiz, so the dashboard can show rates, the number of papers currently open
+and the average score without touching the Submission or Answer tables.
+Recording costs one or two atomic cache increments, and every worker's events
+add up in the same counters.
+
+The dashboard (admin "Live dashboard", QuizAdmin.ops_view) receives a
+snapshot() every QUIZ_OPS_PUSH_INTERVAL seconds over Server-Sent Events:
+event_stream() under WSGI, aevent_stream() under ASGI.
+"""
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .tiered import shared_cache
+
+
+LOGINS = "logins"
+STARTS = "starts"
+SUBMISSIONS = "submissions"
+SCORE_SUM = "score_sum"
+REGISTRATION_FAILURES = "registration_failures"
+
+ALL = "all"  # counters that aren't tied to a quiz
+BUCKET_KEY = "quiz:ops:{name}:{quiz_id}:{minute}"
+TOTAL_KEY = "quiz:ops:{name}:{quiz_id}:total"
+STARTED_KEY = "quiz:ops:started:{quiz_id}:{phone}"
+BUCKET_TTL = 2 * 60 * 60
+
+RATE_WINDOW = getattr(settings, "QUIZ_OPS_RATE_WINDOW", 5)
+PUSH_INTERVAL = getattr(settings, "QUIZ_OPS_PUSH_INTERVAL", 2)
+STREAM_SECONDS = getattr(settings, "QUIZ_OPS_STREAM_SECONDS", 300)
+SYNC_STREAM_SECONDS = getattr(settings, "QUIZ_OPS_SYNC_STREAM_SECONDS", 30)
+
+
+def _minute(now=None):
+    return int((now or time.time()) // 60)
+
+
+def _incr(key, amount, timeout):
+    cache = shared_cache()
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        # First event of the bucket; another worker may create it meanwhile
+        if not cache.add(key, amount, timeout):
+            cache.incr(key, amount)
+
+
+def record(name, quiz_id=ALL, amount=1):
+    _incr(BUCKET_KEY.format(name=name, quiz_id=quiz_id, minute=_minute()), amount, BUCKET_TTL)
+    _incr(TOTAL_KEY.format(name=name, quiz_id=quiz_id), amount, None)
+
+
+def login(quiz_id):
+    record(LOGINS, quiz_id)
+
+
+def quiz_started(quiz, phone):
+    """Count a participant's first quiz page; reloads don't count again."""
+    marker = STARTED_KEY.format(quiz_id=quiz.id, phone=phone)
+    if shared_cache().add(marker, 1, timeout=(quiz.duration_minutes + 5) * 60):
+        record(STARTS, quiz.id)
+
+
+def submitted(quiz_id, score):
+    record(SUBMISSIONS, quiz_id)
+    if score:
+        record(SCORE_SUM, quiz_id, score)
+
+
+def registration_failed():
+    record(REGISTRATION_FAILURES)
+
+
+def _series(values, name, quiz_id, minutes):
+    return sum(values.get(BUCKET_KEY.format(name=name, quiz_id=quiz_id, minute=m), 0) for m in minutes)
+
+
+def snapshot(quizzes, now=None):
+    """
+    Current figures for the dashboard.
+
+    `quizzes` is a list of (id, name, duration_minutes); everything else comes
+    from the cache in a single get_many.
+    """
+    from .registration import breaker  # registration records its failures here
+
+    now = now or time.time()
+    current = _minute(now)
+    longest = max([RATE_WINDOW] + [duration + 1 for _, _, duration in quizzes])
+    minutes = range(current - longest + 1, current + 1)
+    rate_minutes = minutes[-RATE_WINDOW:]
+    # Full minutes of the window plus the part of the current one
+    elapsed = RATE_WINDOW - 1 + (now % 60) / 60
+
+    keys = [TOTAL_KEY.format(name=REGISTRATION_FAILURES, quiz_id=ALL)]
+    keys += [BUCKET_KEY.format(name=REGISTRATION_FAILURES, quiz_id=ALL, minute=m) for m in rate_minutes]
+    for quiz_id, _, _ in quizzes:
+        keys += [TOTAL_KEY.format(name=name, quiz_id=quiz_id) for name in (LOGINS, SUBMISSIONS, SCORE_SUM)]
+        keys += [BUCKET_KEY.format(name=LOGINS, quiz_id=quiz_id, minute=m) for m in rate_minutes]
+        keys += [BUCKET_KEY.format(name=name, quiz_id=quiz_id, minute=m) for name in (STARTS, SUBMISSIONS) for m in minutes]
+    values = shared_cache().get_many(keys)
+
+    def total(name, quiz_id):
+        return values.get(TOTAL_KEY.format(name=name, quiz_id=quiz_id), 0)
+
+    def rate(name, quiz_id):
+        return round(_series(values, name, quiz_id, rate_minutes) / elapsed, 1)
+
+    rows = []
+    for quiz_id, name, duration in quizzes:
+        # A paper is open from its first page until it is submitted or time runs out
+        window = minutes[-(duration + 1):]
+        submissions = total(SUBMISSIONS, quiz_id)
+        rows.append({
+            "quiz_id": quiz_id,
+            "name": name,
+            "logins_per_min": rate(LOGINS, quiz_id),
+            "active_sessions": max(
+                0, _series(values, STARTS, quiz_id, window) - _series(values, SUBMISSIONS, quiz_id, window)
+            ),
+            "submissions_per_min": rate(SUBMISSIONS, quiz_id),
+            "logins": total(LOGINS, quiz_id),
+            "submissions": submissions,
+            "average_score": round(total(SCORE_SUM, quiz_id) / submissions, 2) if submissions else None,
+        })
+
+    return {
+        "time": int(now),
+        "quizzes": rows,
+        "registration_failures": total(REGISTRATION_FAILURES, ALL),
+        "registration_failures_per_min": rate(REGISTRATION_FAILURES, ALL),
+        # This worker's breaker; others may differ
+        "registration_circuit_open": breaker.is_open,
+    }
+
+
+def _event(quizzes):
+    return f"data: {json.dumps(snapshot(quizzes))}\n\n"
+
+
+def event_stream(quizzes):
+    """
+    Server-Sent Events with a snapshot every PUSH_INTERVAL seconds, for WSGI.
+
+    Each open dashboard holds a whole worker while it sleeps, so the stream
+    ends after SYNC_STREAM_SECONDS; EventSource reconnects by itself.
+    """
+    yield f"retry: {PUSH_INTERVAL * 1000}\n\n"
+    deadline = time.monotonic() + SYNC_STREAM_SECONDS
+    while True:
+        yield _event(quizzes)
+        if time.monotonic() >= deadline:
+            return
+        time.sleep(PUSH_INTERVAL)
+
+
+async def aevent_stream(quizzes):
+    """
+    The same stream for ASGI, where Django would collect a sync iterator
+    before sending any of it. Waiting costs no thread here, so it runs for
+    STREAM_SECONDS; snapshots are read off the event loop.
+    """
+    event = sync_to_async(_event, thread_sensitive=False)
+    yield f"retry: {PUSH_INTERVAL * 1000}\n\n"
+    deadline = time.monotonic() + STREAM_SECONDS
+    while True:
+        yield await event(quizzes)
+        if time.monotonic() >= deadline:
+            return
+        await asyncio.sleep(PUSH_INTERVAL)
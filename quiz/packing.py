@@ -0,0 +1,296 @@
+"""
+Packed answer storage.
+
+By default every submission writes one Answer row per question, repeating the
+answer key and correctness on each. With QUIZ_ANSWER_STORAGE = "packed" the
+ingestion writer stores them on the Submission row instead (see the answer_*
+fields): the paper's question ids in order, one letter per question for the
+choice and the key, and a hex bitmask of the correct answers. A 20-question
+paper then costs one row and about 120 bytes instead of 20 rows plus their
+index entries.
+
+Readers go through this module so both layouts keep working side by side:
+load_answers() for the result page, answer_rows() for CSV exports,
+regrade_packed() and packed_stats() for re-grading and item analysis, and
+has_packed_submissions() for the Answer admin's notice.
+`manage.py pack_answers` converts existing Answer rows (and back, --unpack).
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Answer, Question, Submission
+from .tiered import tiered
+
+
+UNANSWERED = "-"
+OPTIONS = "ABCD"
+CHUNK_SIZE = 500
+PACKED_FIELDS = ["answer_question_ids", "answer_choices", "answer_key", "answer_correct_mask"]
+PACKED_NAMESPACE = "packed"
+# Seconds a "nothing packed" answer is kept; the ingestion writer packs without invalidating
+PACKED_RECHECK = 60
+
+
+def packed_storage():
+    return getattr(settings, "QUIZ_ANSWER_STORAGE", "rows") == "packed"
+
+
+def has_packed_submissions(using):
+    """
+    Whether any submission on `using` keeps its answers packed, without a
+    table scan per call (answer_question_ids has no index). Cached in
+    quiz.tiered; pack_submissions() and unpack_submissions() invalidate it.
+    """
+    found = tiered.get(PACKED_NAMESPACE, using)
+    if found is None:
+        found = Submission.objects.using(using).exclude(answer_question_ids="").exists()
+        tiered.set(PACKED_NAMESPACE, using, found, timeout=None if found else PACKED_RECHECK)
+    return found
+
+
+def pack(answers):
+    """
+    Packed field values for [(question_id, selected, correct, is_correct), ...].
+
+    Each choice takes one character, so `selected` must be one of OPTIONS or
+    None (unanswered) and `correct` one of OPTIONS or empty; anything else
+    raises ValueError rather than being stored wrongly.
+    """
+    mask = 0
+    for i, (qid, selected, correct, is_correct) in enumerate(answers):
+        if selected is not None and (len(selected) != 1 or selected not in OPTIONS):
+            raise ValueError(f"Question {qid}: cannot pack selected option {selected!r}")
+        if correct and (len(correct) != 1 or correct not in OPTIONS):
+            raise ValueError(f"Question {qid}: cannot pack correct option {correct!r}")
+        if is_correct:
+            mask |= 1 << i
+    return {
+        "answer_question_ids": ",".join(str(qid) for qid, _, _, _ in answers),
+        "answer_choices": "".join(selected or UNANSWERED for _, selected, _, _ in answers),
+        "answer_key": "".join(correct or UNANSWERED for _, _, correct, _ in answers),
+        "answer_correct_mask": format(mask, "x") if answers else "",
+    }
+
+
+def is_packed(submission):
+    return bool(submission.answer_question_ids)
+
+
+def unpack(submission):
+    """[(question_id, selected, correct, is_correct), ...] of a packed submission."""
+    if not is_packed(submission):
+        return []
+    mask = int(submission.answer_correct_mask or "0", 16)
+    return [
+        (
+            int(qid),
+            None if selected == UNANSWERED else selected,
+            "" if correct == UNANSWERED else correct,
+            bool(mask >> i & 1),
+        )
+        for i, (qid, selected, correct) in enumerate(
+            zip(submission.answer_question_ids.split(","), submission.answer_choices, submission.answer_key)
+        )
+    ]
+
+
+@dataclass
+class PackedAnswer:
+    """Stands in for an Answer row on the result page."""
+    question: Question
+    selected_option: str
+    correct_option: str
+    is_correct: bool
+
+
+def load_answers(submission):
+    """The submission's answers with .question loaded, whichever way they are stored."""
+    using = submission._state.db
+    if not is_packed(submission):
+        return list(submission.answers.using(using).select_related("question"))
+
+    answers = unpack(submission)
+    questions = Question.objects.using(using).in_bulk([qid for qid, _, _, _ in answers])
+    return [
+        PackedAnswer(questions[qid], selected, correct, is_correct)
+        for qid, selected, correct, is_correct in answers
+        # A question deleted since is dropped, as its Answer row would have been
+        if qid in questions
+    ]
+
+
+def answer_rows(submissions):
+    """
+    Export rows for every answer of `submissions`, packed or not:
+    [answer id ("" if packed), submission id, quiz id, quiz name, phone,
+     question id, question text, selected, correct, is_correct].
+    Three queries per CHUNK_SIZE submissions.
+    """
+    using = submissions.db
+    text = {}
+    ids = list(submissions.order_by("id").values_list("id", flat=True))
+    for start in range(0, len(ids), CHUNK_SIZE):
+        chunk = list(
+            Submission.objects.using(using).filter(id__in=ids[start:start + CHUNK_SIZE])
+            .select_related("quiz").order_by("id")
+        )
+        answers = defaultdict(list)
+        for sub_id, *answer in (
+            Answer.objects.using(using)
+            .filter(submission_id__in=[s.id for s in chunk if not is_packed(s)])
+            .order_by("id")
+            .values_list("submission_id", "id", "question_id", "selected_option", "correct_option", "is_correct")
+        ):
+            answers[sub_id].append(answer)
+        for submission in chunk:
+            if is_packed(submission):
+                answers[submission.id] = [("", *answer) for answer in unpack(submission)]
+
+        missing = {answer[1] for rows in answers.values() for answer in rows} - text.keys()
+        if missing:
+            text.update(dict.fromkeys(missing, ""))
+            text.update(Question.objects.using(using).filter(id__in=missing).values_list("id", "text_plain"))
+
+        for submission in chunk:
+            for answer_id, qid, selected, correct, is_correct in answers[submission.id]:
+                yield [
+                    answer_id,
+                    submission.id,
+                    submission.quiz_id,
+                    submission.quiz.name,
+                    submission.phone,
+                    qid,
+                    text[qid],
+                    selected or "",
+                    correct,
+                    is_correct,
+                ]
+
+
+def _packed_chunks(queryset, *fields):
+    """The packed submissions of `queryset`, CHUNK_SIZE at a time (safe to update as we go)."""
+    ids = list(queryset.exclude(answer_question_ids="").order_by("id").values_list("id", flat=True))
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield list(
+            Submission.objects.using(queryset.db)
+            .filter(id__in=ids[start:start + CHUNK_SIZE])
+            .only("id", *PACKED_FIELDS, *fields)
+        )
+
+
+def regrade_packed(quiz, using, key):
+    """
+    Re-grade the packed submissions of `quiz` against `key` ({question_id: letter}).
+    Returns (answers, submissions) changed; unchanged submissions aren't written.
+    """
+    changed_answers = 0
+    changed_submissions = 0
+    for chunk in _packed_chunks(Submission.objects.using(using).filter(quiz=quiz), "score"):
+        regraded_submissions = []
+        for submission in chunk:
+            answers = unpack(submission)
+            regraded = []
+            for qid, selected, correct, is_correct in answers:
+                new_correct = key.get(qid, correct)
+                new_is_correct = bool(selected) and selected == new_correct
+                regraded.append((qid, selected, new_correct, new_is_correct))
+            score = sum(1 for _, _, _, is_correct in regraded if is_correct)
+            changed = sum(1 for old, new in zip(answers, regraded) if old != new)
+            if not changed and score == submission.score:
+                continue
+            changed_answers += changed
+            for name, value in pack(regraded).items():
+                setattr(submission, name, value)
+            submission.score = score
+            regraded_submissions.append(submission)
+        changed_submissions += len(regraded_submissions)
+        Submission.objects.using(using).bulk_update(
+            regraded_submissions, ["answer_key", "answer_correct_mask", "score"]
+        )
+    return changed_answers, changed_submissions
+
+
+def packed_stats(quiz, using):
+    """Item analysis counters ({question_id: {counter: value}}) over packed submissions."""
+    stats = defaultdict(lambda: defaultdict(int))
+    for chunk in _packed_chunks(Submission.objects.using(using).filter(quiz=quiz), "score"):
+        for submission in chunk:
+            score = submission.score
+            for qid, selected, _, is_correct in unpack(submission):
+                d = stats[qid]
+                d["responses"] += 1
+                d["score_sum"] += score
+                d["score_sq_sum"] += score * score
+                if is_correct:
+                    d["correct"] += 1
+                    d["correct_score_sum"] += score
+                if selected in ("A", "B", "C", "D"):
+                    d[f"chose_{selected.lower()}"] += 1
+                else:
+                    d["unanswered"] += 1
+    return stats
+
+
+def pack_submissions(queryset):
+    """
+    Move the Answer rows of the submissions in `queryset` into their packed fields.
+
+    Returns (packed, skipped). A submission with an answer pack() can't store
+    (a legacy choice such as "AB") keeps its Answer rows and is listed in
+    `skipped` as {submission_id: reason}, so one bad row doesn't stop the rest.
+    """
+    using = queryset.db
+    packed = 0
+    skipped = {}
+    ids = list(queryset.filter(answer_question_ids="").order_by("id").values_list("id", flat=True))
+    for start in range(0, len(ids), CHUNK_SIZE):
+        chunk = ids[start:start + CHUNK_SIZE]
+        answers = defaultdict(list)
+        # Answer ids follow the order the paper was graded in
+        for sub_id, qid, selected, correct, is_correct in (
+            Answer.objects.using(using).filter(submission_id__in=chunk).order_by("id")
+            .values_list("submission_id", "question_id", "selected_option", "correct_option", "is_correct")
+        ):
+            answers[sub_id].append((qid, selected, correct, is_correct))
+
+        submissions = []
+        for sub_id, rows in answers.items():
+            try:
+                submissions.append(Submission(id=sub_id, **pack(rows)))
+            except ValueError as e:
+                skipped[sub_id] = str(e)
+        with transaction.atomic(using=using):
+            Submission.objects.using(using).bulk_update(submissions, PACKED_FIELDS)
+            Answer.objects.using(using).filter(submission_id__in=[s.id for s in submissions]).delete()
+        packed += len(submissions)
+    tiered.invalidate(PACKED_NAMESPACE)
+    return packed, skipped
+
+
+def unpack_submissions(queryset):
+    """The reverse of pack_submissions(): write Answer rows back and clear the packed fields."""
+    using = queryset.db
+    unpacked = 0
+    for chunk in _packed_chunks(queryset):
+        rows = [
+            Answer(
+                submission_id=submission.id,
+                question_id=qid,
+                selected_option=selected,
+                correct_option=correct,
+                is_correct=is_correct,
+            )
+            for submission in chunk
+            for qid, selected, correct, is_correct in unpack(submission)
+        ]
+        with transaction.atomic(using=using):
+            Answer.objects.using(using).bulk_create(rows, batch_size=CHUNK_SIZE)
+            Submission.objects.using(using).filter(id__in=[s.id for s in chunk]).update(
+                **dict.fromkeys(PACKED_FIELDS, "")
+            )
+        unpacked += len(chunk)
+    tiered.invalidate(PACKED_NAMESPACE)
+    return unpacked
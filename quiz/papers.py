@@ -0,0 +1,256 @@
+"""
+Quiz papers: which questions a participant sees and in what option order.
+
+A paper is described by a small signed token posted back with the answers:
+the quiz, its bank version, the number of questions and either a random seed
+or the index of a pre-built variant. submit_quiz rebuilds the exact paper from
+the token, so nothing per participant is kept on the server.
+
+Instead of shuffling per participant, a quiz can also have N variants built
+ahead of time (`manage.py build_paper_variants` or the Quiz admin action).
+Each variant's quiz page is rendered once per process and cached; serving a
+participant only splices their CSRF token and phone number into the HTML.
+The same goes for the question-less shell page of QUIZ_PAPER_DELIVERY =
+"shell" (see quiz.delivery).
+"""
+import itertools
+import logging
+import random
+import secrets
+import threading
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.html import escape
+
+from .bank import get_question_bank, bump_bank_version
+from .models import PaperVariant
+
+
+logger = logging.getLogger(__name__)
+
+PAPER_SALT = "quiz.paper"
+# Only letters and underscores, so template autoescaping leaves them untouched
+CSRF_PLACEHOLDER = "__quiz_csrf_token__"
+PHONE_PLACEHOLDER = "__quiz_participant_phone__"
+
+_round_robin = itertools.count()
+
+
+def make_paper_token(bank, num, question_ids, seed=None, variant=None):
+    # The issued question ids let a paper be graded after the bank changes
+    data = {"q": bank.quiz_id, "v": bank.version, "n": num, "i": list(question_ids)}
+    if variant is not None:
+        data["p"] = variant.index
+    else:
+        data["s"] = seed
+    return signing.dumps(data, salt=PAPER_SALT, compress=True)
+
+
+def read_paper_token(token, quiz_id):
+    """The token's data, or None if it is missing, forged or for another quiz."""
+    if not token:
+        return None
+    try:
+        data = signing.loads(token, salt=PAPER_SALT)
+    except signing.BadSignature:
+        return None
+    if not isinstance(data, dict) or data.get("q") != quiz_id:
+        return None
+    return data
+
+
+def seeded_paper(bank, num, seed):
+    """Template data for the paper derived from `seed`; same seed, same paper."""
+    rng = random.Random(seed)
+    chosen = rng.sample(bank.questions, min(num, len(bank))) if num > 0 else []
+    question_data = []
+    for q in chosen:
+        options = list(q.options)
+        rng.shuffle(options)
+        question_data.append({"obj": q, "options": options})
+    return question_data
+
+
+def new_seeded_paper(bank, num):
+    """(question_data, token) for a freshly shuffled paper."""
+    num = min(num, len(bank))
+    seed = secrets.randbits(32)
+    question_data = seeded_paper(bank, num, seed)
+    return question_data, make_paper_token(bank, num, paper_ids(question_data), seed=seed)
+
+
+def paper_ids(question_data):
+    return [item["obj"].id for item in question_data]
+
+
+def paper_questions(bank, data):
+    """
+    The questions of the paper described by token `data`, in display order.
+
+    If the bank changed since the paper was issued the seed or variant no
+    longer gives the same paper; the issued questions (signed into the token)
+    that are still in the bank are graded, and the paper is filled up to its
+    size from what the seed or variant gives on the current bank.
+    """
+    num = data["n"]
+    if "p" in data:
+        variant = next((v for v in bank.variants if v.index == data["p"]), None)
+        rebuilt = [item["obj"] for item in variant_questions(bank, variant)] if variant else []
+    else:
+        rebuilt = [item["obj"] for item in seeded_paper(bank, num, data["s"])]
+
+    if data["v"] == bank.version:
+        return rebuilt
+
+    logger.warning("Quiz %s bank changed during a paper (token version %s)", bank.quiz_id, data["v"])
+    questions = [bank.by_id[qid] for qid in data.get("i", ()) if qid in bank][:num]
+    seen = {q.id for q in questions}
+    for q in rebuilt:
+        if len(questions) >= num:
+            break
+        if q.id not in seen:
+            questions.append(q)
+            seen.add(q.id)
+    return questions
+
+
+def build_paper_variants(quiz, count, rng=None):
+    """Replace the quiz's variants with `count` freshly shuffled papers."""
+    rng = rng or random.SystemRandom()
+    bank = get_question_bank(quiz.id)
+    num = min(quiz.num_questions, len(bank))
+
+    variants = []
+    for index in range(count):
+        chosen = rng.sample(bank.questions, num) if num > 0 else []
+        orders = []
+        for _ in chosen:
+            letters = list("ABCD")
+            rng.shuffle(letters)
+            orders.append("".join(letters))
+        variants.append(
+            PaperVariant(
+                quiz=quiz,
+                index=index,
+                question_ids=[q.id for q in chosen],
+                option_orders=orders,
+            )
+        )
+
+    with transaction.atomic():
+        PaperVariant.objects.filter(quiz=quiz).delete()
+        PaperVariant.objects.bulk_create(variants)
+        # bulk_create sends no post_save, so bump the version explicitly
+        transaction.on_commit(lambda: bump_bank_version(quiz.id))
+    return variants
+
+
+def assign_variant(bank, phone):
+    """Pick a variant for a participant, or None if the quiz has none built."""
+    if not bank.variants:
+        return None
+    if getattr(settings, "QUIZ_VARIANT_ASSIGNMENT", "hash") == "round_robin":
+        position = next(_round_robin)
+    else:
+        # Stable per phone, so a reload shows the same paper
+        position = zlib.crc32(phone.encode())
+    return bank.variants[position % len(bank.variants)]
+
+
+def variant_questions(bank, variant):
+    """Template data for a variant; questions deleted since the build are skipped."""
+    question_data = []
+    for qid, order in zip(variant.question_ids, variant.option_orders):
+        q = bank.by_id.get(qid)
+        if q is None:
+            continue
+        question_data.append(
+            {
+                "obj": q,
+                "options": [(letter, q.option_text(letter)) for letter in order],
+            }
+        )
+    return question_data
+
+
+class _PageCache:
+    """Bounded LRU of rendered variant pages keyed by (quiz, bank version, variant)."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key, render):
+        with self._lock:
+            html = self._pages.get(key)
+            if html is not None:
+                self._pages.move_to_end(key)
+                return html
+        html = render()
+        with self._lock:
+            self._pages[key] = html
+            while len(self._pages) > self.max_size:
+                self._pages.popitem(last=False)
+        return html
+
+
+_page_cache = _PageCache(getattr(settings, "QUIZ_PAPER_PAGE_CACHE_SIZE", 64))
+
+
+def render_variant_page(quiz, bank, variant):
+    def render():
+        question_data = variant_questions(bank, variant)
+        num = min(quiz.num_questions, len(bank))
+        return render_to_string(
+            "quiz.html",
+            {
+                "quiz": quiz,
+                "questions": question_data,
+                "duration_seconds": quiz.duration_minutes * 60,
+                "participant_phone": PHONE_PLACEHOLDER,
+                "participant_event": quiz.id,
+                "paper_token": make_paper_token(bank, num, paper_ids(question_data), variant=variant),
+                "csrf_token": CSRF_PLACEHOLDER,
+            },
+        )
+
+    return _page_cache.get_or_render((quiz.id, bank.version, variant.index), render)
+
+
+def render_shell_page(quiz, bank):
+    """quiz.html without questions; the browser fetches the paper from the JSON API (quiz.delivery)."""
+    def render():
+        return render_to_string(
+            "quiz.html",
+            {
+                "quiz": quiz,
+                "shell": True,
+                "questions": [],
+                "paper_url": reverse("quiz_paper_api", kwargs={"quiz_id": quiz.id}),
+                "duration_seconds": quiz.duration_minutes * 60,
+                "participant_phone": PHONE_PLACEHOLDER,
+                "participant_event": quiz.id,
+                "paper_token": "",
+                "csrf_token": CSRF_PLACEHOLDER,
+            },
+        )
+
+    return _page_cache.get_or_render((quiz.id, bank.version, "shell"), render)
+
+
+def splice_csrf(request, html):
+    """Put the request's CSRF token into a page rendered with CSRF_PLACEHOLDER."""
+    return html.replace(CSRF_PLACEHOLDER, get_token(request))
+
+
+def splice_participant(request, html, phone):
+    """Fill the per-participant placeholders of a cached page."""
+    return splice_csrf(request, html).replace(PHONE_PLACEHOLDER, escape(phone))
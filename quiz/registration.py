@@ -0,0 +1,289 @@
+"""
+Participant verification against the college registration roster.
+
+prelims_entry used to make a blocking call to the college PHP server for every
+login. Lookups now go to the local Participant roster first; the remote API is
+only a fallback, called through a pooled keep-alive session, guarded by a
+circuit breaker and with "not registered" answers cached for a short while.
+
+averify_participant is the same lookup for the async views: the roster and
+cache are read with async calls and the remote API through httpx when it is
+installed, so a slow college server doesn't hold a worker thread.
+"""
+import logging
+import threading
+import time
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.text import slugify
+from requests.adapters import HTTPAdapter
+
+from . import metrics, ops
+from .models import Participant
+
+try:
+    import httpx
+except ImportError:  # optional; the async views fall back to the requests session
+    httpx = None
+
+
+logger = logging.getLogger(__name__)
+
+# Quiz name -> event name expected by get_participant.php
+REGISTRATION_EVENT_NAMES = {
+    "Build With AI": "Build with AI",
+    "CodeWarz": "CodeWarz",
+}
+
+NEGATIVE_CACHE_KEY = "quiz:registration_miss:{event}:{mobile}"
+
+
+def registration_event_name(quiz_name):
+    return REGISTRATION_EVENT_NAMES.get(quiz_name, quiz_name)
+
+
+class CircuitBreaker:
+    """
+    Stops calling the remote API after `failure_threshold` consecutive failures,
+    then lets a single trial request through every `reset_timeout` seconds.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                # Half-open: push the window forward so only this caller tries
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning("Registration API circuit opened after %s failures", self._failures)
+                self._opened_at = time.monotonic()
+
+
+breaker = CircuitBreaker(
+    failure_threshold=getattr(settings, "QUIZ_REGISTRATION_FAILURE_THRESHOLD", 5),
+    reset_timeout=getattr(settings, "QUIZ_REGISTRATION_RESET_TIMEOUT", 30),
+)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def http_session():
+    """Process-wide keep-alive session for the registration API."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=getattr(settings, "QUIZ_REGISTRATION_POOL_SIZE", 10),
+                    max_retries=0,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def lookup_roster(event, mobile):
+    return Participant.objects.filter(event=event, mobile=mobile).values_list("name", "college").first()
+
+
+def _request_participant(event, mobile):
+    resp = http_session().post(
+        settings.QUIZ_REGISTRATION_API_URL,
+        json={"mobile_number": mobile, "event_name": event},
+        timeout=getattr(settings, "QUIZ_REGISTRATION_TIMEOUT", (1.0, 2.0)),
+    )
+    resp.raise_for_status()
+    # Expected JSON: { "success": true, "name": "...", "college": "..." }
+    return resp.json()
+
+
+def _parse_response(data):
+    """(name, college, api_error) from the API's JSON answer."""
+    if not data.get("success"):
+        return None, None, data.get("message") or "Unable to verify registration from server."
+
+    name = data.get("name")
+    college = data.get("college")
+    if not name or not college:
+        return name, college, "Could not fetch complete details from server."
+    return name, college, None
+
+
+def fetch_participant(event, mobile):
+    """
+    Ask the college server about one participant.
+
+    Returns (name, college, api_error). Transport failures and an open circuit
+    give (None, None, None) so the participant can still continue, as before.
+    """
+    if not breaker.allow():
+        logger.info("Registration API circuit open, skipping lookup for %s", mobile)
+        metrics.registration_skipped.inc()
+        return None, None, None
+
+    start = time.perf_counter()
+    try:
+        data = _request_participant(event, mobile)
+    except Exception as e:
+        breaker.record_failure()
+        ops.registration_failed()
+        metrics.registration_call(time.perf_counter() - start, "error")
+        logger.warning("Registration API error for %s: %s", mobile, e)
+        return None, None, None
+
+    breaker.record_success()
+
+    name, college, api_error = _parse_response(data)
+    metrics.registration_call(time.perf_counter() - start, "ok" if api_error is None else "not_registered")
+    if api_error is None:
+        remember_participant(event, mobile, name, college)
+    return name, college, api_error
+
+
+def remember_participant(event, mobile, name, college):
+    """
+    Add a verified participant to the roster so the next login skips the API.
+    A single INSERT ... ON CONFLICT DO UPDATE: update_or_create reads and then
+    writes inside one transaction, and SQLite fails such a transaction with
+    "database is locked" at once (without waiting) when another writer got in
+    between. One statement takes the write lock up front and waits its turn.
+    """
+    Participant.objects.bulk_create(
+        [Participant(event=event, mobile=mobile, name=name, college=college)],
+        update_conflicts=True,
+        unique_fields=["event", "mobile"],
+        update_fields=["name", "college", "updated_at"],
+    )
+
+
+def verify_participant(quiz_name, mobile):
+    """
+    Returns (name, college, api_error) for a participant of the given quiz.
+    """
+    event = registration_event_name(quiz_name)
+
+    found = lookup_roster(event, mobile)
+    if found:
+        return found[0], found[1], None
+
+    # Only events the college server knows about are looked up remotely
+    if quiz_name not in REGISTRATION_EVENT_NAMES:
+        return None, None, None
+
+    miss_key = NEGATIVE_CACHE_KEY.format(event=slugify(event), mobile=mobile)
+    cached_error = cache.get(miss_key)
+    if cached_error is not None:
+        return None, None, cached_error
+
+    name, college, api_error = fetch_participant(event, mobile)
+    if api_error and not name:
+        cache.set(miss_key, api_error, getattr(settings, "QUIZ_REGISTRATION_NEGATIVE_TTL", 60))
+    return name, college, api_error
+
+
+_async_client = None
+
+
+def async_http_client():
+    """Process-wide httpx client for the registration API, or None without httpx."""
+    global _async_client
+    if httpx is None:
+        return None
+    if _async_client is None:
+        connect, read = getattr(settings, "QUIZ_REGISTRATION_TIMEOUT", (1.0, 2.0))
+        _async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read, connect=connect),
+            limits=httpx.Limits(max_connections=getattr(settings, "QUIZ_REGISTRATION_POOL_SIZE", 10)),
+        )
+    return _async_client
+
+
+async def afetch_participant(event, mobile):
+    """
+    Async fetch_participant. Without httpx the requests call runs in a worker
+    thread of its own, so it still doesn't block the event loop.
+    """
+    if not breaker.allow():
+        logger.info("Registration API circuit open, skipping lookup for %s", mobile)
+        metrics.registration_skipped.inc()
+        return None, None, None
+
+    client = async_http_client()
+    start = time.perf_counter()
+    try:
+        if client is None:
+            data = await sync_to_async(_request_participant, thread_sensitive=False)(event, mobile)
+        else:
+            resp = await client.post(
+                settings.QUIZ_REGISTRATION_API_URL,
+                json={"mobile_number": mobile, "event_name": event},
+            )
+            resp.raise_for_status()
+            data = resp.json()
+    except Exception as e:
+        breaker.record_failure()
+        ops.registration_failed()
+        metrics.registration_call(time.perf_counter() - start, "error")
+        logger.warning("Registration API error for %s: %s", mobile, e)
+        return None, None, None
+
+    breaker.record_success()
+
+    name, college, api_error = _parse_response(data)
+    metrics.registration_call(time.perf_counter() - start, "ok" if api_error is None else "not_registered")
+    if api_error is None:
+        await sync_to_async(remember_participant)(event, mobile, name, college)
+    return name, college, api_error
+
+
+async def averify_participant(quiz_name, mobile):
+    """Async verify_participant."""
+    event = registration_event_name(quiz_name)
+
+    found = await Participant.objects.filter(event=event, mobile=mobile).values_list("name", "college").afirst()
+    if found:
+        return found[0], found[1], None
+
+    if quiz_name not in REGISTRATION_EVENT_NAMES:
+        return None, None, None
+
+    miss_key = NEGATIVE_CACHE_KEY.format(event=slugify(event), mobile=mobile)
+    cached_error = await cache.aget(miss_key)
+    if cached_error is not None:
+        return None, None, cached_error
+
+    name, college, api_error = await afetch_participant(event, mobile)
+    if api_error and not name:
+        await cache.aset(miss_key, api_error, getattr(settings, "QUIZ_REGISTRATION_NEGATIVE_TTL", 60))
+    return name, college, api_error
@@ -0,0 +1,125 @@
+"""
+Re-grading after answer-key corrections.
+
+Answer.correct_option / is_correct and Submission.score are copies taken at
+submit time, so fixing Question.correct_option leaves them stale. regrade_quiz()
+brings a whole quiz back in line with a handful of set-based UPDATEs: one per
+answer letter for the answers, one correlated UPDATE for the scores. Each only
+touches the rows whose values actually change, so the report counts changes.
+Submissions with packed answers (quiz/packing.py) are re-graded in Python, a
+chunk at a time, in the same transaction.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.db.models import Case, Count, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+
+from .models import Question, Submission, Answer
+from .packing import regrade_packed
+from .routers import db_for_quiz
+
+
+# Sent with `quiz` after a re-grade commits, so cached results can be dropped
+quiz_regraded = Signal()
+
+
+@dataclass
+class RegradeReport:
+    quiz: object
+    answers_updated: int  # answers whose key or correctness changed
+    submissions_updated: int  # submissions whose score or packed key changed
+    before: dict  # score -> number of submissions
+    after: dict
+
+    @staticmethod
+    def _mean(distribution):
+        n = sum(distribution.values())
+        return sum(score * count for score, count in distribution.items()) / n if n else 0.0
+
+    @property
+    def mean_before(self):
+        return self._mean(self.before)
+
+    @property
+    def mean_after(self):
+        return self._mean(self.after)
+
+    def summary(self):
+        return (
+            f"{self.quiz.name}: {self.answers_updated} answer(s), "
+            f"{self.submissions_updated} submission(s) changed; "
+            f"mean score {self.mean_before:.2f} -> {self.mean_after:.2f}"
+        )
+
+    def distribution_lines(self):
+        lines = ["score  before  after"]
+        for score in sorted(set(self.before) | set(self.after)):
+            lines.append(f"{score:>5}  {self.before.get(score, 0):>6}  {self.after.get(score, 0):>5}")
+        return lines
+
+
+def score_distribution(quiz_id):
+    return dict(
+        Submission.objects.using(db_for_quiz(quiz_id))
+        .filter(quiz_id=quiz_id)
+        .values_list("score")
+        .annotate(n=Count("id"))
+        .order_by("score")
+    )
+
+
+def regrade_quiz(quiz):
+    """Recompute is_correct and score for every submission of `quiz`."""
+    key = {
+        qid: (correct or "").strip().upper()
+        for qid, correct in Question.objects.filter(quiz=quiz).values_list("id", "correct_option")
+    }
+    by_letter = defaultdict(list)
+    for qid, letter in key.items():
+        by_letter[letter].append(qid)
+
+    # The answer key lives on the primary; answers and scores may be on a shard
+    using = db_for_quiz(quiz.id)
+    before = score_distribution(quiz.id)
+    answers_updated = 0
+    with transaction.atomic(using=using):
+        for letter, question_ids in by_letter.items():
+            stale = (
+                ~Q(correct_option=letter)
+                | Q(is_correct=True) & ~Q(selected_option=letter)
+                | Q(is_correct=False, selected_option=letter)
+            )
+            answers_updated += Answer.objects.using(using).filter(stale, question_id__in=question_ids).update(
+                correct_option=letter,
+                is_correct=Case(When(selected_option=letter, then=Value(True)), default=Value(False)),
+            )
+
+        correct_counts = (
+            Answer.objects.filter(submission=OuterRef("pk"), is_correct=True)
+            .order_by()
+            .values("submission")
+            .annotate(n=Count("id"))
+            .values("n")
+        )
+        new_score = Coalesce(Subquery(correct_counts), 0)
+        submissions_updated = (
+            Submission.objects.using(using)
+            .filter(quiz=quiz, answer_question_ids="")
+            .exclude(score=new_score)
+            .update(score=new_score)
+        )
+        packed_answers, packed_submissions = regrade_packed(quiz, using, key)
+        answers_updated += packed_answers
+        submissions_updated += packed_submissions
+        transaction.on_commit(lambda: quiz_regraded.send(sender=RegradeReport, quiz=quiz), using=using)
+
+    return RegradeReport(
+        quiz=quiz,
+        answers_updated=answers_updated,
+        submissions_updated=submissions_updated,
+        before=before,
+        after=score_distribution(quiz.id),
+    )
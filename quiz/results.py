@@ -0,0 +1,133 @@
+"""
+Rendered result pages, stored once per submission.
+
+A submission never changes after it is written, so its result page is rendered
+once and the HTML kept in the shared cache (the QUIZ_CACHE_ALIAS backend, see
+quiz.tiered), with the participant's CSRF token left as a placeholder and
+spliced in per request (as for paper variants). Refreshes are answered from
+the cache, or with a 304 when the browser already has the page: the ETag and
+Last-Modified checks only look at the cache.
+
+A cached page is dropped when feedback is submitted for it (the form turns into
+a thank-you note); since all workers read the same entry, none of them serves
+the old form afterwards. Every page of a quiz is outdated at once by bumping
+the quiz's result version, which happens on a re-grade and when the quiz or
+its questions are edited.
+"""
+import hashlib
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .papers import splice_csrf
+from .routers import db_for_quiz
+from .tiered import shared_cache, tiered
+
+
+RESULT_KEY = "quiz:result:{using}:{submission_id}"
+RESULT_NAMESPACE = "results:{quiz_id}"
+RESULT_TIMEOUT = getattr(settings, "QUIZ_RESULT_CACHE_TIMEOUT", 7 * 24 * 60 * 60)
+
+
+@dataclass(frozen=True)
+class ResultSnapshot:
+    quiz_id: int
+    version: int
+    html: str
+    etag: str          # of the HTML, without the per-request CSRF token
+    rendered_at: float
+
+    @property
+    def last_modified(self):
+        return datetime.fromtimestamp(self.rendered_at, tz=timezone.utc)
+
+
+def result_version(quiz_id):
+    """Current result version of a quiz; shared between workers like bank_version()."""
+    return tiered.version(RESULT_NAMESPACE.format(quiz_id=quiz_id))
+
+
+def bump_result_version(quiz_id):
+    tiered.invalidate(RESULT_NAMESPACE.format(quiz_id=quiz_id))
+
+
+def _key(using, submission_id):
+    return RESULT_KEY.format(using=using, submission_id=submission_id)
+
+
+def cached_result(request, submission_id, quiz_id=None):
+    """The current snapshot of a result page, or None; looked up once per request."""
+    memo = getattr(request, "_quiz_results", None)
+    if memo is None:
+        memo = request._quiz_results = {}
+    if submission_id not in memo:
+        using = db_for_quiz(quiz_id) if quiz_id is not None else "default"
+        snapshot = shared_cache().get(_key(using, submission_id))
+        if snapshot is not None and snapshot.version != result_version(snapshot.quiz_id):
+            snapshot = None
+        memo[submission_id] = snapshot
+    return memo[submission_id]
+
+
+def store_result(submission, html):
+    """Keep the rendered result page of `submission`; returns its snapshot."""
+    snapshot = ResultSnapshot(
+        quiz_id=submission.quiz_id,
+        version=result_version(submission.quiz_id),
+        html=html,
+        etag=hashlib.md5(html.encode()).hexdigest(),
+        rendered_at=time.time(),
+    )
+    shared_cache().set(_key(submission._state.db, submission.id), snapshot, timeout=RESULT_TIMEOUT)
+    return snapshot
+
+
+def forget_result(using, submission_id):
+    shared_cache().delete(_key(using, submission_id))
+
+
+def _etag(request, snapshot):
+    # The page a browser holds carries the CSRF token of its cookie at the time;
+    # a new cookie must not revalidate it
+    cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME, "")
+    return hashlib.md5(f"{snapshot.etag}:{cookie}".encode()).hexdigest()
+
+
+def result_etag(request, submission_id, quiz_id=None):
+    snapshot = cached_result(request, submission_id, quiz_id)
+    return _etag(request, snapshot) if snapshot else None
+
+
+def result_last_modified(request, submission_id, quiz_id=None):
+    snapshot = cached_result(request, submission_id, quiz_id)
+    return snapshot.last_modified if snapshot else None
+
+
+def _validators(request, snapshot, response):
+    response["ETag"] = f'"{_etag(request, snapshot)}"'
+    response["Last-Modified"] = http_date(snapshot.rendered_at)
+    return response
+
+
+def not_modified(request, snapshot):
+    """
+    A 304 (or 412) when the browser's conditional headers match `snapshot`,
+    else None; what @condition(result_etag, result_last_modified) does, for
+    views that look the snapshot up themselves.
+    """
+    response = get_conditional_response(
+        request, etag=f'"{_etag(request, snapshot)}"', last_modified=int(snapshot.rendered_at)
+    )
+    return _validators(request, snapshot, response) if response is not None else None
+
+
+def result_response(request, snapshot):
+    response = _validators(request, snapshot, HttpResponse(splice_csrf(request, snapshot.html)))
+    # Per participant (CSRF token), and revalidated on every refresh
+    response["Cache-Control"] = "private, no-cache"
+    return response
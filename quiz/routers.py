@@ -0,0 +1,129 @@
+"""
+Read-replica routing.
+
+Admin changelists and CSV exports are read-heavy and used to read from the
+same SQLite file submit_quiz writes to. When a "replica" alias
+is configured (QUIZ_REPLICA_DB, kept in sync with `manage.py replicate_db`),
+reads of quiz models made inside `replica_reads()` go to it; everything else,
+and every write, stays on the primary. Sessions, auth and the participant
+flow never touch the replica.
+
+Read-your-writes: a participant who just submitted may reach a
+read_from_replica view before the replica has their row. submit_quiz sets a short-lived pin
+cookie (`pin_to_primary`) and ReplicaPinMiddleware turns replica reads off for
+requests carrying it.
+
+Per-event shards: QUIZ_SHARDS maps a quiz id to a database alias holding that
+quiz's Submission, Answer and Feedback rows (see quiz/shards.py). Code that
+touches those tables picks the alias explicitly with db_for_quiz().
+"""
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+
+REPLICA = "replica"
+PIN_COOKIE = "quiz_primary_pin"
+
+_replica_reads = ContextVar("quiz_replica_reads", default=False)
+_pinned = ContextVar("quiz_pinned_to_primary", default=False)
+
+
+def db_for_quiz(quiz_id):
+    """The alias holding a quiz's submissions, answers and feedback."""
+    try:
+        return getattr(settings, "QUIZ_SHARDS", {}).get(int(quiz_id), "default")
+    except (TypeError, ValueError):
+        return "default"
+
+
+def submission_dbs():
+    """Every alias that may hold submissions: the primary first, then the shards."""
+    return ["default", *sorted(set(getattr(settings, "QUIZ_SHARDS", {}).values()) - {"default"})]
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def reporting_db():
+    """The alias reporting reads should use right now."""
+    if replica_configured() and not _pinned.get():
+        return REPLICA
+    return "default"
+
+
+@contextmanager
+def replica_reads():
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def pinned_to_primary(pinned=True):
+    token = _pinned.set(pinned)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def read_from_replica(view):
+    """View decorator: quiz model reads inside the view go to the replica."""
+    if asyncio.iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            with replica_reads():
+                return await view(*args, **kwargs)
+    else:
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            with replica_reads():
+                return view(*args, **kwargs)
+    return wrapper
+
+
+def pin_to_primary(response):
+    """Keep this client's reads on the primary until the replica has caught up."""
+    response.set_cookie(
+        PIN_COOKIE,
+        "1",
+        max_age=getattr(settings, "QUIZ_REPLICA_PIN_SECONDS", 30),
+        httponly=True,
+        samesite="Lax",
+    )
+    return response
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # Related objects come from wherever the instance itself was read
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if model._meta.app_label == "quiz" and _replica_reads.get():
+            return reporting_db()
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Saving an instance read from a shard writes it back there
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db not in (None, REPLICA):
+            return instance._state.db
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a file copy of the primary, schema included
+        if db == REPLICA:
+            return False
+        return None
@@ -0,0 +1,20 @@
+"""
+Database sessions that report their size to quiz.metrics.
+
+Selected with SESSION_ENGINE = "quiz.sessions"; otherwise the same as
+django.contrib.sessions.backends.db.
+"""
+from django.contrib.sessions.backends.db import SessionStore as DBSessionStore
+
+from . import metrics
+
+
+class SessionStore(DBSessionStore):
+    def decode(self, session_data):
+        metrics.session_loaded(len(session_data))
+        return super().decode(session_data)
+
+    def encode(self, session_dict):
+        session_data = super().encode(session_dict)
+        metrics.session_saved(len(session_data))
+        return session_data
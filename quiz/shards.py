@@ -0,0 +1,90 @@
+"""
+Per-event database shards.
+
+With QUIZ_SHARDS set, each listed quiz keeps its Submission, Answer and
+Feedback rows in its own database, so two events running at once write to
+different SQLite files instead of queueing on one writer lock. A shard holds
+the full schema; the quiz's own Quiz and Question rows are mirrored into it
+(they are what the foreign keys point at) whenever they change on the primary,
+and `manage.py sync_shards` re-mirrors everything.
+
+Reports that span quizzes fan out over submission_dbs() and merge the
+per-database results, see fan_out().
+"""
+import heapq
+import logging
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+from .models import Quiz, Question, Submission
+from .routers import db_for_quiz, submission_dbs
+
+
+logger = logging.getLogger(__name__)
+
+QUIZ_FIELDS = [f.attname for f in Quiz._meta.concrete_fields if not f.primary_key]
+QUESTION_FIELDS = [f.attname for f in Question._meta.concrete_fields if not f.primary_key]
+
+
+def sharded_quiz_ids():
+    return sorted(getattr(settings, "QUIZ_SHARDS", {}))
+
+
+def mirror_quiz(quiz_id):
+    """Copy a quiz and its questions from the primary into its shard."""
+    alias = db_for_quiz(quiz_id)
+    if alias == "default":
+        return 0
+
+    quiz = Quiz.objects.using("default").filter(id=quiz_id).first()
+    if quiz is None:
+        # Deleted on the primary: drop it (and, by cascade, its rows) there too
+        Quiz.objects.using(alias).filter(id=quiz_id).delete()
+        return 0
+
+    questions = list(Question.objects.using("default").filter(quiz_id=quiz_id))
+    with transaction.atomic(using=alias):
+        Quiz.objects.using(alias).bulk_create(
+            [quiz], update_conflicts=True, unique_fields=["id"], update_fields=QUIZ_FIELDS
+        )
+        Question.objects.using(alias).bulk_create(
+            questions, update_conflicts=True, unique_fields=["id"], update_fields=QUESTION_FIELDS
+        )
+        Question.objects.using(alias).filter(quiz_id=quiz_id).exclude(
+            id__in=[q.id for q in questions]
+        ).delete()
+    return len(questions)
+
+
+def schedule_mirror(quiz_id):
+    """Mirror a sharded quiz once the current primary transaction commits."""
+    if db_for_quiz(quiz_id) == "default":
+        return
+
+    def mirror():
+        try:
+            mirror_quiz(quiz_id)
+        except DatabaseError:
+            # e.g. the shard hasn't been created yet; never fail the admin edit
+            logger.exception("Could not mirror quiz %s into its shard; run `manage.py sync_shards`", quiz_id)
+
+    transaction.on_commit(mirror)
+
+
+def stranded_submissions(quiz_id):
+    """Submissions of a sharded quiz still on the primary (written before sharding)."""
+    if db_for_quiz(quiz_id) == "default":
+        return 0
+    return Submission.objects.using("default").filter(quiz_id=quiz_id).count()
+
+
+def fan_out(queryset_for, key, reverse=False):
+    """
+    Merge one ordered queryset per database into a single ordered stream.
+
+    `queryset_for(alias)` returns that database's queryset, already ordered by
+    `key`; rows are merged lazily, so exports stay streaming.
+    """
+    streams = [queryset_for(alias) for alias in submission_dbs()]
+    return heapq.merge(*streams, key=key, reverse=reverse)
@@ -0,0 +1,61 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .analysis import rebuild_quiz_stats
+from .attempts import attempts
+from .bank import bump_bank_version
+from .catalog import invalidate_catalog
+from .images import process_after_commit
+from .leaderboard import invalidate as invalidate_leaderboard
+from .models import Quiz, Question, PaperVariant, Submission, Feedback
+from .regrade import quiz_regraded
+from .results import bump_result_version, forget_result
+from .shards import schedule_mirror
+
+
+@receiver([post_save, post_delete], sender=Quiz)
+def quiz_changed(sender, instance, using, **kwargs):
+    if using != "default":
+        return
+    bump_bank_version(instance.id)
+    bump_result_version(instance.id)
+    invalidate_catalog()
+    schedule_mirror(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Question)
+@receiver([post_save, post_delete], sender=PaperVariant)
+def question_changed(sender, instance, using, **kwargs):
+    if using != "default":
+        return
+    bump_bank_version(instance.quiz_id)
+    if sender is Question:
+        bump_result_version(instance.quiz_id)
+        schedule_mirror(instance.quiz_id)
+
+
+@receiver(post_save, sender=Question)
+def question_image_saved(sender, instance, using, raw=False, **kwargs):
+    if using == "default" and not raw:
+        process_after_commit(instance)
+
+
+@receiver(post_delete, sender=Submission)
+def submission_deleted(sender, instance, using, **kwargs):
+    # Deleting a submission (e.g. to allow a retry) must unblock that phone
+    attempts.forget(instance.quiz_id, instance.phone)
+    forget_result(using, instance.id)
+    invalidate_leaderboard(instance.quiz_id)
+
+
+@receiver(quiz_regraded)
+def rerank_after_regrade(sender, quiz, **kwargs):
+    invalidate_leaderboard(quiz.id)
+    bump_result_version(quiz.id)
+    rebuild_quiz_stats(quiz)
+
+
+@receiver([post_save, post_delete], sender=Feedback)
+def feedback_changed(sender, instance, using, **kwargs):
+    # The cached result page still shows the feedback form
+    forget_result(using, instance.submission_id)
@@ -0,0 +1,114 @@
+"""
+On-disk copy of the submissions waiting in the ingestion queue.
+
+The write-behind queue (quiz/ingest.py) lives in memory, so a worker that
+crashes or is killed between showing the receipt and committing the batch
+would lose those submissions. Each queued submission is therefore also saved
+as a small JSON file in QUIZ_INGEST["SPOOL_DIR"] and removed once its batch
+commits.
+
+Files are named after the process that owns them. A worker that starts
+writing claims the files of processes that are gone (by renaming them, so
+only one claimant wins) and queues them again. A submission that still can't
+be written after the writer's retries is moved aside as "failed-*.json"; the
+next worker to start tries it again, and nothing is lost meanwhile.
+
+The directory must be shared by the workers of one host only; process ids of
+another host or container mean nothing here.
+"""
+import json
+import logging
+import os
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+FAILED_PREFIX = "failed-"
+# Tells this process's files apart from those of an earlier process with the same pid
+_BOOT = uuid.uuid4().hex[:8]
+
+
+def spool_dir():
+    """The spool directory, or None when spooling is off."""
+    path = getattr(settings, "QUIZ_INGEST", {}).get("SPOOL_DIR")
+    return Path(path) if path else None
+
+
+def _own_name():
+    return f"{os.getpid()}-{_BOOT}-{uuid.uuid4().hex}.json"
+
+
+def save(data):
+    """Write `data` (a JSON-able dict) to a new spool file; returns its path, or None without a spool."""
+    directory = spool_dir()
+    if directory is None:
+        return None
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / _own_name()
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data))
+    os.replace(tmp, path)
+    return path
+
+
+def discard(path):
+    if path is not None:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def set_aside(path):
+    """Keep the file of a submission that could not be written for a later retry."""
+    if path is not None:
+        try:
+            os.replace(path, path.with_name(FAILED_PREFIX + path.name.split("-")[-1]))
+        except FileNotFoundError:
+            pass
+
+
+def _orphaned(name):
+    if name.startswith(FAILED_PREFIX):
+        return True
+    pid, boot, _ = name.split("-", 2)
+    if int(pid) == os.getpid():
+        return boot != _BOOT
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass  # alive, but someone else's
+    return False
+
+
+def claim_orphans():
+    """
+    Take over the files of processes that are gone (and the failed ones).
+    Returns [(path, data)]; the files now belong to this process.
+    """
+    directory = spool_dir()
+    if directory is None or not directory.is_dir():
+        return []
+    claimed = []
+    for path in sorted(directory.glob("*.json")):
+        try:
+            if not _orphaned(path.name):
+                continue
+        except ValueError:
+            continue  # not one of ours
+        mine = directory / _own_name()
+        try:
+            os.rename(path, mine)
+        except FileNotFoundError:
+            continue  # claimed by another worker first
+        try:
+            claimed.append((mine, json.loads(mine.read_text())))
+        except (OSError, ValueError):
+            logger.exception("Unreadable spooled submission %s", mine)
+    return claimed
@@ -1,3 +1,1245 @@
-from django.test import TestCase
+import gzip
+import importlib
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import closing
+from io import BytesIO, StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import requests
+from asgiref.sync import async_to_sync, sync_to_async
+from PIL import Image
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core import signing
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, connections
+from django.http import Http404
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import async_views, ops, papers, spool
+from .admin import QuizAdmin, SubmissionAdmin
+from .admission import read_ticket, take_slot
+from .analysis import COUNTERS, rebuild_quiz_stats
+from .assets import IMMUTABLE, PrecompressedManifestStaticFilesStorage, build_icons, serve_static
+from .attempts import AttemptRegistry, attempts
+from .bank import QuestionBankCache, get_question_bank
+from .catalog import catalog, catalog_fragment, catalog_quiz
+from .exports import stream_csv
+from .images import process_question_image, variant_widths
+from .images import worker as image_worker
+from .ingest import GradedSubmission, SubmissionWriter, make_receipt, read_receipt, submission_failed, write_batch
+from .loadtest import Recorder, SQLiteLockMonitor, percentile, start_stub_registration_api
+from .leaderboard import Leaderboard, SortedKeys
+from .metrics import ARCHIVE_FILE, Registry
+from .models import Answer, Feedback, Participant, Question, QuestionStats, Quiz, Submission
+from .packing import is_packed, pack, pack_submissions, unpack
+from .papers import (
+    CSRF_PLACEHOLDER,
+    PAPER_SALT,
+    PHONE_PLACEHOLDER,
+    assign_variant,
+    build_paper_variants,
+    new_seeded_paper,
+    paper_questions,
+    read_paper_token,
+    render_variant_page,
+    splice_participant,
+)
+from .management.commands.replicate_db import copy_database, enable_wal
+from .registration import CircuitBreaker, remember_participant, verify_participant
+from .regrade import regrade_quiz
+from .shards import fan_out, mirror_quiz, stranded_submissions
+from .routers import ReplicaRouter, pinned_to_primary, replica_reads, reporting_db
+from .tiered import TieredCache, shared_cache, tiered
+from .views import grade_submission
+
+
+LOCMEM = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+
+
+@override_settings(
+    CACHES={"default": {**LOCMEM, "LOCATION": "tests-default"}, "quiz": {**LOCMEM, "LOCATION": "tests-quiz"}},
+    QUIZ_INGEST={"WRITE_BEHIND": False, "SPOOL_DIR": None},
+)
+class QuizTestCase(TestCase):
+    def setUp(self):
+        # Quiz ids are reused between tests; so would be their clocks, markers and versions
+        for alias in ("default", "quiz"):
+            caches[alias].clear()
+        tiered.clear()
+        self.quiz = Quiz.objects.create(name="Test Quiz", num_questions=3)
+        self.questions = [
+            Question.objects.create(
+                quiz=self.quiz,
+                text_html=f"<p>Question {i}</p>",
+                option_a="a",
+                option_b="b",
+                option_c="c",
+                option_d="d",
+                correct_option="ABCD"[i],
+            )
+            for i in range(4)
+        ]
+
+    def graded(self, phone, selections):
+        """A GradedSubmission answering self.questions with `selections` (a letter or None each)."""
+        answers = [
+            (q.id, selected, q.correct_option, selected == q.correct_option)
+            for q, selected in zip(self.questions, selections)
+        ]
+        return GradedSubmission(
+            quiz_id=self.quiz.id,
+            phone=phone,
+            event=str(self.quiz.id),
+            score=sum(is_correct for _, _, _, is_correct in answers),
+            total_questions=len(answers),
+            time_taken_seconds=60,
+            answers=answers,
+        )
+
+
+class TieredTests(QuizTestCase):
+    def worker(self, **kwargs):
+        """A TieredCache as another process would have it: own L1, shared L2."""
+        return TieredCache(**{"alias": "quiz", "max_size": 2, "ttl": 60, "sync_interval": 60, **kwargs})
+
+    def test_get_or_set_loads_once(self):
+        cache, load = self.worker(), mock.Mock(return_value="value")
+        self.assertEqual(cache.get_or_set("catalog", "quizzes", load), "value")
+        self.assertEqual(cache.get_or_set("catalog", "quizzes", load), "value")
+        # Another process finds it in L2
+        self.assertEqual(self.worker().get_or_set("catalog", "quizzes", load), "value")
+        load.assert_called_once()
+
+    def test_invalidate_reaches_other_processes(self):
+        admin, other = self.worker(), self.worker(sync_interval=0)
+        lagging = self.worker(ttl=3600)
+        for cache in (admin, other, lagging):
+            self.assertEqual(cache.get_or_set("quiz:1", "bank", lambda: "old"), "old")
+
+        admin.invalidate("quiz:1")
+        self.assertIsNone(admin.get("quiz:1", "bank"))
+        self.assertIsNone(other.get("quiz:1", "bank"))
+        # Versions are re-read every sync_interval; until then the L1 copy is served
+        self.assertEqual(lagging.get("quiz:1", "bank"), "old")
+        with mock.patch("quiz.tiered.time.monotonic", return_value=time.monotonic() + 61):
+            self.assertIsNone(lagging.get("quiz:1", "bank"))
+        # Other namespaces keep their entries
+        self.assertIsNotNone(other.version("quiz:2"))
+
+    def test_l1_is_bounded(self):
+        cache = self.worker()
+        for key in ("a", "b", "c"):
+            cache.set("catalog", key, key)
+        self.assertEqual(len(cache._entries), 2)
+        caches["quiz"].clear()  # L2 gone: only the two most recent keys are left, in L1
+        self.assertEqual([cache.get("catalog", key) for key in ("a", "b", "c")], [None, "b", "c"])
+
+    def test_shared_cache_is_the_l2(self):
+        self.assertIs(shared_cache(), caches["quiz"])
+        self.assertEqual(tiered.alias, "quiz")
+
+
+class IngestTests(QuizTestCase):
+    def test_duplicates_fold_into_one_submission(self):
+        first = self.graded("9000000001", ["A", "B", None, None])
+        repeat = self.graded("9000000001", ["D", "D", "D", "D"])
+        with self.captureOnCommitCallbacks(execute=True):
+            committed = write_batch([first, repeat, self.graded("9000000002", ["A", None, None, None])])
+
+        self.assertEqual(len(committed), 2)
+        submission = Submission.objects.get(quiz=self.quiz, phone="9000000001")
+        self.assertEqual(committed[first.key], submission.id)
+        self.assertEqual(submission.score, 2)
+        self.assertEqual(submission.answers.count(), 4)
+        self.assertTrue(attempts.has_attempted(self.quiz.id, "9000000001"))
+
+        # A later batch folds into the stored row as well
+        self.assertEqual(write_batch([repeat])[repeat.key], submission.id)
+        self.assertEqual(Submission.objects.filter(quiz=self.quiz, phone="9000000001").count(), 1)
+
+    def test_receipt_is_opaque(self):
+        receipt = make_receipt(self.quiz.id, "9000000001")
+        self.assertNotIn("9000000001", receipt)
+        self.assertEqual(make_receipt(self.quiz.id, "9000000001"), receipt)
+        self.assertEqual(read_receipt(receipt), (self.quiz.id, "9000000001"))
+        self.assertIsNone(read_receipt("0" * len(receipt)))
+
+
+class SpoolTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        override = override_settings(QUIZ_INGEST={"WRITE_BEHIND": True, "SPOOL_DIR": str(self.dir)})
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def dead_pid(self):
+        process = subprocess.Popen([sys.executable, "-c", "pass"])
+        process.wait()
+        return process.pid
+
+    def test_claims_files_of_dead_processes_only(self):
+        ours = spool.save({"phone": "1"})
+        (self.dir / f"{self.dead_pid()}-0000abcd-{'0' * 32}.json").write_text(json.dumps({"phone": "2"}))
+        (self.dir / f"failed-{'1' * 32}.json").write_text(json.dumps({"phone": "3"}))
+        (self.dir / f"{os.getppid()}-0000abcd-{'2' * 32}.json").write_text(json.dumps({"phone": "4"}))
+
+        claimed = spool.claim_orphans()
+        self.assertEqual(sorted(data["phone"] for _, data in claimed), ["2", "3"])
+        self.assertTrue(ours.exists())
+        for path, _ in claimed:
+            self.assertTrue(path.name.startswith(f"{os.getpid()}-"))
+        self.assertEqual(spool.claim_orphans(), [])  # now this process's own
+
+    def test_failed_submission_is_kept_and_reported(self):
+        item = self.graded("9000000001", ["A", None, None, None])
+        writer = SubmissionWriter(batch_size=10, flush_interval=0)
+        with mock.patch("quiz.ingest.write_batch", side_effect=RuntimeError("disk on fire")), \
+                self.assertLogs("quiz.ingest", "ERROR"):
+            writer.submit(item)
+            self.assertEqual(writer.status(item.key), "pending")
+            for _ in range(100):
+                if writer.status(item.key) is None:
+                    break
+                time.sleep(0.02)
+
+        self.assertIsNone(writer.status(item.key))
+        self.assertTrue(submission_failed(item.quiz_id, item.phone))
+        self.assertEqual([path.name[:7] for path in self.dir.glob("*.json")], ["failed-"])
+        self.assertFalse(attempts.has_attempted(item.quiz_id, item.phone))
+
+
+class CatalogTests(QuizTestCase):
+    def test_loaded_once(self):
+        self.assertEqual([q.name for q in catalog()], ["Test Quiz"])
+        with self.assertNumQueries(0):
+            self.assertEqual(catalog_quiz(str(self.quiz.id)).name, "Test Quiz")
+            self.assertEqual(catalog_fragment(), catalog_fragment())
+
+    def test_junk_ids(self):
+        for quiz_id in (None, "", "abc", "9999"):
+            with self.subTest(quiz_id=quiz_id):
+                self.assertIsNone(catalog_quiz(quiz_id))
+
+    def test_quiz_edit_invalidates(self):
+        self.assertIn("Test Quiz", catalog_fragment())
+        self.quiz.name = "Renamed Quiz"
+        self.quiz.is_active = False
+        self.quiz.save()
+        self.assertFalse(catalog_quiz(self.quiz.id).is_active)
+        self.assertIn("Renamed Quiz", catalog_fragment())
+
+        other = Quiz.objects.create(name="Second Quiz")
+        self.assertEqual([q.id for q in catalog()], [self.quiz.id, other.id])
+        other.delete()
+        self.assertIsNone(catalog_quiz(other.id))
+
+    def test_landing_page_errors_cost_no_queries(self):
+        self.client.get("/")  # warms the catalog
+        with self.assertNumQueries(0):
+            response = self.client.post("/", {"event": self.quiz.id, "phone": "12345"})
+        self.assertContains(response, "valid 10-digit")
+        self.assertContains(response, f'data-event-id="quiz-{self.quiz.id}"')
+        with self.assertNumQueries(0):
+            response = self.client.post("/", {"event": "9999", "phone": "9000000001"})
+        self.assertContains(response, "Invalid event selected.")
+
+
+class QuestionBankTests(QuizTestCase):
+    def test_bank_is_read_once_per_version(self):
+        bank = get_question_bank(self.quiz.id)
+        self.assertEqual([q.id for q in bank.questions], [q.id for q in self.questions])
+        self.assertEqual(bank.by_id[self.questions[1].id].correct_option, "B")
+        with self.assertNumQueries(0):
+            self.assertIs(get_question_bank(self.quiz.id), bank)
+
+    def test_edit_bumps_the_version(self):
+        bank = get_question_bank(self.quiz.id)
+        self.questions[0].option_a = "changed"
+        self.questions[0].save()
+        fresh = get_question_bank(self.quiz.id)
+        self.assertNotEqual(fresh.version, bank.version)
+        self.assertEqual(fresh.by_id[self.questions[0].id].option_text("A"), "changed")
+
+    def test_cache_is_bounded(self):
+        cache = QuestionBankCache(max_size=1)
+        other = Quiz.objects.create(name="Other", num_questions=1)
+        cache.get(self.quiz.id)
+        cache.get(other.id)
+        with self.assertNumQueries(2):  # questions and variants, read again
+            cache.get(self.quiz.id)
+
+
+class PaperVariantTests(QuizTestCase):
+    def build(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            build_paper_variants(self.quiz, count, rng=random.Random(7))
+        return get_question_bank(self.quiz.id)
+
+    def test_build_replaces_variants(self):
+        self.build(3)
+        bank = self.build(2)
+        self.assertEqual([v.index for v in bank.variants], [0, 1])
+        for variant in bank.variants:
+            self.assertEqual(len(variant.question_ids), 3)
+            self.assertEqual(len(set(variant.question_ids)), 3)
+            self.assertTrue(all(sorted(order) == list("ABCD") for order in variant.option_orders))
+
+    def test_assignment_is_stable_per_phone(self):
+        bank = self.build(4)
+        self.assertIsNone(assign_variant(get_question_bank(Quiz.objects.create(name="Plain").id), "9000000001"))
+        self.assertEqual(assign_variant(bank, "9000000001"), assign_variant(bank, "9000000001"))
+
+    def test_page_is_rendered_once_and_spliced(self):
+        bank = self.build(1)
+        variant = bank.variants[0]
+        with mock.patch("quiz.papers.render_to_string", wraps=papers.render_to_string) as render:
+            html = render_variant_page(self.quiz, bank, variant)
+            self.assertIs(render_variant_page(self.quiz, bank, variant), html)
+        self.assertEqual(render.call_count, 1)
+
+        request = RequestFactory().get("/")
+        page = splice_participant(request, html, "9000000001")
+        self.assertNotIn(PHONE_PLACEHOLDER, page)
+        self.assertNotIn(CSRF_PLACEHOLDER, page)
+        self.assertIn('name="phone" value="9000000001"', page)
+
+
+class RegistrationTests(QuizTestCase):
+    def test_roster_upsert(self):
+        remember_participant("CodeWarz", "9000000001", "Asha", "GEC")
+        remember_participant("CodeWarz", "9000000001", "Asha K", "GEC Thrissur")
+        remember_participant("Build with AI", "9000000001", "Asha", "GEC")
+        self.assertEqual(Participant.objects.count(), 2)
+        participant = Participant.objects.get(event="CodeWarz", mobile="9000000001")
+        self.assertEqual((participant.name, participant.college), ("Asha K", "GEC Thrissur"))
+
+    def test_verified_participant_is_remembered(self):
+        answer = {"success": True, "name": "Asha", "college": "GEC"}
+        with mock.patch("quiz.registration._request_participant", return_value=answer) as request:
+            self.assertEqual(verify_participant("CodeWarz", "9000000001"), ("Asha", "GEC", None))
+            with self.assertNumQueries(1):
+                self.assertEqual(verify_participant("CodeWarz", "9000000001"), ("Asha", "GEC", None))
+        self.assertEqual(request.call_count, 1)
+
+    def test_circuit_breaker_opens_and_half_opens(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        with self.assertLogs("quiz.registration", "WARNING"):
+            breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        with mock.patch("quiz.registration.time.monotonic", return_value=time.monotonic() + 31):
+            self.assertTrue(breaker.allow())
+            self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertTrue(breaker.allow())
+
+
+class AttemptTests(QuizTestCase):
+    def test_recorded_attempt_is_seen_by_other_workers(self):
+        attempts.record(self.quiz.id, "9000000001")
+        other = AttemptRegistry()
+        self.assertTrue(other.has_attempted(self.quiz.id, "9000000001"))
+        self.assertFalse(other.has_attempted(self.quiz.id, "9000000002"))
+
+    def test_forget_unblocks_every_worker(self):
+        submission = Submission.objects.create(quiz=self.quiz, phone="9000000001", score=0, total_questions=3)
+        other = AttemptRegistry()
+        self.assertTrue(attempts.has_attempted(self.quiz.id, "9000000001"))
+        self.assertTrue(other.has_attempted(self.quiz.id, "9000000001"))
+
+        submission.delete()
+        attempts.forget(self.quiz.id, "9000000001")
+        self.assertFalse(attempts.has_attempted(self.quiz.id, "9000000001"))
+        self.assertFalse(other.has_attempted(self.quiz.id, "9000000001"))
+
+
+class AdmissionTests(QuizTestCase):
+    def quiz_with_rate(self, rate):
+        return SimpleNamespace(id=self.quiz.id, name=self.quiz.name, start_rate_per_minute=rate)
+
+    def test_burst_then_queue(self):
+        quiz = self.quiz_with_rate(60)  # one start a second, 10 s of burst
+        now = 1_000_000.0
+        tickets = [take_slot(quiz, str(i), now=now) for i in range(14)]
+
+        self.assertEqual(tickets[:11], [None] * 11)
+        self.assertEqual([t.slot_ms for t in tickets[11:]], [1_000_001_000, 1_000_002_000, 1_000_003_000])
+        self.assertEqual(tickets[-1].position(now), 3)
+        self.assertFalse(tickets[-1].ready(now))
+        self.assertTrue(tickets[-1].ready(now + 3))
+
+    def test_idle_clock_restarts(self):
+        quiz = self.quiz_with_rate(60)
+        for i in range(14):
+            take_slot(quiz, str(i), now=1_000_000.0)
+        later = [take_slot(quiz, str(i), now=1_000_100.0) for i in range(12)]
+        self.assertEqual(later[:11], [None] * 11)
+        self.assertEqual(later[11].slot_ms, 1_000_101_000)
+
+    def test_ticket_round_trip(self):
+        quiz = self.quiz_with_rate(1)  # a start a minute: the second arrival waits
+        self.assertIsNone(take_slot(quiz, "9000000001", now=1_000_000.0))
+        ticket = take_slot(quiz, "9000000002", now=1_000_000.0)
+        self.assertEqual(ticket.wait_seconds(1_000_000.0), 50)
+        self.assertEqual(read_ticket(ticket.sign()), ticket)
+        self.assertIsNone(read_ticket(ticket.sign()[:-2] + "xx"))
+
+    def test_no_rate(self):
+        self.assertIsNone(take_slot(self.quiz_with_rate(None), "9000000001"))
+
+    def test_waiting_status_reads_the_ticket_alone(self):
+        quiz = self.quiz_with_rate(1)
+        take_slot(quiz, "9000000001")
+        token = take_slot(quiz, "9000000002").sign()
+        with self.assertNumQueries(0):
+            status = self.client.get(f"/waiting/{token}/status/").json()
+        self.assertFalse(status["ready"])
+        self.assertEqual(status["position"], 1)
+        self.assertEqual(self.client.get(f"/waiting/{token[:-2]}xx/status/").status_code, 404)
+
+
+class UniqueAttemptMigrationTests(QuizTestCase):
+    migration = importlib.import_module("quiz.migrations.0012_submission_unique_quiz_phone")
+
+    def run_migration(self, model):
+        apps = mock.Mock(get_model=mock.Mock(return_value=model))
+        self.migration.dedupe_submissions(apps, mock.Mock(connection=connection))
+
+    def test_blank_phones_get_placeholders(self):
+        submission = Submission.objects.create(quiz=self.quiz, phone="", score=0, total_questions=3)
+        self.run_migration(Submission)
+        submission.refresh_from_db()
+        self.assertEqual(submission.phone, f"unknown-{submission.id}")
+
+    def test_repeated_attempts_are_reported(self):
+        # The constraint is in place already, so the repeats can only be faked
+        when = timezone.now()
+        model = mock.MagicMock()
+        submissions = model.objects.using.return_value
+        submissions.filter.return_value.only.return_value = []
+        submissions.order_by.return_value.values_list.return_value = [
+            (1, self.quiz.id, "9000000001", 2, when),
+            (2, self.quiz.id, "9000000002", 1, when),
+            (3, self.quiz.id, "9000000001", 3, when),
+        ]
+        with self.assertRaisesMessage(CommandError, "1 phone(s) attempted a quiz more than once") as raised:
+            self.run_migration(model)
+        self.assertIn(f"quiz {self.quiz.id}, phone 9000000001: #1 (score 2", str(raised.exception))
+        self.assertNotIn("9000000002", str(raised.exception))
+
+
+class RegradeTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        write_batch([
+            self.graded("9000000001", ["B", "B", None, None]),
+            self.graded("9000000002", ["C", "B", None, None]),
+        ])
+
+    def change_key(self):
+        question = self.questions[0]
+        question.correct_option = "B"
+        question.save()
+
+    def test_regrade_answer_rows(self):
+        self.change_key()
+        report = regrade_quiz(self.quiz)
+        # Both answers to question 0 get the new key; only the first submission's score moves
+        self.assertEqual((report.answers_updated, report.submissions_updated), (2, 1))
+        self.assertEqual((report.before, report.after), ({1: 2}, {1: 1, 2: 1}))
+
+        submission = Submission.objects.get(quiz=self.quiz, phone="9000000001")
+        self.assertEqual(submission.score, 2)
+        answer = Answer.objects.get(submission=submission, question=self.questions[0])
+        self.assertEqual(answer.correct_option, "B")
+        self.assertTrue(answer.is_correct)
+
+        report = regrade_quiz(self.quiz)
+        self.assertEqual((report.answers_updated, report.submissions_updated), (0, 0))
+
+    @override_settings(QUIZ_ANSWER_STORAGE="packed")
+    def test_regrade_packed(self):
+        Submission.objects.all().delete()
+        write_batch([
+            self.graded("9000000001", ["B", "B", None, None]),
+            self.graded("9000000002", ["C", "B", None, None]),
+        ])
+        submission = Submission.objects.get(quiz=self.quiz, phone="9000000001")
+        self.assertTrue(is_packed(submission))
+        self.assertEqual(submission.score, 1)
+        self.change_key()
+        report = regrade_quiz(self.quiz)
+        self.assertEqual((report.answers_updated, report.submissions_updated), (2, 2))
+
+        submission.refresh_from_db()
+        self.assertEqual(submission.score, 2)
+        self.assertEqual(unpack(submission)[0], (self.questions[0].id, "B", "B", True))
+
+        report = regrade_quiz(self.quiz)
+        self.assertEqual((report.answers_updated, report.submissions_updated), (0, 0))
+
+
+class PackingTests(QuizTestCase):
+    def test_round_trip(self):
+        answers = self.graded("9000000001", ["A", "C", None, "D"]).answers
+        submission = Submission(**pack(answers))
+        self.assertTrue(is_packed(submission))
+        self.assertEqual(unpack(submission), answers)
+
+    def test_no_answers(self):
+        submission = Submission(**pack([]))
+        self.assertFalse(is_packed(submission))
+        self.assertEqual(unpack(submission), [])
+
+    def test_bad_selections_are_refused(self):
+        for selected in ["AB", "E", "a", "", "-"]:
+            with self.subTest(selected=selected), self.assertRaises(ValueError):
+                pack([(1, selected, "A", False)])
+        with self.assertRaises(ValueError):
+            pack([(1, "A", "AB", False)])
+
+    def test_bad_legacy_row_is_skipped_and_reported(self):
+        committed = write_batch([self.graded(f"900000000{i}", ["A", "B", None, None]) for i in range(3)])
+        good, bad, other = sorted(committed.values())
+        Answer.objects.filter(submission_id=bad, question=self.questions[0]).update(selected_option="AB")
+
+        stdout, stderr = StringIO(), StringIO()
+        call_command("pack_answers", self.quiz.id, stdout=stdout, stderr=stderr)
+        self.assertIn("2 submission(s) packed", stdout.getvalue())
+        self.assertIn(f"submission {bad} left unpacked", stderr.getvalue())
+        self.assertTrue(is_packed(Submission.objects.get(id=good)))
+        self.assertTrue(is_packed(Submission.objects.get(id=other)))
+        self.assertFalse(is_packed(Submission.objects.get(id=bad)))
+        self.assertEqual(Answer.objects.filter(submission_id=bad).count(), 4)
+        self.assertFalse(Answer.objects.filter(submission_id__in=[good, other]).exists())
+
+
+class LeaderboardTests(QuizTestCase):
+    def submit(self, phone, selections, time_taken=60):
+        graded = self.graded(phone, selections)
+        graded.time_taken_seconds = time_taken
+        with self.captureOnCommitCallbacks(execute=True):
+            write_batch([graded])
+
+    def test_sorted_keys_match_sorted(self):
+        rng = random.Random(3)
+        keys, expected = SortedKeys(), []
+        with mock.patch("quiz.leaderboard.BUCKET_SIZE", 2):
+            for _ in range(300):
+                if expected and rng.random() < 0.3:
+                    key = expected.pop(rng.randrange(len(expected)))
+                    keys.remove(key)
+                else:
+                    key = (rng.randrange(-5, 0), rng.randrange(10), rng.randrange(10**6))
+                    keys.add(key)
+                    expected.append(key)
+                expected.sort()
+                self.assertEqual(list(keys), expected)
+                self.assertEqual(len(keys), len(expected))
+                probe = (rng.randrange(-5, 0), rng.randrange(10))
+                self.assertEqual(keys.index(probe), sum(1 for k in expected if k < probe))
+
+    def test_ties_share_a_rank(self):
+        self.submit("9000000001", ["A", "B", None, None], time_taken=50)
+        self.submit("9000000002", ["A", "B", None, None], time_taken=50)
+        self.submit("9000000003", ["A", "B", "C", None], time_taken=90)
+        self.submit("9000000004", ["A", None, None, None], time_taken=10)
+        board = Leaderboard(self.quiz.id)
+        board.catch_up(force=True)
+        self.assertEqual([(s.rank, s.score) for s in board.top(10)], [(1, 3), (2, 2), (2, 2), (4, 1)])
+        self.assertEqual(board.standing("9000000002").rank, 2)
+        self.assertIsNone(board.standing("9000000009"))
+
+    def test_only_own_phone_can_be_looked_up(self):
+        self.submit("9000000001", ["A", None, None, None])
+        url = f"/api/quiz/{self.quiz.id}/leaderboard/"
+        response = self.client.get(url)
+        self.assertEqual(response.json()["top"][0]["phone"], "90XXXXXX01")
+        self.assertEqual(self.client.get(url, {"phone": "9000000001"}).status_code, 403)
+
+        session = self.client.session
+        session["leaderboard_phone"] = "9000000001"
+        session.save()
+        self.assertEqual(self.client.get(url, {"phone": "9000000001"}).json()["standing"]["rank"], 1)
+        self.assertEqual(self.client.get(url, {"phone": "9000000002"}).status_code, 403)
+
+        User.objects.create_user("staff", password="pw", is_staff=True)
+        self.client.login(username="staff", password="pw")
+        self.assertIsNone(self.client.get(url, {"phone": "9000000002"}).json()["standing"])
+
+
+class ExportTests(QuizTestCase):
+    rows = [[i, f"row {i}", "x" * 40] for i in range(100)]
+
+    def test_sync_stream(self):
+        with mock.patch("quiz.exports.FLUSH_BYTES", 1000):
+            response = stream_csv(RequestFactory().get("/"), "rows.csv", ["ID", "Name", "Pad"], iter(self.rows))
+            self.assertFalse(response.is_async)
+            blocks = list(response)
+        self.assertGreater(len(blocks), 3)
+        lines = b"".join(blocks).decode().splitlines()
+        self.assertEqual(lines[0], "ID,Name,Pad")
+        self.assertEqual(lines[1:], [f"{i},row {i},{'x' * 40}" for i in range(100)])
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="rows.csv"')
+
+    def test_async_stream_under_asgi(self):
+        async def read(response):
+            return [block async for block in response]
+
+        with mock.patch("quiz.exports.FLUSH_BYTES", 1000):
+            response = stream_csv(AsyncRequestFactory().get("/"), "rows.csv", ["ID", "Name", "Pad"], iter(self.rows))
+            self.assertTrue(response.is_async)
+            blocks = async_to_sync(read)(response)
+        self.assertGreater(len(blocks), 3)
+        self.assertEqual(len(b"".join(blocks).decode().splitlines()), 101)
+
+
+class ChangeListTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        committed = write_batch([self.graded(f"90000000{i:02d}", ["A", "B", None, None]) for i in range(5)])
+        self.ids = sorted(committed.values(), reverse=True)
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+
+    def page(self, query=""):
+        response = self.client.get("/admin/quiz/submission/" + query)
+        self.assertEqual(response.status_code, 200)
+        return response.context["cl"]
+
+    def test_seek_pages_newest_first(self):
+        with mock.patch.object(SubmissionAdmin, "list_per_page", 2):
+            cl = self.page()
+            self.assertEqual([s.id for s in cl.result_list], self.ids[:2])
+            self.assertIsNone(cl.seek_first_url)
+            self.assertIn(f"before={self.ids[1]}", cl.seek_next_url)
+
+            cl = self.page(cl.seek_next_url)
+            self.assertEqual([s.id for s in cl.result_list], self.ids[2:4])
+            self.assertIsNotNone(cl.seek_first_url)
+            cl = self.page(cl.seek_next_url)
+            self.assertEqual([s.id for s in cl.result_list], self.ids[4:])
+            self.assertIsNone(cl.seek_next_url)
+
+            # Another sort order falls back to numbered pages
+            cl = self.page(f"?o=1&before={self.ids[1]}")
+            self.assertFalse(cl.seeking)
+            self.assertEqual([s.id for s in cl.result_list], sorted(self.ids)[:2])
+
+    def test_filtered_count_is_capped(self):
+        with mock.patch("quiz.changelists.COUNT_LIMIT", 3):
+            cl = self.page("?q=90000000")
+        self.assertEqual(cl.paginator.count, 3)
+        self.assertTrue(cl.paginator.estimated)
+
+    def test_packed_notice_is_cached(self):
+        url = "/admin/quiz/answer/"
+        self.assertNotContains(self.client.get(url), "store their answers packed")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse([q for q in queries if "answer_question_ids\" = ''" in q["sql"]])
+
+        # Packing invalidates the cached answer
+        pack_submissions(Submission.objects.filter(id=self.ids[0]))
+        self.assertContains(self.client.get(url), "store their answers packed")
+
+
+class OpsTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.quizzes = [(self.quiz.id, self.quiz.name, self.quiz.duration_minutes)]
+        self.admin_user = User.objects.create_superuser("admin", "admin@example.com", "pw")
+
+    def stream(self, factory):
+        request = factory.get("/admin/quiz/quiz/ops/stream/")
+        request.user = self.admin_user
+        return QuizAdmin(Quiz, admin.site).ops_stream(request)
+
+    def test_snapshot(self):
+        ops.login(self.quiz.id)
+        ops.quiz_started(self.quiz, "9000000001")
+        ops.quiz_started(self.quiz, "9000000001")  # a reload
+        ops.submitted(self.quiz.id, 3)
+        ops.registration_failed()
+        row = ops.snapshot(self.quizzes)["quizzes"][0]
+        self.assertEqual((row["logins"], row["submissions"], row["average_score"]), (1, 1, 3))
+        self.assertEqual(row["active_sessions"], 0)
+        self.assertEqual(ops.snapshot(self.quizzes)["registration_failures"], 1)
+
+    @mock.patch("quiz.ops.SYNC_STREAM_SECONDS", 0)
+    def test_sync_stream_is_capped(self):
+        response = self.stream(RequestFactory())
+        self.assertFalse(response.is_async)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        with mock.patch("quiz.ops.time.sleep") as sleep:
+            events = list(response)
+        sleep.assert_not_called()
+        self.assertEqual(events[0], b"retry: 2000\n\n")
+        self.assertEqual(json.loads(events[1].decode()[len("data: "):])["quizzes"][0]["quiz_id"], self.quiz.id)
+
+    @mock.patch("quiz.ops.PUSH_INTERVAL", 0)
+    def test_async_stream_under_asgi(self):
+        async def read(response):
+            return [event async for event in response]
+
+        response = self.stream(AsyncRequestFactory())
+        self.assertTrue(response.is_async)
+        with mock.patch("quiz.ops.STREAM_SECONDS", 0), mock.patch("quiz.ops.time.sleep", side_effect=AssertionError):
+            events = async_to_sync(read)(response)
+        self.assertEqual(len(events), 2)
+        self.assertTrue(events[1].startswith(b"data: "))
+
+
+class ItemAnalysisTests(QuizTestCase):
+    def submit_all(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            write_batch([
+                self.graded("9000000001", ["A", "B", "C", "D"]),
+                self.graded("9000000002", ["A", "B", None, "A"]),
+                self.graded("9000000003", ["B", None, None, "A"]),
+            ])
+
+    def counters(self):
+        return {
+            stats.question_id: [getattr(stats, name) for name in COUNTERS]
+            for stats in QuestionStats.objects.filter(question__quiz=self.quiz)
+        }
+
+    def test_running_totals_match_rebuild(self):
+        self.submit_all()
+        running = self.counters()
+        rebuild_quiz_stats(self.quiz)
+        self.assertEqual(self.counters(), running)
+
+    @override_settings(QUIZ_ANSWER_STORAGE="packed")
+    def test_rebuild_reads_packed_submissions(self):
+        self.submit_all()
+        running = self.counters()
+        QuestionStats.objects.all().delete()
+        rebuild_quiz_stats(self.quiz)
+        self.assertEqual(self.counters(), running)
+
+    def test_statistics(self):
+        self.submit_all()
+        first = QuestionStats.objects.get(question=self.questions[0])
+        self.assertAlmostEqual(first.p_value, 2 / 3)
+        self.assertAlmostEqual(first.option_rate("B"), 1 / 3)
+        self.assertEqual(first.unanswered_rate, 0)
+        # Scores 4, 2 and 0; the two who got it right scored 4 and 2
+        self.assertAlmostEqual(first.discrimination, 0.8660254)
+        self.assertIsNone(QuestionStats(responses=3, correct=3, score_sum=6, score_sq_sum=20).discrimination)
+
+
+class PaperTokenTests(QuizTestCase):
+    def test_round_trip(self):
+        bank = get_question_bank(self.quiz.id)
+        question_data, token = new_seeded_paper(bank, 3)
+        data = read_paper_token(token, self.quiz.id)
+        self.assertEqual(data["n"], 3)
+        self.assertEqual(
+            [q.id for q in paper_questions(bank, data)],
+            [item["obj"].id for item in question_data],
+        )
+
+    def test_forged_tokens(self):
+        bank = get_question_bank(self.quiz.id)
+        _, token = new_seeded_paper(bank, 3)
+        self.assertIsNone(read_paper_token(token[:-2] + "xx", self.quiz.id))
+        self.assertIsNone(read_paper_token(token, self.quiz.id + 1))
+        self.assertIsNone(read_paper_token(signing.dumps({"q": self.quiz.id, "n": 3}, salt="other"), self.quiz.id))
+        self.assertIsNone(read_paper_token(signing.dumps([self.quiz.id], salt=PAPER_SALT), self.quiz.id))
+        self.assertIsNone(read_paper_token("", self.quiz.id))
+        self.assertIsNone(read_paper_token(None, self.quiz.id))
+
+    def test_bank_change_grades_the_issued_paper_only(self):
+        question_data, token = new_seeded_paper(get_question_bank(self.quiz.id), 3)
+        issued = [item["obj"].id for item in question_data]
+        for i in range(4):
+            Question.objects.create(quiz=self.quiz, text_html="<p>New</p>", option_a="a", correct_option="A")
+        Question.objects.filter(id=issued[0]).delete()
+        bank = get_question_bank(self.quiz.id)
+
+        # Answering every question in the bank must not grade more than the issued paper
+        post = {"paper": token, **{f"q_{q.id}": q.correct_option for q in bank.questions}}
+        with self.assertLogs("quiz.papers", "WARNING"):
+            graded = grade_submission(self.quiz, bank, post, "9000000001", str(self.quiz.id))
+        graded_ids = [qid for qid, _, _, _ in graded.answers]
+        self.assertEqual(graded.total_questions, 3)
+        self.assertEqual(graded_ids[:2], issued[1:])
+        self.assertNotIn(issued[0], graded_ids)
+
+
+class DeliveryTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.bank_url = f"/api/quiz/{self.quiz.id}/bank/"
+        self.paper_url = f"/api/quiz/{self.quiz.id}/paper/"
+
+    def log_in(self, phone):
+        session = self.client.session
+        session["participant_phone"] = phone
+        session["participant_event"] = str(self.quiz.id)
+        session.save()
+
+    def test_html_mode_serves_no_json(self):
+        self.log_in("9000000001")
+        self.assertEqual(self.client.get(self.bank_url).status_code, 404)
+        self.assertEqual(self.client.get(self.paper_url).status_code, 404)
+
+    @override_settings(QUIZ_PAPER_DELIVERY="shell")
+    def test_bank(self):
+        response = self.client.get(self.bank_url)
+        self.assertTrue(response["Cache-Control"].startswith("public"))
+        self.assertNotIn("Cookie", response.get("Vary", ""))
+        body = response.json()
+        self.assertEqual(len(body["questions"]), 4)
+        self.assertEqual(body["questions"][0]["options"]["A"], "a")
+        self.assertNotIn("correct", response.content.decode())
+
+        version, etag = body["version"], response["ETag"]
+        pinned = self.client.get(f"{self.bank_url}{version}/")
+        self.assertIn("immutable", pinned["Cache-Control"])
+        self.assertEqual(pinned["ETag"], etag)
+        with self.assertNumQueries(0):
+            revalidated = self.client.get(f"{self.bank_url}{version}/", headers={"If-None-Match": etag})
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertRedirects(
+            self.client.get(f"{self.bank_url}{version - 1}/"), f"{self.bank_url}{version}/", fetch_redirect_response=False
+        )
+
+        self.questions[0].save()
+        self.assertNotEqual(self.client.get(self.bank_url).json()["version"], version)
+        self.quiz.is_active = False
+        self.quiz.save()
+        self.assertEqual(self.client.get(self.bank_url).status_code, 404)
+
+    @override_settings(QUIZ_PAPER_DELIVERY="shell")
+    def test_paper_and_submit(self):
+        self.assertEqual(self.client.get(self.paper_url).status_code, 403)
+        self.log_in("9000000001")
+        page = self.client.get(f"/quiz/{self.quiz.id}/").content.decode()
+        self.assertIn("loadPaper", page)
+        self.assertNotIn("Question 0", page)
+
+        paper = self.client.get(self.paper_url).json()
+        self.assertEqual(len(paper["questions"]), 3)
+        self.assertTrue(paper["bank"].endswith(f"/{get_question_bank(self.quiz.id).version}/"))
+        key = {q.id: q.correct_option for q in self.questions}
+        self.client.post(
+            f"/quiz/{self.quiz.id}/submit/",
+            {"paper": paper["paper"], **{f"q_{qid}": key[qid] for qid, _ in paper["questions"]}},
+        )
+        self.assertEqual(Submission.objects.get(quiz=self.quiz, phone="9000000001").score, 3)
+        self.assertEqual(self.client.get(self.paper_url).status_code, 403)
+
+
+class LoadTestHelperTests(QuizTestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        random.Random(1).shuffle(values)
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 100), 100)
+        self.assertEqual(percentile([7], 99), 7)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_recorder_keeps_the_first_error(self):
+        recorder = Recorder()
+        recorder.record("quiz", 0.1)
+        recorder.record("quiz", 0.3, error="HTTP 500")
+        recorder.record("quiz", 0.2, error="HTTP 502")
+        self.assertEqual(recorder.latencies["quiz"], [0.1, 0.3, 0.2])
+        self.assertEqual(recorder.errors["quiz"], 2)
+        self.assertEqual(recorder.error_samples["quiz"], "HTTP 500")
+
+    def test_lock_monitor_counts_writes_and_lock_errors(self):
+        monitor = SQLiteLockMonitor()
+        monitor(lambda *args: None, "  insert into t values (1)", (), False, {})
+        monitor(lambda *args: None, "SELECT 1", (), False, {})
+
+        def locked(*args):
+            raise OperationalError("database is locked")
+
+        with self.assertRaises(OperationalError):
+            monitor(locked, "UPDATE t SET x = 1", (), False, {})
+        self.assertEqual(len(monitor.write_times), 2)
+        self.assertEqual(monitor.locked_errors, 1)
+
+    def test_stub_registration_api(self):
+        server, url = start_stub_registration_api(latency=0, jitter=0)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        data = requests.post(url, json={"mobile_number": "9000001234", "event_name": "CodeWarz"}, timeout=5).json()
+        self.assertEqual(data, {"success": True, "name": "Participant 1234", "college": "Load Test College"})
+
+        server, url = start_stub_registration_api(latency=0, jitter=0, unregistered_rate=1.0)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.assertFalse(requests.post(url, json={}, timeout=5).json()["success"])
+
+
+class MetricsTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        patcher = mock.patch("quiz.metrics.METRICS_DIR", str(self.directory))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def registry(self, count):
+        registry = Registry()
+        registry.counter("quiz_test_total", "Test counter.").inc(count)
+        return registry
+
+    def write(self, pid, count):
+        path = self.directory / f"metrics-{pid}-1.json"
+        path.write_text(json.dumps(self.registry(count).snapshot()))
+        return path
+
+    def total(self, registry):
+        return registry.collect()["quiz_test_total"]["[]"][0]
+
+    def test_stopped_processes_are_archived(self):
+        process = subprocess.Popen([sys.executable, "-c", "pass"])
+        process.wait()
+        stopped = self.write(process.pid, 5)
+        running = self.write(os.getppid(), 7)
+
+        registry = self.registry(1)
+        self.assertEqual(self.total(registry), 13)
+        self.assertFalse(stopped.exists())
+        self.assertTrue(running.exists())
+        self.assertEqual(
+            sorted(path.name for path in self.directory.glob("metrics-*.json")),
+            sorted([ARCHIVE_FILE, running.name, registry._file.name]),
+        )
+
+        # A later process with the same pid archives the earlier one's file
+        successor = self.registry(2)
+        self.assertEqual(self.total(successor), 15)
+        self.assertFalse(registry._file.exists())
+        self.assertEqual(len(list(self.directory.glob("metrics-*.json"))), 3)
+
+    def test_render(self):
+        registry = self.registry(3)
+        registry.histogram("quiz_test_seconds", "Test histogram.", (0.1, 1)).observe(0.5)
+        text = registry.render()
+        self.assertIn("quiz_test_total 3", text)
+        self.assertIn('quiz_test_seconds_bucket{le="1"} 1', text)
+        self.assertIn("quiz_test_seconds_count 1", text)
+
+
+class AsyncViewTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        # Threads the views reached the shared cache from, by module
+        self.cache_threads = {}
+        for module in ("admission", "ops", "results"):
+            original = getattr(importlib.import_module(f"quiz.{module}"), "shared_cache")
+
+            def spy(module=module, original=original):
+                self.cache_threads.setdefault(module, set()).add(threading.get_ident())
+                return original()
+
+            patcher = mock.patch(f"quiz.{module}.shared_cache", spy)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def assertOffTheLoop(self, *modules):
+        loop_thread = threading.get_ident()
+        for module in modules:
+            self.assertTrue(self.cache_threads.get(module), module)
+            self.assertNotIn(loop_thread, self.cache_threads[module], module)
+
+    async def test_quiz_page(self):
+        request = AsyncRequestFactory().get(f"/quiz/{self.quiz.id}/")
+        request.session = SessionStore()
+        await request.session.aset("participant_phone", "9000000001")
+        await request.session.aset("participant_event", str(self.quiz.id))
+        response = await async_views.quiz_page(request, self.quiz.id)
+        self.assertContains(response, 'name="paper"')
+        self.assertOffTheLoop("ops")
+
+    async def test_admission(self):
+        self.quiz.start_rate_per_minute = 1
+        await self.quiz.asave()
+        request = AsyncRequestFactory().post("/", {"event": self.quiz.id, "phone": "9000000001"})
+        request.session = SessionStore()
+        await async_views.prelims_entry(request)
+        self.assertOffTheLoop("admission")
+
+    async def test_result_page_and_revalidation(self):
+        submission_ids = await sync_to_async(write_batch)([self.graded("9000000001", ["A", "B", None, None])])
+        submission_id = next(iter(submission_ids.values()))
+        factory = AsyncRequestFactory()
+
+        first = await async_views.quiz_result(factory.get("/"), submission_id)
+        self.assertContains(first, "Your Score: <strong>2</strong>")
+        again = await async_views.quiz_result(factory.get("/"), submission_id)
+        self.assertEqual(again["ETag"], first["ETag"])
+        revalidated = await async_views.quiz_result(factory.get("/", headers={"If-None-Match": again["ETag"]}), submission_id)
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated["ETag"], again["ETag"])
+        self.assertOffTheLoop("results")
+
+
+class ReplicaTests(QuizTestCase):
+    def test_reads_go_to_the_replica_only_when_asked(self):
+        router = ReplicaRouter()
+        with mock.patch("quiz.routers.replica_configured", return_value=True):
+            self.assertIsNone(router.db_for_read(Quiz))
+            with replica_reads():
+                self.assertEqual(router.db_for_read(Quiz), "replica")
+                self.assertIsNone(router.db_for_read(User))
+                with pinned_to_primary():
+                    self.assertEqual(router.db_for_read(Quiz), "default")
+                self.assertEqual(router.db_for_write(Quiz), "default")
+        self.assertEqual(reporting_db(), "default")
+        self.assertFalse(router.allow_migrate("replica", "quiz"))
+
+    def test_submit_pins_the_participant_to_the_primary(self):
+        session = self.client.session
+        session["participant_phone"] = "9000000001"
+        session["participant_event"] = str(self.quiz.id)
+        session.save()
+        response = self.client.post(f"/quiz/{self.quiz.id}/submit/", {})
+        self.assertIn("quiz_primary_pin", response.cookies)
+
+    def test_no_replica_configured(self):
+        with self.assertRaisesMessage(CommandError, "No replica database configured"):
+            call_command("replicate_db")
+
+    def test_copy_switches_the_primary_to_wal(self):
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        source, target = str(directory / "primary.sqlite3"), str(directory / "replica.sqlite3")
+        with closing(sqlite3.connect(source)) as db:
+            db.execute("CREATE TABLE t (x)")
+            db.execute("INSERT INTO t VALUES (1)")
+            db.commit()
+        self.assertEqual(enable_wal(source), "wal")
+
+        # A writer holding its transaction open doesn't keep the copy from a consistent snapshot
+        with closing(sqlite3.connect(source)) as writer:
+            writer.execute("INSERT INTO t VALUES (2)")
+            copy_database(source, target)
+            writer.commit()
+        with closing(sqlite3.connect(target)) as db:
+            self.assertEqual(db.execute("SELECT x FROM t").fetchall(), [(1,)])
+
+
+class ShardTests(QuizTestCase):
+    @classmethod
+    def setUpClass(cls):
+        # A shard alias of its own, as QUIZ_SHARDS_SPEC would configure it. Added
+        # here rather than in `databases`, which the runner checks before any setup
+        cls.shard_dir = tempfile.mkdtemp()
+        name = os.path.join(cls.shard_dir, "shard_tests.sqlite3")
+        connections.settings["shard_tests"] = {**connections.settings["default"], "NAME": name, "TEST": {**connections.settings["default"]["TEST"], "NAME": name}}
+        call_command("migrate", database="shard_tests", verbosity=0)
+        cls.databases = {"default", "shard_tests"}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections["shard_tests"].close()
+        del connections["shard_tests"]
+        del connections.settings["shard_tests"]
+        shutil.rmtree(cls.shard_dir, ignore_errors=True)
+
+    def setUp(self):
+        super().setUp()
+        override = override_settings(QUIZ_SHARDS={self.quiz.id: "shard_tests"})
+        override.enable()
+        self.addCleanup(override.disable)
+        mirror_quiz(self.quiz.id)
+
+    def test_quiz_is_mirrored(self):
+        self.assertEqual(Question.objects.using("shard_tests").filter(quiz=self.quiz).count(), 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            Question.objects.create(quiz=self.quiz, text_html="<p>New</p>", option_a="a", correct_option="A")
+        self.assertEqual(Question.objects.using("shard_tests").filter(quiz=self.quiz).count(), 5)
+
+    def test_submissions_are_written_to_the_shard(self):
+        with self.captureOnCommitCallbacks(using="shard_tests", execute=True):
+            write_batch([self.graded("9000000001", ["A", "B", None, None])])
+        self.assertEqual(Submission.objects.using("shard_tests").filter(quiz=self.quiz).count(), 1)
+        self.assertFalse(Submission.objects.filter(quiz=self.quiz).exists())
+        self.assertEqual(stranded_submissions(self.quiz.id), 0)
+        self.assertTrue(AttemptRegistry().has_attempted(self.quiz.id, "9000000001"))
+
+        self.questions[1].correct_option = "C"
+        self.questions[1].save()
+        self.assertEqual(regrade_quiz(self.quiz).after, {1: 1})
+        self.assertEqual(Submission.objects.using("shard_tests").get(quiz=self.quiz).score, 1)
+
+    def test_fan_out_merges_in_order(self):
+        other = Quiz.objects.create(name="Unsharded")
+        Submission.objects.create(quiz=other, phone="1", score=3, total_questions=4)
+        Submission.objects.create(quiz=other, phone="2", score=1, total_questions=4)
+        Submission.objects.using("shard_tests").create(quiz_id=self.quiz.id, phone="3", score=2, total_questions=4)
+
+        scores = fan_out(
+            lambda alias: Submission.objects.using(alias).order_by("-score").values_list("score", flat=True),
+            key=lambda score: score,
+            reverse=True,
+        )
+        self.assertEqual(list(scores), [3, 2, 1])
+
+
+class AssetTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+
+    def collect(self, files):
+        source = FileSystemStorage(location=self.dir / "src")
+        storage = PrecompressedManifestStaticFilesStorage(location=self.dir / "root", base_url="/static/")
+        for name, content in files.items():
+            source.save(name, ContentFile(content))
+            with source.open(name) as f:
+                storage.save(name, f)
+        list(storage.post_process({name: (source, name) for name in files}))
+        return storage
+
+    def test_icons(self):
+        Image.new("RGBA", (300, 400), (200, 30, 30, 255)).save(self.dir / "fav.png")
+        written = build_icons(self.dir / "fav.png", self.dir / "icons")
+        self.assertEqual([p.name for p in written][-1], "favicon.ico")
+        with Image.open(self.dir / "icons" / "favicon-32.png") as icon:
+            self.assertEqual(icon.size, (32, 32))
+        with Image.open(self.dir / "icons" / "apple-touch-icon.png") as icon:
+            self.assertEqual((icon.size, icon.mode), ((180, 180), "RGB"))
+
+    def test_hashed_names_get_compressed_copies(self):
+        css = b"body { color: red; }\n" * 100
+        storage = self.collect({"styles.css": css, "tiny.js": b"var a = 1;"})
+        hashed = storage.stored_name("styles.css")
+        self.assertRegex(hashed, r"^styles\.[0-9a-f]{12}\.css$")
+        self.assertEqual(gzip.decompress((self.dir / "root" / f"{hashed}.gz").read_bytes()), css)
+        self.assertFalse((self.dir / "root" / f"{storage.stored_name('tiny.js')}.gz").exists())
+
+    def test_serve_static(self):
+        css = b"body { color: red; }\n" * 100
+        hashed = self.collect({"styles.css": css}).stored_name("styles.css")
+        factory = RequestFactory()
+        with override_settings(STATIC_ROOT=self.dir / "root"):
+            response = serve_static(factory.get("/", headers={"Accept-Encoding": "gzip, br"}), hashed)
+            self.assertEqual(response["Content-Encoding"], "gzip")
+            self.assertEqual(response["Cache-Control"], IMMUTABLE)
+            self.assertIn("Accept-Encoding", response["Vary"])
+            self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), css)
+            response.close()
+
+            response = serve_static(factory.get("/"), "styles.css")
+            self.assertFalse(response.has_header("Content-Encoding"))
+            self.assertEqual(response["Cache-Control"], "public, max-age=3600")
+            response.close()
+
+            for path in ("../db.sqlite3", "missing.css"):
+                with self.assertRaises(Http404):
+                    serve_static(factory.get("/"), path)
+
+
+class ImageTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def upload(self, size=(1000, 500)):
+        buffer = BytesIO()
+        Image.new("RGB", size, (10, 120, 200)).save(buffer, "JPEG")
+        return SimpleUploadedFile("photo.jpg", buffer.getvalue(), content_type="image/jpeg")
+
+    def test_variant_widths_never_upscale(self):
+        self.assertEqual(variant_widths(600), [480, 600])
+        self.assertEqual(variant_widths(4000), [480, 960, 1440])
+
+    def test_bank_serves_the_original_until_copies_exist(self):
+        question = self.questions[0]
+        question.image = self.upload()
+        question.save()  # no commit in a TestCase, so nothing is queued
+        bank_question = get_question_bank(self.quiz.id).by_id[question.id]
+        self.assertEqual(bank_question.image_url, question.image.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(process_question_image(question))
+        self.assertEqual([width for width, _ in question.image_variants["webp"]], [480, 960, 1000])
+        bank_question = get_question_bank(self.quiz.id).by_id[question.id]
+        self.assertTrue(bank_question.image_url.endswith("-1000w.jpeg"))
+        self.assertIn("480w", bank_question.image_srcset)
+        self.assertEqual((bank_question.image_width, bank_question.image_height), (1000, 500))
+        self.assertFalse(process_question_image(question))
+
+    def test_save_hands_the_image_to_the_worker_after_commit(self):
+        threads = []
+        question = self.questions[0]
+        with mock.patch("quiz.images._process", side_effect=lambda pk: threads.append((pk, threading.get_ident()))):
+            with self.captureOnCommitCallbacks(execute=True):
+                question.image = self.upload()
+                question.save()
+                self.assertEqual(threads, [])
+            image_worker.join()
+        self.assertEqual([pk for pk, _ in threads], [question.id])
+        self.assertNotEqual(threads[0][1], threading.get_ident())
+
+
+class ResultPageTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        committed = write_batch([self.graded("9000000001", ["A", "B", None, None])])
+        self.submission = Submission.objects.get(id=next(iter(committed.values())))
+        self.url = f"/result/{self.submission.id}/"
+
+    def test_rendered_once_then_revalidated(self):
+        first = self.client.get(self.url)
+        self.assertContains(first, "Your Score: <strong>2</strong>")
+        self.assertEqual(first["Cache-Control"], "private, no-cache")
+        self.assertNotIn(CSRF_PLACEHOLDER, first.content.decode())
+
+        with self.assertNumQueries(0):
+            again = self.client.get(self.url)
+            not_modified = self.client.get(self.url, headers={"If-None-Match": again["ETag"]})
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_regrade_and_feedback_outdate_the_page(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.questions[2].correct_option = "A"
+        self.questions[2].save()  # bumps the quiz's result version
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+
+        Feedback.objects.create(submission=self.submission, rating=5)
+        response = self.client.get(self.url, headers={"If-None-Match": response["ETag"]})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "Submit Feedback")
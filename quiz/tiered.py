@@ -0,0 +1,135 @@
+"""
+Two-level cache for data every worker reads on every request.
+
+Django's default cache is per process, so each gunicorn worker starts cold
+and a version bump made by the admin's worker is never seen by the others.
+TieredCache keeps a small in-process L1 (bounded LRU with a TTL) in front of
+the shared L2 backend configured as CACHES[QUIZ_CACHE_ALIAS] (a directory on
+disk by default, or Redis).
+
+Entries live in namespaces ("quiz:3", "catalog", ...). Each namespace has a
+version in L2 that is part of every key, so invalidate() (called from
+quiz.signals when a Quiz or Question changes) makes the old entries
+unreachable everywhere at once; the L2 version keys are the invalidation
+channel. Workers check a namespace's version at most every
+QUIZ_CACHE_SYNC_INTERVAL seconds, so stale entries are dropped within about a
+second of an admin edit without an L2 round trip on every read.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+VERSION_KEY = "quiz:tiered:version:{namespace}"
+ENTRY_KEY = "quiz:tiered:{namespace}:{version}:{key}"
+_MISSING = object()
+
+
+class TieredCache:
+    def __init__(self, alias, max_size, ttl, sync_interval):
+        self.alias = alias
+        self.max_size = max_size
+        self.ttl = ttl
+        self.sync_interval = sync_interval
+        self._entries = OrderedDict()  # full key -> (expires, value)
+        self._versions = {}  # namespace -> (version, checked at)
+        self._lock = threading.Lock()
+
+    @property
+    def l2(self):
+        return caches[self.alias]
+
+    # ---------- Versions ----------
+
+    def version(self, namespace):
+        """
+        Current version of `namespace`, re-read from L2 at most every
+        sync_interval seconds. Time-based, like the other version keys, so a
+        version evicted from L2 never comes back as an old value.
+        """
+        now = time.monotonic()
+        seen = self._versions.get(namespace)
+        if seen is not None and now - seen[1] < self.sync_interval:
+            return seen[0]
+
+        key = VERSION_KEY.format(namespace=namespace)
+        version = self.l2.get(key)
+        if version is None:
+            self.l2.add(key, time.time_ns(), timeout=None)
+            version = self.l2.get(key)
+        self._versions[namespace] = (version, now)
+        return version
+
+    def invalidate(self, namespace):
+        """Retire every entry of `namespace`, in this process at once and elsewhere within sync_interval."""
+        key = VERSION_KEY.format(namespace=namespace)
+        version = max((self.l2.get(key) or 0) + 1, time.time_ns())
+        self.l2.set(key, version, timeout=None)
+        self._versions[namespace] = (version, time.monotonic())
+
+    # ---------- Entries ----------
+
+    def _full_key(self, namespace, key):
+        return ENTRY_KEY.format(namespace=namespace, version=self.version(namespace), key=key)
+
+    def _remember(self, full_key, value):
+        with self._lock:
+            self._entries[full_key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(full_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get(self, namespace, key, default=None):
+        full_key = self._full_key(namespace, key)
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(full_key)
+                    return entry[1]
+                del self._entries[full_key]
+
+        value = self.l2.get(full_key, _MISSING)
+        if value is _MISSING:
+            return default
+        self._remember(full_key, value)
+        return value
+
+    def set(self, namespace, key, value, timeout=None):
+        """Store in both levels; `timeout` (seconds, None = no expiry) applies to L2."""
+        full_key = self._full_key(namespace, key)
+        self.l2.set(full_key, value, timeout=timeout)
+        self._remember(full_key, value)
+
+    def get_or_set(self, namespace, key, default, timeout=None):
+        """The cached value, or default() stored in both levels."""
+        value = self.get(namespace, key, _MISSING)
+        if value is _MISSING:
+            value = default()
+            self.set(namespace, key, value, timeout)
+        return value
+
+    def clear(self):
+        """Forget this process's L1 entries and versions (L2 is left alone)."""
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+
+def shared_cache():
+    """
+    The L2 backend itself, for state every worker must agree on (counters,
+    clocks, markers). Its add() and incr() are atomic across processes.
+    """
+    return caches[tiered.alias]
+
+
+tiered = TieredCache(
+    alias=getattr(settings, "QUIZ_CACHE_ALIAS", "default"),
+    max_size=getattr(settings, "QUIZ_CACHE_L1_SIZE", 256),
+    ttl=getattr(settings, "QUIZ_CACHE_L1_TTL", 60),
+    sync_interval=getattr(settings, "QUIZ_CACHE_SYNC_INTERVAL", 1.0),
+)
@@ -1,13 +1,29 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Under ASGI the participant-facing views can be served by their async versions
+if getattr(settings, "QUIZ_ASYNC_VIEWS", False):
+    from . import async_views as participant_views
+else:
+    participant_views = views
+
 urlpatterns = [
-    path('', views.prelims_entry, name='prelims_entry'),
+    path('', participant_views.prelims_entry, name='prelims_entry'),
     path('confirm/', views.prelims_confirm, name='prelims_confirm'),
-    path('quiz/<int:quiz_id>/', views.quiz_page, name='quiz'),
-    path("quiz/<int:quiz_id>/submit/", views.submit_quiz, name="submit_quiz"),
-    path("result/<int:submission_id>/", views.quiz_result, name="quiz_result"),
+    path('waiting/<str:ticket>/', participant_views.waiting_room, name='waiting_room'),
+    path('waiting/<str:ticket>/status/', views.waiting_status, name='waiting_status'),
+    path('quiz/<int:quiz_id>/', participant_views.quiz_page, name='quiz'),
+    path("quiz/<int:quiz_id>/submit/", participant_views.submit_quiz, name="submit_quiz"),
+    path("result/<int:submission_id>/", participant_views.quiz_result, name="quiz_result"),
+    path("quiz/<int:quiz_id>/result/<int:submission_id>/", participant_views.quiz_result, name="quiz_shard_result"),
+    path("result/receipt/<str:receipt>/", views.submission_receipt, name="submission_receipt"),
     path("submit/feedback/", views.submit_feedback, name="submit_feedback"),
+    path("api/quiz/<int:quiz_id>/leaderboard/", views.leaderboard_api, name="leaderboard_api"),
+    path("api/quiz/<int:quiz_id>/bank/", views.bank_api, name="quiz_bank_api"),
+    path("api/quiz/<int:quiz_id>/bank/<int:version>/", views.bank_api, name="quiz_bank_version_api"),
+    path("api/quiz/<int:quiz_id>/paper/", views.paper_api, name="quiz_paper_api"),
+    path("metrics/", views.metrics_view, name="metrics"),
      
     # path('login/', views.user_login, name='login'),
     # path('quiz/<int:quiz_id>/', views.quiz_page, name='quiz'),
@@ -1,9 +1,33 @@
 from django.shortcuts import render, HttpResponse, redirect, get_object_or_404
-from django.urls import reverse
-import random
-from .models import Quiz, Question, Submission, Answer
-from django.views.decorators.http import require_POST
-import requests
+from django.http import Http404, JsonResponse
+from . import metrics, ops
+from .models import Quiz, Submission
+from .bank import get_question_bank
+from .catalog import catalog_fragment, catalog_quiz
+from .registration import verify_participant
+from .routers import db_for_quiz, pin_to_primary
+from .admission import read_ticket, take_slot
+from .attempts import attempts
+from .leaderboard import leaderboards
+from .packing import OPTIONS, load_answers
+from .ingest import GradedSubmission, ingest, make_receipt, read_receipt, submission_failed, writer_for
+from .papers import (
+    CSRF_PLACEHOLDER,
+    assign_variant,
+    new_seeded_paper,
+    paper_questions,
+    read_paper_token,
+    render_shell_page,
+    render_variant_page,
+    splice_participant,
+)
+from .delivery import BANK_MAX_AGE, bank_document, bank_url, participant_paper, shell_delivery
+from .results import cached_result, result_etag, result_last_modified, result_response, store_result
+from django.template.loader import render_to_string
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import condition, require_POST
 
 
 from django.views.decorators.cache import never_cache
@@ -19,151 +43,82 @@ EVENT_CONFIG = {
     },
 }
 
+def landing_page(request, error=""):
+    """Step 1 of the entry flow; the event grid comes from the cached catalog."""
+    return render(
+        request,
+        "prelims_landing.html",
+        {
+            "step": 1,
+            "error": error,
+            "catalog_html": catalog_fragment(),
+        },
+    )
+
+
+def register_participant(request, quiz_obj, phone):
+    """Verify a participant, remember them in the session and go to the confirm step."""
+    # ---------- VERIFY REGISTRATION ----------
+    # Local roster first; the college PHP server is only a guarded fallback
+    leader_name, institution, api_error = verify_participant(quiz_obj.name, phone)
+    ops.login(quiz_obj.id)
+
+    # Build team data (fallback if API fails)
+    team_data = {
+        "participant_name": leader_name or "Unknown Participant",
+        "event_display": quiz_obj.name,
+        "institution": institution or "Unknown Institution",
+    }
+
+    # ✅ Save to session for secure access in confirm/quiz_page
+    request.session['participant_phone'] = phone
+    request.session['participant_event'] = str(quiz_obj.id)
+
+    # Store temp data for confirmation page
+    request.session['temp_team_data'] = team_data
+    request.session['temp_api_error'] = api_error
+
+    # ✅ PRG: Redirect to confirmation view
+    return redirect('prelims_confirm')
+
+
 @never_cache
 def prelims_entry(request):
     if request.method == "POST":
         quiz_id = request.POST.get("event")
         phone = request.POST.get("phone", "").strip()
 
-        # Fetch All Quizzes for context in case of error
-        all_quizzes = Quiz.objects.all()
-
         if not quiz_id or not phone:
-            return render(
-                request,
-                "prelims_landing.html",
-                {
-                    "step": 1,
-                    "error": "Please select an event and enter phone number.",
-                    "quizzes": all_quizzes,
-                },
-            )
+            return landing_page(request, "Please select an event and enter phone number.")
 
         import re
 
         if not re.match(r"^[6-9]\d{9}$", phone):
-            return render(
-                request,
-                "prelims_landing.html",
-                {
-                    "step": 1,
-                    "error": "Enter a valid 10-digit Indian mobile number starting with 6–9.",
-                    "quizzes": all_quizzes,
-                },
-            )
+            return landing_page(request, "Enter a valid 10-digit Indian mobile number starting with 6–9.")
 
-        # Look up event/quiz from DB
-        try:
-            quiz_obj = Quiz.objects.get(id=quiz_id)
-            if not quiz_obj.is_active:
-                 return render(
-                    request,
-                    "prelims_landing.html",
-                    {
-                        "step": 1,
-                        "error": "This quiz is not active yet.",
-                        "quizzes": all_quizzes,
-                    },
-                )
-            event_name = quiz_obj.name
-        except (Quiz.DoesNotExist, ValueError):
-             return render(
-                request,
-                "prelims_landing.html",
-                {
-                    "step": 1,
-                    "error": "Invalid event selected.",
-                    "quizzes": all_quizzes,
-                },
-            )
+        # Look up event/quiz in the cached catalog, not the database
+        quiz_obj = catalog_quiz(quiz_id)
+        if quiz_obj is None:
+            return landing_page(request, "Invalid event selected.")
+        if not quiz_obj.is_active:
+            return landing_page(request, "This quiz is not active yet.")
 
         # Check for existing submission
-        if Submission.objects.filter(quiz=quiz_obj, phone=phone).exists():
-             return render(
-                request,
-                "prelims_landing.html",
-                {
-                    "step": 1,
-                    "error": "You have already attempted this quiz. Multiple attempts are not allowed.",
-                    "quizzes": all_quizzes,
-                },
-            )
-
-        # ---------- CALL COLLEGE PHP SERVER ----------
-        leader_name = None
-        institution = None
-        api_error = None
-
-        try:
-            # 🔴 Real PHP endpoint
-            php_api_url = "https://rvrjcce.ac.in/xcsm/aikshetra2K25/api/get_participant.php"
+        if attempts.has_attempted(quiz_obj.id, phone):
+            return landing_page(request, "You have already attempted this quiz. Multiple attempts are not allowed.")
 
-            # 🔴 Payload as requested
-            api_combos = {'Build With AI':'Build with AI', 'CodeWarz':'CodeWarz'}
-            payload = {
-                "mobile_number": phone,  # Key from user's sample
-                "event_name": api_combos[event_name],
-            }
+        # ---------- ADMISSION CONTROL ----------
+        # At quiz start, participants beyond the quiz's start rate wait their turn
+        ticket = take_slot(quiz_obj, phone)
+        if ticket is not None:
+            return redirect('waiting_room', ticket=ticket.sign())
 
-            
-            print(f"--- Calling API: {php_api_url}")
-            print(f"--- Payload: {payload}")
-
-            # Using json=payload because user input example looked like JSON
-            resp = requests.post(php_api_url, json=payload, timeout=5)
-            
-            print(f"--- Response Status: {resp.status_code}")
-            print(f"--- Response Text: {resp.text}")
-            
-            resp.raise_for_status()
-
-            # Expected JSON: { "success": true, "name": "...", "college": "..." }
-            data = resp.json()
-
-            if not data.get("success"):
-                api_error = data.get("message") or "Unable to verify registration from server."
-            else:
-                leader_name = data.get("name")
-                institution = data.get("college")
-
-                if not leader_name or not institution:
-                    api_error = "Could not fetch complete details from server."
-        except Exception as e:
-            print(f"--- API Error: {e}")
-            # api_error = "Could not contact college server. Please inform the coordinator."
-            pass
+        return register_participant(request, quiz_obj, phone)
 
-        # Build team data (fallback if API fails)
-        team_data = {
-            "participant_name": leader_name or "Unknown Participant",
-            "event_display": event_name,
-            "institution": institution or "Unknown Institution",
-        }
-
-        # ✅ Save to session for secure access in confirm/quiz_page
-        request.session['participant_phone'] = phone
-        request.session['participant_event'] = quiz_id
-        
-        # Store temp data for confirmation page
-        request.session['temp_team_data'] = team_data
-        request.session['temp_api_error'] = api_error
-
-        # ✅ PRG: Redirect to confirmation view
-        return redirect('prelims_confirm')
-
-    # GET → show step 1 with dynamic quizzes
-    quizzes = Quiz.objects.all()
+    # GET → show step 1 with the quiz catalog
     # If user is already in session and tries to go to landing, maybe we could clear session?
     # For now, let's just show landing.
-    
-    return render(
-        request,
-        "prelims_landing.html",
-        {
-            "step": 1,
-            "quizzes": quizzes,
-        },
-    )
+    return landing_page(request)
 
 
 @never_cache
@@ -194,62 +149,74 @@ def prelims_confirm(request):
     )
 
 
+@never_cache
+def waiting_room(request, ticket):
+    """
+    Where prelims_entry parks participants beyond a quiz's start rate.
+    The page polls waiting_status and posts back here once their slot comes.
+    """
+    admission = read_ticket(ticket)
+    if admission is None:
+        return landing_page(request, "Your place in the queue has expired. Please login again.")
+
+    if request.method != "POST" or not admission.ready():
+        return render(request, "waiting_room.html", {
+            "quiz_name": admission.quiz_name,
+            "ticket": ticket,
+            "status": admission.status(),
+        })
+
+    quiz_obj = catalog_quiz(admission.quiz_id)
+    if quiz_obj is None or not quiz_obj.is_active or attempts.has_attempted(quiz_obj.id, admission.phone):
+        return redirect('prelims_entry')
+    return register_participant(request, quiz_obj, admission.phone)
+
+
+@never_cache
+def waiting_status(request, ticket):
+    """Queue position of a waiting-room ticket; computed from the ticket alone."""
+    admission = read_ticket(ticket)
+    if admission is None:
+        return JsonResponse({"error": "expired"}, status=404)
+    return JsonResponse(admission.status())
+
+
 @never_cache
 def quiz_page(request, quiz_id):
     # ✅ 1. Security Check: Ensure user came from landing page
     session_phone = request.session.get('participant_phone')
     if not session_phone:
-        return render(request, "prelims_landing.html", {
-            "step": 1,
-            "error": "Session expired or invalid. Please login again.",
-            "quizzes": Quiz.objects.all()
-        })
+        return landing_page(request, "Session expired or invalid. Please login again.")
 
     quiz = get_object_or_404(Quiz, id=quiz_id)
 
     # ✅ 2. Double Security: Ensure they are accessing the event they selected
     session_event = request.session.get('participant_event')
     if str(session_event) != str(quiz_id):
-         return render(request, "prelims_landing.html", {
-            "step": 1,
-            "error": "Invalid event access. Please select correct event.",
-            "quizzes": Quiz.objects.all()
-        })
+         return landing_page(request, "Invalid event access. Please select correct event.")
 
     # ✅ 3. Check if ALREADY SUBMITTED
-    if Submission.objects.filter(quiz=quiz, phone=session_phone).exists():
-        return render(request, "prelims_landing.html", {
-            "step": 1,
-            "error": "You have already attempted this quiz. Multiple attempts are not allowed.",
-            "quizzes": Quiz.objects.all()
-        })
+    if attempts.has_attempted(quiz.id, session_phone):
+        return landing_page(request, "You have already attempted this quiz. Multiple attempts are not allowed.")
 
-    # Get all questions for this quiz
-    all_questions = list(quiz.questions.all())
-    num = min(quiz.num_questions, len(all_questions))
-
-    # Randomly choose the questions that will be shown
-    chosen_questions = random.sample(all_questions, num) if num > 0 else []
-
-    # ✅ Store the chosen question IDs in session so submit_quiz knows exactly which to grade
-    request.session[f"quiz_{quiz.id}_question_ids"] = [q.id for q in chosen_questions]
-
-    # Build data for template (+ shuffle options per question)
-    question_data = []
-    for q in chosen_questions:
-        options = [
-            ("A", q.option_a),
-            ("B", q.option_b),
-            ("C", q.option_c),
-            ("D", q.option_d),
-        ]
-        random.shuffle(options)
-        question_data.append(
-            {
-                "obj": q,
-                "options": options,
-            }
-        )
+    # Questions come from the cached bank snapshot, not the database
+    bank = get_question_bank(quiz.id)
+    ops.quiz_started(quiz, session_phone)
+
+    # With JSON delivery every participant gets the same shell; the browser
+    # fetches its paper from paper_api and the questions from bank_api
+    if shell_delivery():
+        return HttpResponse(splice_participant(request, render_shell_page(quiz, bank), session_phone))
+
+    # If paper variants were built for this quiz, serve the cached page of one
+    variant = assign_variant(bank, session_phone)
+    if variant is not None:
+        html = render_variant_page(quiz, bank, variant)
+        return HttpResponse(splice_participant(request, html, session_phone))
+
+    # Otherwise shuffle a fresh paper. It is fully described by the signed
+    # paper token posted back with the answers, so nothing goes in the session.
+    question_data, paper_token = new_seeded_paper(bank, quiz.num_questions)
 
     return render(
         request,
@@ -261,121 +228,184 @@ def quiz_page(request, quiz_id):
             # Pass these to template so we don't need URL params anymore
             "participant_phone": session_phone,
             "participant_event": session_event,
+            "paper_token": paper_token,
         },
     )
 
 
-@require_POST
-def submit_quiz(request, quiz_id):
-    quiz = get_object_or_404(Quiz, pk=quiz_id)
+def result_redirect(quiz_id, submission_id):
+    """Redirect to a result; sharded quizzes carry the quiz id to find the right database."""
+    if db_for_quiz(quiz_id) == "default":
+        return redirect('quiz_result', submission_id=submission_id)
+    return redirect('quiz_shard_result', quiz_id=quiz_id, submission_id=submission_id)
 
-    # ✅ Security: Get phone from session if possible, else POST
-    # Ideally trust session, but fall back to POST if session died mid-quiz (unlikely but possible)?
-    # Actually, we should strictly enforce session or at least valid phone.
-    phone = request.session.get('participant_phone') or request.POST.get("phone")
-    event = request.session.get('participant_event') or request.POST.get("event")
 
-    # ✅ Check if ALREADY SUBMITTED
-    existing_sub = Submission.objects.filter(quiz=quiz, phone=phone).first()
-    if existing_sub:
-        # If they somehow resubmit, redirect to result
-        return redirect('quiz_result', submission_id=existing_sub.id)
-
-    # ✅ Get the exact questions that were shown to the user from session
-    session_key = f"quiz_{quiz.id}_question_ids"
-    qids = request.session.get(session_key, [])
-
-    if qids:
-        questions_qs = Question.objects.filter(id__in=qids, quiz=quiz)
-        # Preserve order from qids
-        questions_by_id = {q.id: q for q in questions_qs}
-        questions = [questions_by_id[qid] for qid in qids if qid in questions_by_id]
-        # Optional: clear after use
-        request.session.pop(session_key, None)
+def grade_submission(quiz, bank, post, phone, event):
+    """Grade posted answers against the paper described by the posted paper token."""
+    paper = read_paper_token(post.get("paper"), quiz.id)
+    if paper:
+        questions = paper_questions(bank, paper)
     else:
-        # Fallback (if session missing): first num_questions
-        questions = list(quiz.questions.all()[: quiz.num_questions])
+        # Fallback (if the token is missing): first num_questions
+        questions = list(bank.questions[: quiz.num_questions])
 
     total = len(questions)
     score = 0
-    details = []
+    answers = []
 
     for q in questions:
         field_name = f"q_{q.id}"  # matches name="q_{{ q.id }}" in template
-        raw_selected = request.POST.get(field_name)  # 'A'/'B'/'C'/'D' or None
+        raw_selected = post.get(field_name)  # 'A'/'B'/'C'/'D' or None
 
-        # Make comparison case-insensitive, just in case
+        # Make comparison case-insensitive, just in case; anything but an
+        # option letter counts as unanswered
         selected = (raw_selected or "").strip().upper()
-        correct_letter = (q.correct_option or "").strip().upper()
+        if len(selected) != 1 or selected not in OPTIONS:
+            selected = None
+        correct_letter = q.correct_option
 
         is_correct = selected == correct_letter
         if is_correct:
             score += 1
 
-        option_map = {
-            "A": q.option_a,
-            "B": q.option_b,
-            "C": q.option_c,
-            "D": q.option_d,
-        }
-
-        details.append(
-            {
-                "question": q,
-                "selected_letter": selected or None,
-                "selected_text": option_map.get(selected) if selected else None,
-                "correct_letter": correct_letter,
-                "correct_text": option_map.get(correct_letter),
-                "is_correct": is_correct,
-            }
-        )
+        answers.append((q.id, selected, correct_letter, is_correct))
 
-    time_taken = request.POST.get("time_taken", 0)
+    time_taken = post.get("time_taken", 0)
     try:
         time_taken = int(float(time_taken or 0))
     except (ValueError, TypeError):
         time_taken = 0
 
-    # Save submission in DB
-    submission = Submission.objects.create(
-        quiz=quiz,
-        phone=phone or "",
+    return GradedSubmission(
+        quiz_id=quiz.id,
+        phone=phone,
         event=event or "",
         score=score,
         total_questions=total,
         time_taken_seconds=time_taken,
+        answers=answers,
     )
 
-    # Save each answer
-    answer_objs = [
-        Answer(
-            submission=submission,
-            question=item["question"],
-            selected_option=item["selected_letter"],
-            correct_option=item["correct_letter"],
-            is_correct=item["is_correct"],
-        )
-        for item in details
-    ]
-    Answer.objects.bulk_create(answer_objs)
-    
+
+@require_POST
+def submit_quiz(request, quiz_id):
+    quiz = get_object_or_404(Quiz, pk=quiz_id)
+
+    # ✅ Security: Get phone from session if possible, else POST
+    # Ideally trust session, but fall back to POST if session died mid-quiz (unlikely but possible)?
+    # Actually, we should strictly enforce session or at least valid phone.
+    phone = request.session.get('participant_phone') or request.POST.get("phone")
+    event = request.session.get('participant_event') or request.POST.get("event")
+
+    if not phone:
+        return landing_page(request, "Session expired or invalid. Please login again.")
+
+    # ✅ Check if ALREADY SUBMITTED
+    if attempts.has_attempted(quiz.id, phone):
+        # If they somehow resubmit, the receipt leads to the existing result
+        return redirect('submission_receipt', receipt=make_receipt(quiz.id, phone))
+
+    # ✅ Grade the exact paper that was shown to the user (from the paper token)
+    bank = get_question_bank(quiz.id)
+    graded = grade_submission(quiz, bank, request.POST, phone, event)
+
+    # Hand the graded submission to the ingestion queue (batched DB writes)
+    submission_id, receipt = ingest(graded)
+    ops.submitted(quiz.id, graded.score)
+
     # ✅ Clean up session
     request.session.pop('participant_phone', None)
     request.session.pop('participant_event', None)
     # Also clear temp data if it's still there
     request.session.pop('temp_team_data', None)
     request.session.pop('temp_api_error', None)
+    # Kept so the participant can look up their own standing (leaderboard_api)
+    request.session['leaderboard_phone'] = phone
+
+    if submission_id is None:
+        # Still queued: the receipt page forwards to the result once committed
+        return pin_to_primary(redirect('submission_receipt', receipt=receipt))
+
+    # ✅ PRG: Redirect to result view (read from the primary until replicated)
+    return pin_to_primary(result_redirect(quiz.id, submission_id))
+
+
+@never_cache
+def submission_receipt(request, receipt):
+    """
+    Where submit_quiz sends participants while their submission is still queued.
+    Forwards to the result page as soon as the submission is committed.
+    """
+    key = read_receipt(receipt)
+    if key is None:
+        raise Http404("Unknown receipt")
+    quiz_id, phone = key
+
+    status = writer_for(quiz_id).status(key)
+    if status is None:
+        # Queued by another worker, or already committed earlier
+        status = (
+            Submission.objects.using(db_for_quiz(quiz_id))
+            .filter(quiz_id=quiz_id, phone=phone)
+            .values_list("id", flat=True)
+            .first()
+        )
+    if status is not None and status != "pending":
+        return result_redirect(quiz_id, status)
+
+    quiz = get_object_or_404(Quiz, id=quiz_id)
+    if status is None and submission_failed(quiz_id, phone):
+        # Kept in the spool for a retry; keep checking, but less often
+        return render(request, "submission_pending.html", {"quiz": quiz, "failed": True, "refresh_seconds": 30})
+    return render(request, "submission_pending.html", {"quiz": quiz, "refresh_seconds": 1})
+
+
+def result_details(answers):
+    """Per-question breakdown for the result page from answers with .question loaded (see packing.load_answers)."""
+    details = []
+    for ans in answers:
+        q = ans.question
+
+        option_map = {
+            "A": q.option_a,
+            "B": q.option_b,
+            "C": q.option_c,
+            "D": q.option_d,
+        }
 
+        sel = (ans.selected_option or "").strip().upper()
+        corr = (ans.correct_option or "").strip().upper()
 
-    # ✅ PRG: Redirect to result view
-    return redirect('quiz_result', submission_id=submission.id)
+        details.append({
+            "question": q,
+            "selected_letter": ans.selected_option,
+            "selected_text": option_map.get(sel) if sel else None,
+            "correct_letter": ans.correct_option,
+            "correct_text": option_map.get(corr),
+            "is_correct": ans.is_correct,
+        })
+    return details
 
 
-def quiz_result(request, submission_id):
+@condition(etag_func=result_etag, last_modified_func=result_last_modified)
+def quiz_result(request, submission_id, quiz_id=None):
     """
     Renders the result page for a given submission.
+
+    The page is rendered once and then served from the cache (see results.py).
+    It is built from the submission's own database rather than the replica, so
+    a lagging replica can't leave stale scores cached after a re-grade.
     """
-    submission = get_object_or_404(Submission, id=submission_id)
+    snapshot = cached_result(request, submission_id, quiz_id)
+    if snapshot is not None:
+        return result_response(request, snapshot)
+
+    submission = get_object_or_404(
+        Submission.objects.using(db_for_quiz(quiz_id) if quiz_id is not None else "default")
+        .select_related("quiz"),
+        id=submission_id,
+        **({"quiz_id": quiz_id} if quiz_id is not None else {}),
+    )
     
     # Optional: We could check if the logged in user owns this submission if we kept the session,
     # but we cleared the session. For a simple event, ID obfuscation or just openness is often acceptable.
@@ -389,28 +419,7 @@ def quiz_result(request, submission_id):
     details = []
     
     if show_results:
-        answers = submission.answers.select_related('question').all()
-        for ans in answers:
-            q = ans.question
-            
-            option_map = {
-                "A": q.option_a,
-                "B": q.option_b,
-                "C": q.option_c,
-                "D": q.option_d,
-            }
-
-            sel = (ans.selected_option or "").strip().upper()
-            corr = (ans.correct_option or "").strip().upper()
-            
-            details.append({
-                "question": q,
-                "selected_letter": ans.selected_option,
-                "selected_text": option_map.get(sel) if sel else None,
-                "correct_letter": ans.correct_option,
-                "correct_text": option_map.get(corr),
-                "is_correct": ans.is_correct,
-            })
+        details = result_details(load_answers(submission))
     
     # Check if feedback already exists
     feedback_submitted = hasattr(submission, 'feedback')
@@ -426,8 +435,10 @@ def quiz_result(request, submission_id):
         "submission_id": submission.id,
         "feedback_submitted": feedback_submitted,
         "show_results": show_results,
+        "csrf_token": CSRF_PLACEHOLDER,
     }
-    return render(request, "quiz_result.html", context)
+    html = render_to_string("quiz_result.html", context)
+    return result_response(request, store_result(submission, html))
 
 
 def submit_feedback(request):
@@ -439,12 +450,16 @@ def submit_feedback(request):
         rating_relevance = request.POST.get("rating_relevance")
         comments = request.POST.get("comments", "")
 
-        submission = get_object_or_404(Submission, id=submission_id)
+        quiz_id = request.POST.get("quiz_id")
+        submission = get_object_or_404(
+            Submission.objects.using(db_for_quiz(quiz_id)) if quiz_id else Submission.objects,
+            id=submission_id,
+        )
         
         from .models import Feedback
         
         try:
-            Feedback.objects.create(
+            Feedback.objects.using(submission._state.db).create(
                 submission=submission,
                 rating=rating,
                 rating_ui=rating_ui or 0,
@@ -458,6 +473,103 @@ def submit_feedback(request):
             
         # Ideally redirect to result page too, but let's stick to simple render for now strictly following user request scope,
         # OR better, redirect to the result page we just made!
-        return redirect('quiz_result', submission_id=submission.id)
+        return result_redirect(submission.quiz_id, submission.id)
         
     return HttpResponse("Invalid request")
+
+
+def leaderboard_api(request, quiz_id):
+    """
+    Top-N standings for a quiz, plus one participant's standing with ?phone=.
+    Phone numbers are masked unless the caller is staff, and only staff may
+    look up a phone other than the one logged in (or submitted) in the session.
+    """
+    quiz = get_object_or_404(Quiz, id=quiz_id)
+    staff = request.user.is_staff
+    if not quiz.show_results and not staff:
+        raise Http404("Results are hidden for this quiz")
+
+    phone = request.GET.get("phone", "").strip()
+    own = {request.session.get('participant_phone'), request.session.get('leaderboard_phone')}
+    if phone and not staff and phone not in own:
+        return JsonResponse({"error": "You can only look up your own standing."}, status=403)
+
+    try:
+        top = max(0, min(int(request.GET.get("top", 10)), 100))
+    except ValueError:
+        top = 10
+
+    board = leaderboards.get(quiz.id)
+    data = {
+        "quiz": quiz.id,
+        "name": quiz.name,
+        "participants": len(board),
+        "top": [s.as_dict(mask_phone=not staff) for s in board.top(top)],
+    }
+
+    if phone:
+        standing = board.standing(phone)
+        data["standing"] = standing.as_dict(mask_phone=not staff) if standing else None
+
+    return JsonResponse(data)
+
+
+def bank_api(request, quiz_id, version=None):
+    """
+    Public question payload of an active quiz (no answer key), see quiz.delivery.
+    The versioned URL never changes; an outdated version redirects to the current one.
+    Only served with shell delivery: otherwise the pages carry the questions,
+    and the bank of an active quiz should not be readable without logging in.
+    """
+    if not shell_delivery():
+        raise Http404("Question banks are not served as JSON.")
+    quiz = catalog_quiz(quiz_id)
+    if quiz is None or not quiz.is_active:
+        raise Http404("No active quiz matches the given query.")
+
+    bank = get_question_bank(quiz.id)
+    if version is not None and version != bank.version:
+        response = redirect(bank_url(bank))
+        response["Cache-Control"] = f"public, max-age={BANK_MAX_AGE}"
+        return response
+
+    document = bank_document(bank)
+    response = get_conditional_response(request, etag=document.etag)
+    if response is None:
+        response = HttpResponse(document.body, content_type="application/json")
+    response["ETag"] = document.etag
+    if version is None:
+        response["Cache-Control"] = f"public, max-age={BANK_MAX_AGE}"
+    else:
+        response["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+
+@never_cache
+def paper_api(request, quiz_id):
+    """The session participant's paper: question ids, option orders and the paper token."""
+    if not shell_delivery():
+        raise Http404("Papers are not served as JSON.")
+    session_phone = request.session.get('participant_phone')
+    if not session_phone or str(request.session.get('participant_event')) != str(quiz_id):
+        return JsonResponse({"error": "Session expired or invalid. Please login again."}, status=403)
+
+    quiz = get_object_or_404(Quiz, id=quiz_id)
+    if attempts.has_attempted(quiz.id, session_phone):
+        return JsonResponse({"error": "You have already attempted this quiz."}, status=403)
+
+    bank = get_question_bank(quiz.id)
+    ops.quiz_started(quiz, session_phone)
+    return JsonResponse(participant_paper(quiz, bank, session_phone))
+
+
+@never_cache
+def metrics_view(request):
+    """Prometheus text format (see quiz.metrics); staff or the scraper's bearer token."""
+    token = getattr(settings, "QUIZ_METRICS_TOKEN", None)
+    authorized = request.user.is_staff or (
+        token and constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}")
+    )
+    if not authorized:
+        return HttpResponse("Forbidden", status=403, content_type="text/plain")
+    return HttpResponse(metrics.registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
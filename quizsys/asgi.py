@@ -3,6 +3,32 @@ ASGI config for quizsys project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Event-day deployment profile
+----------------------------
+Under ASGI the participant-facing views (prelims_entry, quiz_page,
+submit_quiz, quiz_result) are served by their async versions in
+quiz/async_views.py: importing this module sets QUIZ_ASYNC_VIEWS=1 unless the
+environment already says otherwise. A participant waiting on the registration
+API or trickling in over a slow mobile connection then holds a coroutine, not
+a thread, so one process can keep thousands of such connections open.
+
+    pip install "uvicorn[standard]" httpx
+    gunicorn quizsys.asgi:application -k uvicorn.workers.UvicornWorker \\
+        --workers 2 --backlog 4096 --timeout 60 --keep-alive 5
+
+or, single process:
+
+    uvicorn quizsys.asgi:application --workers 1 --backlog 4096 \\
+        --limit-concurrency 5000 --timeout-keep-alive 5
+
+- httpx is optional. Without it the registration call runs in a worker thread
+  of its own, which works but gives back part of the gain.
+- Keep few workers. Every process holds its own bank cache, attempt sets and
+  submission writer thread, and SQLite has a single writer anyway.
+- Leave CONN_MAX_AGE at 0. Async ORM calls run on one shared sync thread per
+  process, and sessions and cache calls go through it too.
+- Serve static files from the reverse proxy, not from Django.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -12,5 +38,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quizsys.settings')
+os.environ.setdefault('QUIZ_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,8 +43,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'quiz.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'quiz.middleware.ReplicaPinMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -130,4 +133,132 @@ STATICFILES_DIRS = [
 
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Quiz performance knobs
+QUIZ_BANK_CACHE_SIZE = 16          # quizzes whose question bank is kept in memory
+QUIZ_PAPER_VARIANTS = 8            # default variants built per quiz
+QUIZ_PAPER_PAGE_CACHE_SIZE = 64    # rendered variant pages kept in memory
+QUIZ_VARIANT_ASSIGNMENT = "hash"   # "hash" (by phone) or "round_robin"
+
+# College registration API (fallback behind the local Participant roster)
+QUIZ_REGISTRATION_API_URL = "https://rvrjcce.ac.in/xcsm/aikshetra2K25/api/get_participant.php"
+QUIZ_REGISTRATION_TIMEOUT = (1.0, 2.0)        # (connect, read) seconds
+QUIZ_REGISTRATION_POOL_SIZE = 10              # keep-alive connections per process
+QUIZ_REGISTRATION_FAILURE_THRESHOLD = 5       # consecutive failures before the circuit opens
+QUIZ_REGISTRATION_RESET_TIMEOUT = 30          # seconds before a trial call is let through
+QUIZ_REGISTRATION_NEGATIVE_TTL = 60           # seconds to remember "not registered" answers
+
+# Submission ingestion: graded submissions are queued and written in batches
+QUIZ_INGEST = {
+    "WRITE_BEHIND": True,      # False = write each submission inside the request
+    "BATCH_SIZE": 200,         # max submissions per transaction
+    "FLUSH_INTERVAL": 0.05,    # seconds to wait for a batch to fill
+    # Queued submissions are kept here until committed (quiz/spool.py); None = memory only
+    "SPOOL_DIR": os.environ.get("QUIZ_SPOOL_DIR", BASE_DIR / "spool"),
+}
+QUIZ_RECEIPT_TTL = 24 * 60 * 60   # seconds a submission receipt can be looked up
+QUIZ_ATTEMPT_MARKER_TTL = 24 * 60 * 60   # seconds an "already attempted" marker stays in the shared cache
+QUIZ_LEADERBOARD_REFRESH = 1.0    # seconds between leaderboard catch-up queries per process
+
+# Async participant views (prelims_entry, quiz_page, submit_quiz, quiz_result).
+# Only worth it under an ASGI server; quizsys/asgi.py turns this on.
+QUIZ_ASYNC_VIEWS = os.environ.get("QUIZ_ASYNC_VIEWS", "0") == "1"
+
+# Read replica for admin changelists and exports (quiz/routers.py).
+# Set QUIZ_REPLICA_DB to a second SQLite file and keep it in sync with
+# `manage.py replicate_db --interval 5`, which switches db.sqlite3 to WAL mode
+# so submissions don't wait for each copy.
+QUIZ_REPLICA_DB = os.environ.get("QUIZ_REPLICA_DB")
+if QUIZ_REPLICA_DB:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': QUIZ_REPLICA_DB,
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['quiz.routers.ReplicaRouter']
+QUIZ_REPLICA_PIN_SECONDS = 30    # after submitting, a participant's reads stay on the primary this long
+
+# Per-event shards (quiz/shards.py): QUIZ_SHARDS_SPEC="3=bwai,4=codewarz" puts
+# quiz 3's submissions, answers and feedback in BASE_DIR/shard_bwai.sqlite3 and
+# quiz 4's in shard_codewarz.sqlite3, so concurrent events don't share a writer
+# lock. Create them with `manage.py sync_shards`.
+QUIZ_SHARDS = {}
+for _entry in filter(None, os.environ.get("QUIZ_SHARDS_SPEC", "").split(",")):
+    _quiz_id, _name = _entry.split("=")
+    QUIZ_SHARDS[int(_quiz_id)] = f"shard_{_name.strip()}"
+    DATABASES.setdefault(f"shard_{_name.strip()}", {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f"shard_{_name.strip()}.sqlite3",
+    })
+
+# Static asset pipeline (quiz/assets.py): `manage.py build_static` builds the
+# icons and collects hashed, precompressed files into STATIC_ROOT.
+STATIC_ROOT = BASE_DIR / "staticfiles"
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "quiz.assets.PrecompressedManifestStaticFilesStorage"},
+}
+# Serve STATIC_ROOT from Django with immutable caching (no reverse proxy in front)
+QUIZ_SERVE_STATIC = os.environ.get("QUIZ_SERVE_STATIC", "0") == "1"
+
+# Rendered result pages are kept in the cache (quiz/results.py) until feedback
+# is submitted or the quiz is re-graded or edited
+QUIZ_RESULT_CACHE_TIMEOUT = 7 * 24 * 60 * 60   # seconds
+
+# Admin lists of submissions, answers and feedback (quiz/changelists.py)
+QUIZ_ADMIN_COUNT_LIMIT = 10_000   # filtered lists count up to this many rows, then show "about N"
+
+# Live dashboard (quiz/ops.py): counters kept in the cache, pushed over SSE
+QUIZ_OPS_RATE_WINDOW = 5            # minutes averaged for the per-minute rates
+QUIZ_OPS_PUSH_INTERVAL = 2          # seconds between dashboard updates
+QUIZ_OPS_STREAM_SECONDS = 300       # a stream is closed (and reopened by the browser) after this long under ASGI
+QUIZ_OPS_SYNC_STREAM_SECONDS = 30   # ... and under WSGI, where an open stream holds a worker thread
+
+# Admission control at quiz start (quiz/admission.py), for quizzes with a start rate
+QUIZ_ADMISSION_BURST_SECONDS = 10             # tokens a quiet quiz can save up, in seconds of its start rate
+QUIZ_ADMISSION_TICKET_MAX_AGE = 2 * 60 * 60   # seconds a waiting-room ticket stays valid
+
+# How the ingestion writer stores answers (quiz/packing.py): "rows" writes one
+# Answer row per question, "packed" keeps them on the Submission row.
+# `manage.py pack_answers` converts what is already stored.
+QUIZ_ANSWER_STORAGE = os.environ.get("QUIZ_ANSWER_STORAGE", "rows")
+
+# Caches. "quiz" is shared by every worker: the L2 behind quiz/tiered.py
+# (question bank, catalog and result versions) and the state workers must
+# agree on (attempt markers, result pages, admission clocks, dashboard
+# counters). It is a directory on disk, or Redis when QUIZ_CACHE_REDIS_URL is
+# set. "default" stays per process and only remembers recent registration
+# lookups that failed.
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "quiz": (
+        {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": os.environ["QUIZ_CACHE_REDIS_URL"]}
+        if os.environ.get("QUIZ_CACHE_REDIS_URL")
+        else {
+            # FileBasedCache with atomic add/incr (quiz/filecache.py)
+            "BACKEND": "quiz.filecache.LockedFileBasedCache",
+            "LOCATION": os.environ.get("QUIZ_CACHE_DIR", BASE_DIR / "cache"),
+            "OPTIONS": {"MAX_ENTRIES": 100_000},
+        }
+    ),
+}
+QUIZ_CACHE_ALIAS = "quiz"
+QUIZ_CACHE_L1_SIZE = 256         # entries kept in each process
+QUIZ_CACHE_L1_TTL = 60           # seconds an L1 entry is trusted
+QUIZ_CACHE_SYNC_INTERVAL = 1.0   # seconds between a process's namespace version checks
+
+# Question delivery (quiz/delivery.py). "html" renders each paper into the quiz
+# page; "shell" serves a shared page that loads the paper from the JSON API,
+# whose bank payloads are public and cacheable by a proxy or CDN.
+QUIZ_PAPER_DELIVERY = os.environ.get("QUIZ_PAPER_DELIVERY", "html")
+QUIZ_BANK_API_MAX_AGE = 30   # seconds the unversioned bank URL may be cached
+
+# Metrics (quiz/metrics.py), served at /metrics/ in the Prometheus text format.
+# With several worker processes set QUIZ_METRICS_DIR to a directory the workers
+# of this host share; each writes its totals there, and the totals of stopped
+# workers are folded into one archive file.
+QUIZ_METRICS_DIR = os.environ.get("QUIZ_METRICS_DIR")
+QUIZ_METRICS_TOKEN = os.environ.get("QUIZ_METRICS_TOKEN")   # scrapers send "Authorization: Bearer <token>"
+QUIZ_METRICS_FLUSH_INTERVAL = 5   # seconds between a process's writes to QUIZ_METRICS_DIR
+SESSION_ENGINE = "quiz.sessions"  # database sessions that report their size